@@ -228,7 +228,7 @@ class SubScanSerializer(serializers.ModelSerializer):
 class CommandSerializer(serializers.ModelSerializer):
 	class Meta:
 		model = Command
-		fields = '__all__'
+		exclude = ('output_path',)
 		depth = 1
 
 
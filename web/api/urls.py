@@ -188,6 +188,10 @@ urlpatterns = [
         'reconpoint/update/',
         ReconpointUpdateCheck.as_view(),
         name='check_reconpoint_update'),
+    path(
+        'reconpoint/task_cache/',
+        TaskCacheStats.as_view(),
+        name='task_cache_stats'),
     path(
         'action/subdomain/delete/',
         DeleteSubdomain.as_view(),
@@ -23,6 +23,8 @@ from django.core.cache import cache
 from dashboard.models import *
 from recon_note.models import *
 from reconPoint.celery import app
+from reconPoint.celery_custom_task import task_cache
+from reconPoint.command_log import get_log_size, read_log, tail_log
 from reconPoint.common_func import *
 from reconPoint.definitions import ABORTED_TASK
 from reconPoint.tasks import *
@@ -1212,6 +1214,12 @@ class ListInterestingKeywords(APIView):
 		return Response(keywords)
 
 
+class TaskCacheStats(APIView):
+	def get(self, request):
+		"""Task result cache hits, misses and bytes, globally and per task."""
+		return Response(task_cache.stats())
+
+
 class ReconpointUpdateCheck(APIView):
 	def get(self, request):
 		req = self.request
@@ -2537,7 +2545,52 @@ class SubdomainDatatableViewSet(viewsets.ModelViewSet):
 		return qs
 
 
-class ListActivityLogsViewSet(viewsets.ModelViewSet):
+class CommandOutputMixin:
+	"""Serve the spooled output of a command, either a byte range
+	(`?offset=&length=`) or the last bytes (`?tail=`)."""
+	MAX_OUTPUT_LENGTH = 1024 * 1024
+
+	@action(detail=True, methods=['get'])
+	def output(self, request, pk=None):
+		req = self.request
+		command = Command.objects.filter(pk=pk).first()
+		if not command:
+			return Response({'error': 'Command not found'}, status=status.HTTP_404_NOT_FOUND)
+		try:
+			tail = int(req.query_params.get('tail', 0))
+			offset = int(req.query_params.get('offset', 0))
+			length = int(req.query_params.get('length', self.MAX_OUTPUT_LENGTH))
+		except ValueError:
+			return Response({'error': 'Invalid offset, length or tail'}, status=HTTP_400_BAD_REQUEST)
+		length = min(max(length, 0), self.MAX_OUTPUT_LENGTH)
+		tail = min(max(tail, 0), self.MAX_OUTPUT_LENGTH)
+
+		if command.output_path:
+			size = get_log_size(command.output_path)
+			if tail:
+				offset, data = tail_log(command.output_path, tail)
+			else:
+				data = read_log(command.output_path, offset, length)
+		else:
+			# Commands run before output spooling
+			legacy_output = (command.output or '').encode()
+			size = len(legacy_output)
+			if tail:
+				offset = max(size - tail, 0)
+				length = tail
+			data = legacy_output[offset:offset + length]
+
+		return Response({
+			'id': command.id,
+			'offset': offset,
+			'length': len(data),
+			'size': size,
+			'finished': command.return_code is not None,
+			'output': data.decode('utf-8', errors='replace'),
+		})
+
+
+class ListActivityLogsViewSet(CommandOutputMixin, viewsets.ModelViewSet):
 	serializer_class = CommandSerializer
 	queryset = Command.objects.none()
 	def get_queryset(self):
@@ -2547,7 +2600,7 @@ class ListActivityLogsViewSet(viewsets.ModelViewSet):
 		return self.queryset
 
 
-class ListScanLogsViewSet(viewsets.ModelViewSet):
+class ListScanLogsViewSet(CommandOutputMixin, viewsets.ModelViewSet):
 	serializer_class = CommandSerializer
 	queryset = Command.objects.none()
 	def get_queryset(self):
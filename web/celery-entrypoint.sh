@@ -175,11 +175,14 @@ watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/ap
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=30 --loglevel=$loglevel -Q initiate_scan_queue -n initiate_scan_worker &
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=30 --loglevel=$loglevel -Q subscan_queue -n subscan_worker &
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=20 --loglevel=$loglevel -Q report_queue -n report_worker &
+watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=10 --loglevel=$loglevel -Q scan_activity_queue -n scan_activity_worker &
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=10 --loglevel=$loglevel -Q send_notif_queue -n send_notif_worker &
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=10 --loglevel=$loglevel -Q send_scan_notif_queue -n send_scan_notif_worker &
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=10 --loglevel=$loglevel -Q send_task_notif_queue -n send_task_notif_worker &
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=5 --loglevel=$loglevel -Q send_file_to_discord_queue -n send_file_to_discord_worker &
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=5 --loglevel=$loglevel -Q send_hackerone_report_queue -n send_hackerone_report_worker &
+watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=2 --loglevel=$loglevel -Q check_proxies_queue -n check_proxies_worker &
+watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=5 --loglevel=$loglevel -Q probe_queue -n probe_worker &
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=10 --loglevel=$loglevel -Q parse_nmap_results_queue -n parse_nmap_results_worker &
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=20 --loglevel=$loglevel -Q geo_localize_queue -n geo_localize_worker &
 watchmedo auto-restart --recursive --pattern="*.py" --directory="/usr/src/app/reconPoint/" -- celery -A reconPoint.tasks worker --pool=gevent --concurrency=10 --loglevel=$loglevel -Q query_whois_queue -n query_whois_worker &
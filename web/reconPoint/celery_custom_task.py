@@ -1,15 +1,24 @@
 import json
+import time
 
-from celery import Task
+from celery import Task, chain, chord, group
+from celery.exceptions import Ignore
 from celery.utils.log import get_task_logger
 from celery.worker.request import Request
+from django.db.models import F, Func, Value
 from django.utils import timezone
 from redis import Redis
 from reconPoint.common_func import (fmt_traceback, get_output_file_name,
-								 get_task_cache_key, get_traceback_path)
+								 get_traceback_path, proxy_pool)
 from reconPoint.definitions import *
+from reconPoint.notif_aggregator import NotificationAggregator
+from reconPoint.probe_queue import ProbeQueue
+from reconPoint.scan_context import scan_context_cache
+from reconPoint.scope import get_scope_engine
 from reconPoint.settings import *
-from scanEngine.models import EngineType
+from reconPoint.sharding import (ThroughputTracker, plan_shards, shard_path,
+							  split_items)
+from reconPoint.task_cache import TaskCache, make_cache_key
 from startScan.models import ScanActivity, ScanHistory, SubScan
 
 logger = get_task_logger(__name__)
@@ -17,6 +26,13 @@ logger = get_task_logger(__name__)
 cache = None
 if 'CELERY_BROKER' in os.environ:
 	cache = Redis.from_url(os.environ['CELERY_BROKER'])
+task_cache = TaskCache(cache, ttls=TASK_CACHE_TTLS, max_bytes=TASK_CACHE_MAX_BYTES)
+notification_aggregator = NotificationAggregator(
+	cache,
+	window=NOTIFICATION_DIGEST_WINDOW,
+	rate_limits=NOTIFICATION_RATE_LIMITS)
+shard_throughput = ThroughputTracker(cache)
+probe_queue = ProbeQueue(cache, window=PROBE_QUEUE_WINDOW, max_batch=PROBE_QUEUE_MAX_BATCH)
 
 
 class ReconpointRequest(Request):
@@ -32,15 +48,21 @@ class ReconpointTask(Task):
 
 	RECONPOINT_RECORD_ENABLED:
 	- Create / update ScanActivity object to track statuses.
-	- Send notifications before and after each task (start / end).
+	- Send notifications before and after each task (start / end), merged into
+	  one digest per scan and window (see reconPoint.notif_aggregator).
 	- Send traceback file to reconPoint's Discord channel if an exception happened.
 
 	RECONPOINT_CACHE_ENABLED:
-	- Get result from cache if it exists.
+	- Get result from cache if it exists (see reconPoint.task_cache).
 	- Set result to cache after a task if no exceptions occured.
 
 	RECONPOINT_RAISE_ON_ERROR:
 	- Raise the actual exception when task fails instead of just logging it.
+
+	Tasks fanning out sub-tasks should not wait for them: use `self.replace`
+	to hand the rest of the stage over to a workflow, which frees the worker
+	slot right away. Tasks running a tool over a large input can split it in
+	parallel shards with `self.shard` (see reconPoint.sharding).
 	"""
 	Request = ReconpointRequest
 
@@ -53,7 +75,10 @@ class ReconpointTask(Task):
 		self.error = None
 		self.traceback = None
 		self.output_path = None
+		self.replaced = False
+		self.retrying = False
 		self.status = RUNNING_TASK
+		start = time.monotonic()
 
 		# Get task info
 		self.task_name = self.name.split('.')[-1]
@@ -72,13 +97,20 @@ class ReconpointTask(Task):
 		self.results_dir = ctx.get('results_dir', RECONPOINT_RESULTS)
 		self.yaml_configuration = ctx.get('yaml_configuration', {})
 		self.out_of_scope_subdomains = ctx.get('out_of_scope_subdomains', [])
+		self.scope = get_scope_engine(self.out_of_scope_subdomains, self.excluded_paths)
 		self.history_file = f'{self.results_dir}/commands.txt'
-		self.scan = ScanHistory.objects.filter(pk=self.scan_id).first()
-		self.subscan = SubScan.objects.filter(pk=self.subscan_id).first()
-		self.engine = EngineType.objects.filter(pk=self.engine_id).first()
-		self.domain = self.scan.domain if self.scan else None
+		self.shard_index = ctx.get('shard')
+		self.shard_size = ctx.get('shard_size')
+
+		# Get scan objects from the worker's scan context cache
+		scan_context = scan_context_cache.get(self.scan_id, self.subscan_id, self.engine_id)
+		self.scan = scan_context.scan
+		self.subscan = scan_context.subscan
+		self.engine = scan_context.engine
+		self.engine_tasks = scan_context.engine_tasks
+		self.domain = scan_context.domain
 		self.domain_id = self.domain.id if self.domain else None
-		self.subdomain = self.subscan.subdomain if self.subscan else None
+		self.subdomain = scan_context.subdomain
 		self.subdomain_id = self.subdomain.id if self.subdomain else None
 		self.activity_id = None
 
@@ -90,7 +122,7 @@ class ReconpointTask(Task):
 				f'{self.task_name}.txt')
 			if self.task_name == 'screenshot':
 				self.filename = 'Requests.csv'
-		self.output_path = f'{self.results_dir}/{self.filename}'
+		self.output_path = shard_path(f'{self.results_dir}/{self.filename}', self.shard_index)
 
 		if RECONPOINT_RECORD_ENABLED:
 			if self.engine: # task not in engine.tasks, skip it.
@@ -104,7 +136,7 @@ class ReconpointTask(Task):
 					'nuclei_individual_severity_module': 'vulnerability_scan',
 					's3scanner': 'vulnerability_scan',
 				}
-				if self.track and self.task_name not in self.engine.tasks and dependent_tasks.get(self.task_name) not in self.engine.tasks:
+				if self.track and self.task_name not in self.engine_tasks and dependent_tasks.get(self.task_name) not in self.engine_tasks:
 					logger.debug(f'Task {self.name} is not part of engine "{self.engine.engine_name}" tasks. Skipping.')
 					return
 
@@ -115,22 +147,39 @@ class ReconpointTask(Task):
 
 		if RECONPOINT_CACHE_ENABLED:
 			# Check for result in cache and return it if it's a hit
-			record_key = get_task_cache_key(self.name, *args, **kwargs)
-			result = cache.get(record_key)
-			if result and result != b'null':
+			record_key = self.get_cache_key(*args, **kwargs)
+			result = task_cache.get_json(self.task_name, record_key)
+			if result is not None:
 				self.status = SUCCESS_TASK
 				if RECONPOINT_RECORD_ENABLED and self.track:
 					logger.warning(f'Task {self.task_name} status is SUCCESS (CACHED)')
 					self.update_scan_activity()
-				return json.loads(result)
+				return result
 
 		# Execute task, catch exceptions and update ScanActivity object after
 		# task has finished running.
 		try:
 			self.result = self.run(*args, **kwargs)
 			self.status = SUCCESS_TASK
+			if self.shard_index is not None:
+				shard_throughput.record(self.task_name, self.shard_size, time.monotonic() - start)
+
+		except Ignore:
+			# Task was replaced by a workflow that will complete the activity
+			raise
 
 		except Exception as exc:
+			# Failed shards are retried on their own
+			if self.shard_index is not None and self.request.retries < SHARD_MAX_RETRIES:
+				self.retrying = True
+				logger.warning(f'Task {self.task_name} shard {self.shard_index} failed: {exc!r}. Retrying.')
+				raise self.retry(
+					args=args,
+					kwargs=dict(kwargs, ctx=dict(ctx, track=False)),
+					exc=exc,
+					countdown=SHARD_RETRY_DELAY,
+					max_retries=SHARD_MAX_RETRIES)
+
 			self.status = FAILED_TASK
 			self.error = repr(exc)
 			self.traceback = fmt_traceback(exc)
@@ -148,21 +197,120 @@ class ReconpointTask(Task):
 			logger.exception(exc)
 
 		finally:
-			self.write_results()
+			# Give back the proxies leased by the task
+			proxy_pool.release_held()
 
-			if RECONPOINT_RECORD_ENABLED and self.track:
+			if not self.replaced and not self.retrying:
+				self.write_results()
+
+			if RECONPOINT_RECORD_ENABLED and self.track and not self.replaced:
 				msg = f'Task {self.task_name} status is {self.status_str}'
 				msg += f' | Error: {self.error}' if self.error else ''
 				logger.warning(msg)
 				self.update_scan_activity()
 
 		# Set task result in cache if task was successful
-		if RECONPOINT_CACHE_ENABLED and self.status == SUCCESS_TASK and result:
-			cache.set(record_key, json.dumps(result))
-			cache.expire(record_key, 600) # 10mn cache
+		if RECONPOINT_CACHE_ENABLED and self.status == SUCCESS_TASK and self.result:
+			task_cache.set_json(self.task_name, record_key, self.result)
 
 		return self.result
 
+	def get_cache_key(self, *args, **kwargs):
+		"""Build the result cache key of a call: task name, arguments, scan
+		target and config, and contents of the input files passed as args.
+		Results are keyed by scan and subscan, as a task run also writes the
+		scan's DB rows: tool outputs are reused across scans by
+		`run_cached_command`.
+		"""
+		kwargs = {k: v for k, v in kwargs.items() if k not in RECONPOINT_TASK_IGNORE_CACHE_KWARGS}
+		inputs = {
+			'args': args,
+			'kwargs': kwargs,
+			'scan_history_id': self.scan_id,
+			'subscan_id': self.subscan_id,
+			'domain': self.domain.name if self.domain else None,
+			'subdomain': self.subdomain.name if self.subdomain else None,
+			'config': self.yaml_configuration,
+			'starting_point_path': self.starting_point_path,
+			'excluded_paths': self.excluded_paths,
+			'out_of_scope_subdomains': self.out_of_scope_subdomains,
+		}
+		input_files = [
+			value for value in list(args) + list(kwargs.values())
+			if isinstance(value, str) and value.startswith('/') and os.path.isfile(value)
+		]
+		return make_cache_key(self.name, inputs, input_files)
+
+	def replace(self, sig):
+		"""Replace this task by a workflow and return without waiting for it.
+		Tasks chained after this one only start once the workflow has finished.
+		The ScanActivity stays RUNNING until then, and is completed by a
+		callback added to the workflow.
+
+		Args:
+			sig (celery.canvas.Signature): Workflow to run.
+		"""
+		if RECONPOINT_RECORD_ENABLED and self.track and self.activity_id:
+			# Import here to avoid Celery circular import
+			from reconPoint.tasks import complete_scan_activity
+			kwargs = {
+				'task_name': self.task_name,
+				'output_path': self.output_path,
+				'scan_history_id': self.scan_id,
+				'subscan_id': self.subscan_id,
+				'engine_id': self.engine_id,
+			}
+			sig = chain(sig, complete_scan_activity.si(self.activity_id, **kwargs))
+			sig.on_error(complete_scan_activity.si(self.activity_id, status=FAILED_TASK, **kwargs))
+		self.replaced = True
+		return super().replace(sig)
+
+	def shard(self, items, input_arg, *args, **kwargs):
+		"""Split the input of this task in shards run as parallel copies of
+		the task, and replace this task by them. Shard results are merged in
+		input order into this task's output file by `merge_shards`.
+
+		Inputs too small to be split, shards themselves and direct calls
+		(e.g. a task run inline by another task) are not sharded.
+
+		Args:
+			items (list): Input items (URLs, hosts).
+			input_arg (str): Name of the task argument taking the items.
+			args: Other positional arguments of the task.
+			kwargs: Other keyword arguments of the task, including ctx.
+
+		Returns:
+			bool: False if the input was not sharded, in which case the task
+				must go on with its whole input.
+		"""
+		if not SHARD_ENABLED or self.shard_index is not None or self.request.called_directly:
+			return False
+		sizes = plan_shards(
+			len(items),
+			shard_throughput.get(self.task_name),
+			target_seconds=SHARD_TARGET_SECONDS,
+			min_size=SHARD_MIN_SIZE,
+			max_size=SHARD_MAX_SIZE,
+			max_shards=SHARD_MAX_COUNT)
+		if len(sizes) <= 1:
+			return False
+
+		# Import here to avoid Celery circular import
+		from reconPoint.tasks import merge_shards
+		ctx = kwargs.get('ctx', {})
+		sigs = []
+		for index, shard_items in enumerate(split_items(items, sizes)):
+			shard_ctx = dict(ctx, shard=index, shard_size=len(shard_items), track=False)
+			shard_kwargs = dict(kwargs, ctx=shard_ctx)
+			shard_kwargs[input_arg] = shard_items
+			sigs.append(self.si(*args, **shard_kwargs))
+		logger.warning(f'Task {self.task_name} input split in {len(sizes)} shards of about {sizes[0]} items')
+		callback = merge_shards.s(
+			task_name=self.task_name,
+			output_path=self.output_path,
+			shard_output_paths=[shard_path(self.output_path, index) for index in range(len(sizes))])
+		return self.replace(chord(group(sigs), callback))
+
 	def write_results(self):
 		if not self.result:
 			return False
@@ -181,22 +329,20 @@ class ReconpointTask(Task):
 		if not self.track:
 			return
 		celery_id = self.request.id
-		self.activity = ScanActivity(
+		self.activity = ScanActivity.objects.create(
 			name=self.task_name,
 			title=self.description,
 			time=timezone.now(),
 			status=RUNNING_TASK,
-			celery_id=celery_id)
-		self.activity.save()
+			celery_id=celery_id,
+			scan_of=self.scan)
 		self.activity_id = self.activity.id
+
+		# Append celery id in db without saving the whole (cached) scan rows
 		if self.scan:
-			self.activity.scan_of = self.scan
-			self.activity.save()
-			self.scan.celery_ids.append(celery_id)
-			self.scan.save()
+			append_celery_id(ScanHistory, self.scan, celery_id)
 		if self.subscan:
-			self.subscan.celery_ids.append(celery_id)
-			self.subscan.save()
+			append_celery_id(SubScan, self.subscan, celery_id)
 
 		# Send notification
 		self.notify()
@@ -219,7 +365,24 @@ class ReconpointTask(Task):
 
 	def notify(self, name=None, severity=None, fields={}, add_meta_info=True):
 		# Import here to avoid Celery circular import and be able to use `delay`
-		from reconPoint.tasks import send_task_notif
+		from reconPoint.tasks import send_notif_digest, send_task_notif
+		if notification_aggregator.enabled:
+			scan_key = f'{self.scan_id}:{self.subscan_id}'
+			opened = notification_aggregator.add(scan_key, {
+				'task': name or self.task_name,
+				'status': self.status_str,
+				'severity': severity,
+				'fields': fields,
+				'fields_append': list(fields),
+				'traceback': self.traceback,
+				'output_path': self.output_path,
+				'result': bool(self.result),
+			})
+			if opened:
+				send_notif_digest.apply_async(
+					kwargs={'scan_history_id': self.scan_id, 'subscan_id': self.subscan_id},
+					countdown=notification_aggregator.window)
+			return
 		return send_task_notif.delay(
 			name or self.task_name,
 			status=self.status_str,
@@ -236,3 +399,21 @@ class ReconpointTask(Task):
 	def s(self, *args, **kwargs):
 		# TODO: set task status to INIT when creating a signature.
 		return super().s(*args, **kwargs)
+
+
+def append_celery_id(model, instance, celery_id):
+	"""Append a celery id to the `celery_ids` array of a ScanHistory or
+	SubScan with a single UPDATE.
+
+	Args:
+		model (Model): ScanHistory or SubScan.
+		instance (Model): Object to update.
+		celery_id (str): Celery task id.
+	"""
+	model.objects.filter(pk=instance.pk).update(
+		celery_ids=Func(
+			F('celery_ids'),
+			Value(celery_id),
+			function='array_append',
+			output_field=model._meta.get_field('celery_ids')))
+	instance.celery_ids.append(celery_id)
@@ -0,0 +1,160 @@
+import os
+import time
+import zlib
+
+#------------------------#
+# Spooled command output #
+#------------------------#
+# Command output is stored as a sequence of gzip members appended to a single
+# `.log.gz` file (readable with zcat). Every flush writes one member and one
+# line to the `.idx` sidecar:
+#   <uncompressed offset> <compressed offset> <uncompressed length>
+# so that byte ranges can be read by only decompressing the members covering
+# them. The index line is written after the member, so readers never see a
+# partial member.
+
+DEFAULT_FLUSH_INTERVAL = 2
+DEFAULT_FLUSH_SIZE = 64 * 1024
+
+
+class CommandLog:
+	"""Append-only compressed log of a command output.
+
+	Args:
+		path (str): Log file path (`.log.gz`).
+		flush_interval (int): Max seconds between two flushes.
+		flush_size (int): Max buffered bytes before a flush.
+	"""
+
+	def __init__(self, path, flush_interval=DEFAULT_FLUSH_INTERVAL, flush_size=DEFAULT_FLUSH_SIZE):
+		self.path = path
+		self.index_path = f'{path}.idx'
+		self.flush_interval = flush_interval
+		self.flush_size = flush_size
+		self.buffer = []
+		self.buffered = 0
+		self.size = get_log_size(path)
+		self.last_flush = time.monotonic()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def write(self, line):
+		"""Buffer a line of output, flushing if the buffer is too big or old.
+
+		Args:
+			line (str): Output line, without trailing newline.
+		"""
+		data = f'{line}\n'.encode('utf-8', errors='replace')
+		self.buffer.append(data)
+		self.buffered += len(data)
+		if self.buffered >= self.flush_size or time.monotonic() - self.last_flush >= self.flush_interval:
+			self.flush()
+
+	def flush(self):
+		"""Write buffered output as a new gzip member."""
+		self.last_flush = time.monotonic()
+		if not self.buffer:
+			return
+		data = b''.join(self.buffer)
+		self.buffer = []
+		self.buffered = 0
+		compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+		member = compressor.compress(data) + compressor.flush()
+		offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+		with open(self.path, 'ab') as f:
+			f.write(member)
+		with open(self.index_path, 'a') as f:
+			f.write(f'{self.size} {offset} {len(data)}\n')
+		self.size += len(data)
+
+	def close(self):
+		self.flush()
+
+
+def read_log_index(path):
+	"""Read the member index of a log.
+
+	Args:
+		path (str): Log file path.
+
+	Returns:
+		list: (uncompressed offset, compressed offset, uncompressed length)
+			tuples, in file order.
+	"""
+	index_path = f'{path}.idx'
+	if not os.path.exists(index_path):
+		return []
+	entries = []
+	with open(index_path) as f:
+		for line in f:
+			parts = line.split()
+			if len(parts) == 3:
+				entries.append(tuple(int(part) for part in parts))
+	return entries
+
+
+def get_log_size(path):
+	"""Get the uncompressed size of a log.
+
+	Args:
+		path (str): Log file path.
+
+	Returns:
+		int: Size in bytes.
+	"""
+	index = read_log_index(path)
+	if not index:
+		return 0
+	offset, _, length = index[-1]
+	return offset + length
+
+
+def read_log(path, offset=0, length=None):
+	"""Read a range of uncompressed bytes from a log.
+
+	Args:
+		path (str): Log file path.
+		offset (int): Uncompressed start offset.
+		length (int, optional): Max number of bytes. Reads to the end if None.
+
+	Returns:
+		bytes: Log content.
+	"""
+	offset = max(offset, 0)
+	end = None if length is None else offset + max(length, 0)
+	chunks = []
+	index = read_log_index(path)
+	if not index:
+		return b''
+	with open(path, 'rb') as f:
+		for i, (member_offset, compressed_offset, member_length) in enumerate(index):
+			if member_offset + member_length <= offset:
+				continue
+			if end is not None and member_offset >= end:
+				break
+			next_offset = index[i + 1][1] if i + 1 < len(index) else None
+			f.seek(compressed_offset)
+			compressed = f.read(next_offset - compressed_offset) if next_offset else f.read()
+			data = zlib.decompressobj(31).decompress(compressed)
+			start = max(offset - member_offset, 0)
+			stop = None if end is None else end - member_offset
+			chunks.append(data[start:stop])
+	return b''.join(chunks)
+
+
+def tail_log(path, length):
+	"""Read the last bytes of a log.
+
+	Args:
+		path (str): Log file path.
+		length (int): Number of bytes.
+
+	Returns:
+		tuple: (offset of the returned content, bytes).
+	"""
+	offset = max(get_log_size(path) - length, 0)
+	return offset, read_log(path, offset)
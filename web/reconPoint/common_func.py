@@ -1,9 +1,9 @@
+import functools
+import re
 import whatportis
 import socket
 import json
 import os
-import pickle
-import random
 import shutil
 import traceback
 import ipaddress
@@ -13,26 +13,38 @@ import requests
 import tldextract
 import xmltodict
 
-from time import sleep
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 from celery.utils.log import get_task_logger
-from discord_webhook import DiscordEmbed, DiscordWebhook
+from django.core.exceptions import ValidationError
 from django.db.models import Q
+from django.utils import timezone
 from dotted_dict import DottedDict
 
 from reconPoint.common_serializers import *
 from reconPoint.definitions import *
+from reconPoint.notif_dispatcher import NotificationDispatcher, NotificationMessage
+from reconPoint.proxy_pool import ProxyPool, parse_proxies
+from reconPoint.scope import get_scope_engine
 from reconPoint.settings import *
+from reconPoint.settings_snapshot import settings_snapshot
 from scanEngine.models import *
 from dashboard.models import *
 from startScan.models import *
 from targetApp.models import *
 from reconPoint.utilities import is_valid_url
+from scanEngine.engine_config import parse_engine_config
 
 
 logger = get_task_logger(__name__)
 DISCORD_WEBHOOKS_CACHE = redis.Redis.from_url(CELERY_BROKER_URL)
+notification_dispatcher = NotificationDispatcher(
+	timeout=NOTIFICATION_TIMEOUT,
+	max_retries=NOTIFICATION_MAX_RETRIES)
+proxy_pool = ProxyPool(
+	redis.Redis.from_url(CELERY_BROKER_URL),
+	max_in_use=PROXY_POOL_MAX_IN_USE,
+	check_url=PROXY_POOL_CHECK_URL)
 
 #------------------#
 # EngineType utils #
@@ -52,7 +64,7 @@ def dump_custom_scan_engines(results_dir):
 
 def load_custom_scan_engines(results_dir):
 	"""Load custom scan engines from YAML files. The filename without .yaml will
-	be used as the engine name.
+	be used as the engine name. Invalid configurations are skipped.
 
 	Args:
 		results_dir (str): Results directory containing engines configs.
@@ -67,9 +79,14 @@ def load_custom_scan_engines(results_dir):
 		with open(full_path, 'r') as f:
 			yaml_configuration = f.read()
 
-		engine, _ = EngineType.objects.get_or_create(engine_name=engine_name)
-		engine.yaml_configuration = yaml_configuration
-		engine.save()
+		try:
+			parse_engine_config(yaml_configuration)
+		except ValidationError as e:
+			logger.error(f'Invalid configuration of scan engine {engine_name}, skipping it: {"; ".join(e.messages)}')
+			continue
+		EngineType.objects.update_or_create(
+			engine_name=engine_name,
+			defaults={'yaml_configuration': yaml_configuration})
 
 
 #--------------------------------#
@@ -103,16 +120,55 @@ def get_lookup_keywords():
 # SubDomain queries #
 #-------------------#
 
-def get_subdomains(write_filepath=None, exclude_subdomains=False, ctx={}):
-	"""Get Subdomain objects from DB.
+def get_delta_base_names(base_scan_id):
+	"""Get the subdomain names found by the base scan of a delta scan.
+
+	Args:
+		base_scan_id (int): Base ScanHistory id.
+
+	Returns:
+		QuerySet: Subdomain names, to be used as a subquery.
+	"""
+	return Subdomain.objects.filter(scan_history_id=base_scan_id).values('name')
+
+
+def write_lines(lines, write_filepath=None, as_list=True):
+	"""Write streamed lines to a file as they come, and collect them.
+
+	Args:
+		lines (iterable): Lines.
+		write_filepath (str, optional): Write lines to this file.
+		as_list (bool): Collect lines in a list. Only the number of lines is
+			kept otherwise.
+
+	Returns:
+		list or int: Lines, or number of lines if not `as_list`.
+	"""
+	collected = []
+	count = 0
+	f = open(write_filepath, 'w') if write_filepath else None
+	try:
+		for line in lines:
+			if f:
+				f.write(f'\n{line}' if count else line)
+			if as_list:
+				collected.append(line)
+			count += 1
+	finally:
+		if f:
+			f.close()
+	return collected if as_list else count
+
+
+def iter_subdomains(exclude_subdomains=False, ctx={}):
+	"""Stream Subdomain names from DB, with a server-side cursor.
 
 	Args:
-		write_filepath (str): Write info back to a file.
 		exclude_subdomains (bool): Exclude subdomains, only return subdomain matching domain.
 		ctx (dict): ctx
 
-	Returns:
-		list: List of subdomains matching query.
+	Yields:
+		str: Subdomain names matching query, sorted.
 	"""
 	domain_id = ctx.get('domain_id')
 	scan_id = ctx.get('scan_history_id')
@@ -120,33 +176,52 @@ def get_subdomains(write_filepath=None, exclude_subdomains=False, ctx={}):
 	exclude_subdomains = ctx.get('exclude_subdomains', False)
 	url_filter = ctx.get('url_filter', '')
 	domain = Domain.objects.filter(pk=domain_id).first()
-	scan = ScanHistory.objects.filter(pk=scan_id).first()
 
 	query = Subdomain.objects
 	if domain:
 		query = query.filter(target_domain=domain)
-	if scan:
-		query = query.filter(scan_history=scan)
+	if scan_id:
+		query = query.filter(scan_history_id=scan_id)
 	if subdomain_id:
 		query = query.filter(pk=subdomain_id)
 	elif domain and exclude_subdomains:
 		query = query.filter(name=domain.name)
-	subdomain_query = query.distinct('name').order_by('name')
-	subdomains = [
-		subdomain.name
-		for subdomain in subdomain_query.all()
-		if subdomain.name
-	]
-	if not subdomains:
-		logger.error('No subdomains were found in query !')
+	if ctx.get('delta_base_id') and not subdomain_id:
+		# Delta scan: subdomains known by the base scan are not scanned again
+		query = query.exclude(name__in=get_delta_base_names(ctx['delta_base_id']))
+	names = (
+		query
+		.exclude(name='')
+		.order_by('name')
+		.distinct('name')
+		.values_list('name', flat=True)
+	)
+	for name in names.iterator(chunk_size=RECONPOINT_BULK_BATCH_SIZE):
+		if not name:
+			continue
+		yield f'{name}/{url_filter}' if url_filter else name
 
-	if url_filter:
-		subdomains = [f'{subdomain}/{url_filter}' for subdomain in subdomains]
 
-	if write_filepath:
-		with open(write_filepath, 'w') as f:
-			f.write('\n'.join(subdomains))
+def get_subdomains(write_filepath=None, exclude_subdomains=False, as_list=True, ctx={}):
+	"""Get Subdomain names from DB, streamed to a file.
 
+	Args:
+		write_filepath (str): Write info back to a file.
+		exclude_subdomains (bool): Exclude subdomains, only return subdomain matching domain.
+		as_list (bool): Return the subdomains. Only their number is returned
+			otherwise, so that memory does not grow with the results.
+		ctx (dict): ctx
+
+	Returns:
+		list: List of subdomains matching query, or their number if not
+			`as_list`.
+	"""
+	subdomains = write_lines(
+		iter_subdomains(exclude_subdomains=exclude_subdomains, ctx=ctx),
+		write_filepath=write_filepath,
+		as_list=as_list)
+	if not subdomains:
+		logger.error('No subdomains were found in query !')
 	return subdomains
 
 def get_new_added_subdomain(scan_id, domain_id):
@@ -277,43 +352,64 @@ def get_interesting_subdomains(scan_history=None, domain_id=None):
 # EndPoint queries #
 #------------------#
 
-def get_http_urls(
+@functools.lru_cache(maxsize=None)
+def get_ignored_files_regex():
+	"""Get a PostgreSQL regex matching the URLs of files whose path ends
+	with an extension of fixtures/extensions.txt. The file is read once per
+	process.
+
+	Returns:
+		str: Regex.
+	"""
+	extensions_path = f'{RECONPOINT_HOME}/fixtures/extensions.txt'
+	with open(extensions_path, 'r') as f:
+		extensions = [line.strip() for line in f if line.strip()]
+	alternatives = '|'.join(re.escape(extension) for extension in extensions)
+	return rf'^[a-zA-Z][a-zA-Z0-9+.-]*://[^/?#]*/[^?#;]*({alternatives})([;?#]|$)'
+
+
+def iter_http_urls(
 		is_alive=False,
 		is_uncrawled=False,
 		strict=False,
 		ignore_files=False,
-		write_filepath=None,
 		exclude_subdomains=False,
 		get_only_default_urls=False,
 		ctx={}):
-	"""Get HTTP urls from EndPoint objects in DB. Support filtering out on a
-	specific path.
+	"""Stream HTTP urls of EndPoint objects from DB, with a server-side
+	cursor. All filters run in SQL, except URL validation. Support filtering
+	out on a specific path.
 
 	Args:
 		is_alive (bool): If True, select only alive urls.
 		is_uncrawled (bool): If True, select only urls that have not been crawled.
-		write_filepath (str): Write info back to a file.
-		get_only_default_urls (bool):
+		strict (bool): If True, select only the URL of the path filter.
+		ignore_files (bool): If True, ignore static file URLs.
+		exclude_subdomains (bool): If True, select only the domain URL.
+		get_only_default_urls (bool): If True, select only default URLs.
 
-	Returns:
-		list: List of URLs matching query.
+	Yields:
+		str: URLs matching query, sorted.
 	"""
 	domain_id = ctx.get('domain_id')
 	scan_id = ctx.get('scan_history_id')
 	subdomain_id = ctx.get('subdomain_id')
 	url_filter = ctx.get('url_filter', '')
 	domain = Domain.objects.filter(pk=domain_id).first()
-	scan = ScanHistory.objects.filter(pk=scan_id).first()
 
 	query = EndPoint.objects
 	if domain:
 		query = query.filter(target_domain=domain)
-	if scan:
-		query = query.filter(scan_history=scan)
+	if scan_id:
+		query = query.filter(scan_history_id=scan_id)
 	if subdomain_id:
 		query = query.filter(subdomain__id=subdomain_id)
 	elif exclude_subdomains and domain:
 		query = query.filter(http_url=domain.http_url)
+	if ctx.get('delta_base_id') and not subdomain_id:
+		# Delta scan: endpoints of subdomains known by the base scan are not
+		# scanned again
+		query = query.exclude(subdomain__name__in=get_delta_base_names(ctx['delta_base_id']))
 	if get_only_default_urls:
 		query = query.filter(is_default=True)
 
@@ -322,6 +418,11 @@ def get_http_urls(
 	if is_uncrawled:
 		query = query.filter(http_status__isnull=True)
 
+	# If is_alive is True, select only endpoints that are alive (see
+	# EndPoint.is_alive)
+	if is_alive:
+		query = query.filter(http_status__gt=0, http_status__lt=500).exclude(http_status=404)
+
 	# If a path is passed, select only endpoints that contains it
 	if url_filter and domain:
 		url = f'{domain.name}{url_filter}'
@@ -330,28 +431,60 @@ def get_http_urls(
 		else:
 			query = query.filter(http_url__contains=url)
 
+	# Ignore all files
+	if ignore_files:
+		query = query.exclude(http_url__regex=get_ignored_files_regex())
+
 	# Select distinct endpoints and order
-	endpoints = query.distinct('http_url').order_by('http_url').all()
+	urls = (
+		query
+		.filter(http_url__regex=r'^https?://')
+		.order_by('http_url')
+		.distinct('http_url')
+		.values_list('http_url', flat=True)
+	)
+	for url in urls.iterator(chunk_size=RECONPOINT_BULK_BATCH_SIZE):
+		if is_valid_url(url):
+			yield url
 
-	# If is_alive is True, select only endpoints that are alive
-	if is_alive:
-		endpoints = [e for e in endpoints if e.is_alive]
 
-	# Grab only http_url from endpoint objects
-	endpoints = [e.http_url for e in endpoints if is_valid_url(e.http_url)]
-	if ignore_files: # ignore all files
-		extensions_path = f'{RECONPOINT_HOME}/fixtures/extensions.txt'
-		with open(extensions_path, 'r') as f:
-			extensions = tuple(f.strip() for f in f.readlines())
-		endpoints = [e for e in endpoints if not urlparse(e).path.endswith(extensions)]
+def get_http_urls(
+		is_alive=False,
+		is_uncrawled=False,
+		strict=False,
+		ignore_files=False,
+		write_filepath=None,
+		exclude_subdomains=False,
+		get_only_default_urls=False,
+		as_list=True,
+		ctx={}):
+	"""Get HTTP urls from EndPoint objects in DB, streamed to a file. Support
+	filtering out on a specific path.
+
+	Args:
+		is_alive (bool): If True, select only alive urls.
+		is_uncrawled (bool): If True, select only urls that have not been crawled.
+		write_filepath (str): Write info back to a file.
+		get_only_default_urls (bool):
+		as_list (bool): Return the URLs. Only their number is returned
+			otherwise, so that memory does not grow with the results.
 
+	Returns:
+		list: List of URLs matching query, or their number if not `as_list`.
+	"""
+	endpoints = write_lines(
+		iter_http_urls(
+			is_alive=is_alive,
+			is_uncrawled=is_uncrawled,
+			strict=strict,
+			ignore_files=ignore_files,
+			exclude_subdomains=exclude_subdomains,
+			get_only_default_urls=get_only_default_urls,
+			ctx=ctx),
+		write_filepath=write_filepath,
+		as_list=as_list)
 	if not endpoints:
 		logger.error(f'No endpoints were found in query !')
-
-	if write_filepath:
-		with open(write_filepath, 'w') as f:
-			f.write('\n'.join(endpoints))
-
 	return endpoints
 
 def get_interesting_endpoints(scan_history=None, target=None):
@@ -501,18 +634,19 @@ def extract_path_from_url(url):
 
 
 def get_random_proxy():
-	"""Get a random proxy from the list of proxies input by user in the UI.
+	"""Get a proxy from the list of proxies input by user in the UI, picked
+	at random weighted by health (see reconPoint.proxy_pool). The proxy is
+	leased until the end of the current task.
 
 	Returns:
 		str: Proxy name or '' if no proxy defined in db or use_proxy is False.
 	"""
-	if not Proxy.objects.all().exists():
+	proxy = settings_snapshot.get('proxy')
+	if not (proxy and proxy.use_proxy):
 		return ''
-	proxy = Proxy.objects.first()
-	if not proxy.use_proxy:
-		return ''
-	proxy_name = random.choice(proxy.proxies.splitlines())
-	logger.warning('Using proxy: ' + proxy_name)
+	proxy_name = proxy_pool.acquire(parse_proxies(proxy.proxies))
+	if proxy_name:
+		logger.warning('Using proxy: ' + proxy_name)
 	return proxy_name
 
 def remove_ansi_escape_sequences(text):
@@ -575,198 +709,235 @@ def get_cms_details(url):
 # NOTIFICATION UTILS #
 #--------------------#
 
-def send_telegram_message(message):
-	"""Send Telegram message.
+def send_notification_messages(messages):
+	"""Send notification messages concurrently and log their delivery.
+
+	Args:
+		messages (list): NotificationMessage objects, None items are skipped.
+
+	Returns:
+		list: Delivery objects.
+	"""
+	deliveries = notification_dispatcher.send(messages)
+	for delivery in deliveries:
+		if delivery.delivered:
+			logger.info(
+				f'Notification sent to {delivery.channel} in {delivery.latency:.2f}s '
+				f'({delivery.attempts} attempts)')
+		else:
+			logger.error(
+				f'Error while sending notification to {delivery.channel} after '
+				f'{delivery.attempts} attempts: {delivery.error}')
+	return deliveries
+
+
+def get_telegram_message(message, notif):
+	"""Build Telegram message.
 
 	Args:
 		message (str): Message.
+		notif (Notification): Notification settings.
+
+	Returns:
+		NotificationMessage: Message, or None if Telegram is disabled.
 	"""
-	notif = Notification.objects.first()
 	do_send = (
 		notif and
 		notif.send_to_telegram and
 		notif.telegram_bot_token and
 		notif.telegram_bot_chat_id)
 	if not do_send:
-		return
-	telegram_bot_token = notif.telegram_bot_token
-	telegram_bot_chat_id = notif.telegram_bot_chat_id
-	send_url = f'https://api.telegram.org/bot{telegram_bot_token}/sendMessage?chat_id={telegram_bot_chat_id}&parse_mode=Markdown&text={message}'
-	requests.get(send_url)
+		return None
+	return NotificationMessage(
+		'telegram',
+		f'https://api.telegram.org/bot{notif.telegram_bot_token}/sendMessage',
+		{
+			'chat_id': notif.telegram_bot_chat_id,
+			'parse_mode': 'Markdown',
+			'text': message
+		})
 
 
-def send_slack_message(message):
-	"""Send Slack message.
+def get_slack_message(message, notif):
+	"""Build Slack message.
 
 	Args:
 		message (str): Message.
+		notif (Notification): Notification settings.
+
+	Returns:
+		NotificationMessage: Message, or None if Slack is disabled.
 	"""
-	headers = {'content-type': 'application/json'}
-	message = {'text': message}
-	notif = Notification.objects.first()
-	do_send = (
-		notif and
-		notif.send_to_slack and
-		notif.slack_hook_url)
-	if not do_send:
-		return
-	hook_url = notif.slack_hook_url
-	requests.post(url=hook_url, data=json.dumps(message), headers=headers)
+	if not (notif and notif.send_to_slack and notif.slack_hook_url):
+		return None
+	return NotificationMessage('slack', notif.slack_hook_url, {'text': message})
 
-def send_lark_message(message):
-	"""Send lark message.
+
+def get_lark_message(message, notif):
+	"""Build Lark message.
 
 	Args:
 		message (str): Message.
+		notif (Notification): Notification settings.
+
+	Returns:
+		NotificationMessage: Message, or None if Lark is disabled.
 	"""
-	headers = {'content-type': 'application/json'}
-	message = {"msg_type":"interactive","card":{"elements":[{"tag":"div","text":{"content":message,"tag":"lark_md"}}]}}
-	notif = Notification.objects.first()
-	do_send = (
-		notif and
-		notif.send_to_lark and
-		notif.lark_hook_url)
-	if not do_send:
-		return
-	hook_url = notif.lark_hook_url
-	requests.post(url=hook_url, data=json.dumps(message), headers=headers)
+	if not (notif and notif.send_to_lark and notif.lark_hook_url):
+		return None
+	payload = {"msg_type":"interactive","card":{"elements":[{"tag":"div","text":{"content":message,"tag":"lark_md"}}]}}
+	return NotificationMessage('lark', notif.lark_hook_url, payload)
+
 
-def send_discord_message(
+def get_discord_message(
 		message,
+		notif,
 		title='',
 		severity=None,
 		url=None,
 		files=None,
 		fields={},
-		fields_append=[]):
-	"""Send Discord message.
+		fields_append=[],
+		username=None):
+	"""Build Discord message.
 
 	If title and fields are specified, ignore the 'message' and create a Discord
-	embed that can be updated later if specifying the same title (title is the
+	embed that is edited by later messages with the same title (title is the
 	cache key).
 
 	Args:
 		message (str): Message to send. If an embed is used, this is ignored.
+		notif (Notification): Notification settings.
 		severity (str, optional): Severity. Colors are picked based on severity.
-		files (list, optional): List of files to attach to message.
+		files (list, optional): List of (path, name) files to attach to message.
 		title (str, optional): Discord embed title.
 		url (str, optional): Discord embed URL.
 		fields (dict, optional): Discord embed fields.
 		fields_append (list, optional): Discord embed field names to update
 			instead of overwrite.
-	"""
+		username (str, optional): Webhook username override.
 
-	# Check if do send
-	notif = Notification.objects.first()
+	Returns:
+		NotificationMessage: Message, or None if Discord is disabled.
+	"""
 	if not (notif and notif.send_to_discord and notif.discord_hook_url):
-		return False
-
-	# If fields and title, use an embed
-	use_discord_embed = fields and title
-	if use_discord_embed:
-		message = '' # no need for message in embeds
-
-	# Check for cached response in cache, using title as key
-	cached_response = DISCORD_WEBHOOKS_CACHE.get(title) if title else None
-	if cached_response:
-		cached_response = pickle.loads(cached_response)
-
-	# Get existing webhook if found in cache
-	cached_webhook = DISCORD_WEBHOOKS_CACHE.get(title + '_webhook') if title else None
-	if cached_webhook:
-		webhook = pickle.loads(cached_webhook)
-		webhook.remove_embeds()
-	else:
-		webhook = DiscordWebhook(
-			url=notif.discord_hook_url,
-			rate_limit_retry=False,
-			content=message)
-
-	# Get existing embed if found in cache
-	embed = None
-	cached_embed = DISCORD_WEBHOOKS_CACHE.get(title + '_embed') if title else None
-	if cached_embed:
-		embed = pickle.loads(cached_embed)
-	elif use_discord_embed:
-		embed = DiscordEmbed(title=title)
-
-	# Set embed fields
-	if embed:
+		return None
+	hook_url, _, query = notif.discord_hook_url.partition('?')
+	query = f'{query}&wait=true' if query else 'wait=true'
+	payload = {'content': message}
+	if username:
+		payload['username'] = username
+	method = 'POST'
+	request_url = f'{hook_url}?{query}'
+	on_delivered = None
+
+	# If fields and title, use an embed. Embeds are stored as JSON with the id
+	# of the Discord message showing them, so that they can be edited later.
+	if fields and title:
+		payload['content'] = '' # no need for message in embeds
+		embed_key = f'discord_embed:{title}'
+		message_key = f'discord_message:{title}'
+		cached_embed = DISCORD_WEBHOOKS_CACHE.get(embed_key)
+		embed = json.loads(cached_embed) if cached_embed else {'title': title, 'fields': []}
 		if url:
-			embed.set_url(url)
+			embed['url'] = url
 		if severity:
-			embed.set_color(DISCORD_SEVERITY_COLORS[severity])
-		embed.set_description(message)
-		embed.set_timestamp()
-		existing_fields_dict = {field['name']: field['value'] for field in embed.fields}
+			embed['color'] = int(DISCORD_SEVERITY_COLORS[severity], 16)
+		embed['timestamp'] = timezone.now().isoformat()
 		logger.debug(''.join([f'\n\t{k}: {v}' for k, v in fields.items()]))
+		existing_fields = {field['name']: field for field in embed['fields']}
 		for name, value in fields.items():
 			if not value: # cannot send empty field values to Discord [error 400]
 				continue
 			value = str(value)
-			new_field = {'name': name, 'value': value, 'inline': False}
 
 			# If field already existed in previous embed, update it.
-			if name in existing_fields_dict.keys():
-				field = [f for f in embed.fields if f['name'] == name][0]
-
-				# Append to existing field value
-				if name in fields_append:
-					existing_val = field['value']
-					existing_val = str(existing_val)
-					if value not in existing_val:
-						value = f'{existing_val}\n{value}'
-
-					if len(value) > 1024: # character limit for embed field
-						value = value[0:1016] + '\n[...]'
-
-				# Update existing embed
-				ix = embed.fields.index(field)
-				embed.fields[ix]['value'] = value
-
-			else:
-				embed.add_embed_field(**new_field)
-
-		webhook.add_embed(embed)
-
-		# Add webhook and embed objects to cache, so we can pick them up later
-		DISCORD_WEBHOOKS_CACHE.set(title + '_webhook', pickle.dumps(webhook))
-		DISCORD_WEBHOOKS_CACHE.set(title + '_embed', pickle.dumps(embed))
-
-	# Add files to webhook
-	if files:
-		for (path, name) in files:
-			with open(path, 'r') as f:
-				content = f.read()
-			webhook.add_file(content, name)
-
-	# Edit webhook if it already existed, otherwise send new webhook
-	if cached_response:
-		response = webhook.edit(cached_response)
-	else:
-		response = webhook.execute()
-		if use_discord_embed and response.status_code == 200:
-			DISCORD_WEBHOOKS_CACHE.set(title, pickle.dumps(response))
-
-	# Get status code
-	if response.status_code == 429:
-		errors = json.loads(
-			response.content.decode('utf-8'))
-		wh_sleep = (int(errors['retry_after']) / 1000) + 0.15
-		sleep(wh_sleep)
-		send_discord_message(
-				message,
-				title,
-				severity,
-				url,
-				files,
-				fields,
-				fields_append)
-	elif response.status_code != 200:
-		logger.error(
-			f'Error while sending webhook data to Discord.'
-			f'\n\tHTTP code: {response.status_code}.'
-			f'\n\tDetails: {response.content}')
+			field = existing_fields.get(name)
+			if not field:
+				embed['fields'].append({'name': name, 'value': value, 'inline': False})
+				continue
+
+			# Append to existing field value
+			if name in fields_append:
+				existing_val = str(field['value'])
+				if value not in existing_val:
+					value = f'{existing_val}\n{value}'
+
+				if len(value) > 1024: # character limit for embed field
+					value = value[0:1016] + '\n[...]'
+			field['value'] = value
+
+		payload['embeds'] = [embed]
+		DISCORD_WEBHOOKS_CACHE.set(embed_key, json.dumps(embed))
+
+		# Edit message if it already exists, otherwise remember its id
+		message_id = DISCORD_WEBHOOKS_CACHE.get(message_key)
+		if message_id:
+			method = 'PATCH'
+			request_url = f'{hook_url}/messages/{message_id.decode()}?{query}'
+		else:
+			def remember_message_id(content):
+				DISCORD_WEBHOOKS_CACHE.set(message_key, json.loads(content)['id'])
+			on_delivered = remember_message_id
+
+	# Add files to message
+	attachments = []
+	for (path, name) in files or []:
+		with open(path, 'rb') as f:
+			attachments.append((name, f.read()))
+
+	return NotificationMessage(
+		'discord',
+		request_url,
+		payload,
+		method=method,
+		files=attachments,
+		on_delivered=on_delivered)
+
+
+def send_telegram_message(message, notif=None):
+	"""Send Telegram message.
+
+	Args:
+		message (str): Message.
+		notif (Notification, optional): Notification settings.
+	"""
+	notif = notif or settings_snapshot.get('notification')
+	send_notification_messages([get_telegram_message(message, notif)])
+
+
+def send_slack_message(message, notif=None):
+	"""Send Slack message.
+
+	Args:
+		message (str): Message.
+		notif (Notification, optional): Notification settings.
+	"""
+	notif = notif or settings_snapshot.get('notification')
+	send_notification_messages([get_slack_message(message, notif)])
+
+
+def send_lark_message(message, notif=None):
+	"""Send lark message.
+
+	Args:
+		message (str): Message.
+		notif (Notification, optional): Notification settings.
+	"""
+	notif = notif or settings_snapshot.get('notification')
+	send_notification_messages([get_lark_message(message, notif)])
+
+
+def send_discord_message(message, notif=None, **options):
+	"""Send Discord message.
+
+	Args:
+		message (str): Message.
+		notif (Notification, optional): Notification settings.
+		options (dict): Options of `get_discord_message`.
+	"""
+	notif = notif or settings_snapshot.get('notification')
+	send_notification_messages([get_discord_message(message, notif, **options)])
 
 
 def enrich_notification(message, scan_history_id, subscan_id):
@@ -857,12 +1028,6 @@ def get_task_header_message(name, scan_history_id, subscan_id):
 	return msg
 
 
-def get_task_cache_key(func_name, *args, **kwargs):
-	args_str = '_'.join([str(arg) for arg in args])
-	kwargs_str = '_'.join([f'{k}={v}' for k, v in kwargs.items() if k not in RECONPOINT_TASK_IGNORE_CACHE_KWARGS])
-	return f'{func_name}__{args_str}__{kwargs_str}'
-
-
 def get_output_file_name(scan_history_id, subscan_id, filename):
 	title = f'#{scan_history_id}'
 	if subscan_id:
@@ -1024,18 +1189,15 @@ def get_domain_historical_ip_address(domain):
 
 
 def get_open_ai_key():
-	openai_key = OpenAiAPIKey.objects.all()
-	return openai_key[0] if openai_key else None
+	return settings_snapshot.get('openai_api_key')
 
 
 def get_netlas_key():
-	netlas_key = NetlasAPIKey.objects.all()
-	return netlas_key[0] if netlas_key else None
+	return settings_snapshot.get('netlas_api_key')
 
 
 def get_chaos_key():
-	chaos_key = ChaosAPIKey.objects.all()
-	return chaos_key[0] if chaos_key else None
+	return settings_snapshot.get('chaos_api_key')
 
 
 def get_hackerone_key_username():
@@ -1043,8 +1205,30 @@ def get_hackerone_key_username():
 		Get the HackerOne API key username from the database.
 		Returns: a tuple of the username and api key
 	"""
-	hackerone_key = HackerOneAPIKey.objects.all()
-	return (hackerone_key[0].username, hackerone_key[0].key) if hackerone_key else None
+	hackerone_key = settings_snapshot.get('hackerone_api_key')
+	return (hackerone_key.username, hackerone_key.key) if hackerone_key else None
+
+
+def get_hackerone_api_key():
+	"""Get the HackerOne API key, if both username and key are set.
+
+	Returns:
+		HackerOneAPIKey: API key, or None.
+	"""
+	api_key = settings_snapshot.get('hackerone_api_key')
+	if api_key and api_key.username is not None and api_key.key is not None:
+		return api_key
+	return None
+
+
+def get_hackerone_settings():
+	"""Get the HackerOne report settings, if sending reports is enabled.
+
+	Returns:
+		Hackerone: HackerOne settings, or None.
+	"""
+	hackerone = settings_snapshot.get('hackerone')
+	return hackerone if hackerone and hackerone.send_report else None
 
 
 def parse_llm_vulnerability_report(report):
@@ -1106,6 +1290,8 @@ def get_port_service_description(port):
 	"""
 		Retrieves the standard service name and description for a given port 
 		number using whatportis and the builtin socket library as fallback.
+		Lookups are cached per worker process, building a port -> service
+		index as ports are seen.
 
 		Args:
 			port (int or str): The port number to look up. 
@@ -1114,9 +1300,25 @@ def get_port_service_description(port):
 		Returns:
 			dict: A dictionary containing the service name and description for the port number.
 	"""
-	logger.info('Fetching Port Service Name and Description')
 	try:
 		port = int(port)
+	except (TypeError, ValueError):
+		# port is not a valid int
+		return {
+			"service_name": "",
+			"description": ""
+		}
+	return dict(lookup_port_service(port))
+
+
+@functools.lru_cache(maxsize=None)
+def lookup_port_service(port):
+	"""Look up the service of a port number, see
+	`get_port_service_description`. Results are shared: copy before changing
+	them.
+	"""
+	logger.info('Fetching Port Service Name and Description')
+	try:
 		whatportis_result = whatportis.get_ports(str(port))
 		
 		if whatportis_result and whatportis_result[0].name:
@@ -1138,7 +1340,7 @@ def get_port_service_description(port):
 					"description": ""
 				}
 	except:
-		# port is not a valid int or any other exception
+		# any other exception
 		return {
 			"service_name": "",
 			"description": ""
@@ -1193,38 +1395,8 @@ def exclude_urls_by_patterns(exclude_paths, urls):
 			list of str: A new list containing URLs that don't match any exclusion pattern.
 	"""
 	logger.info('exclude_urls_by_patterns')
-	if not exclude_paths:
-		# if no exclude paths are passed and is empty list return all urls as it is
-		return urls
-	
-	compiled_patterns = []
-	for path in exclude_paths:
-		# treat each path as either regex or plain path
-		try:
-			raw_pattern = rf"{path}"  # Using an f-string inside the raw string
-			compiled_patterns.append(re.compile(raw_pattern))
-		except re.error:
-			compiled_patterns.append(path)
-
-	filtered_urls = []
-	for url in urls:
-		exclude = False
-		for pattern in compiled_patterns:
-			if isinstance(pattern, re.Pattern):
-				if pattern.search(url):
-					exclude = True
-					break
-			else:
-				if pattern in url: #if the word matches anywhere in url exclude
-					exclude = True
-					break
-		
-		# if none conditions matches then add the url to filtered urls
-		if not exclude:
-			filtered_urls.append(url)
+	return get_scope_engine(excluded_paths=exclude_paths).filter_urls(urls)
 
-	return filtered_urls
-	
 
 def get_domain_info_from_db(target):
 	"""
@@ -0,0 +1,162 @@
+import os
+from urllib.parse import urlparse
+
+from celery.utils.log import get_task_logger
+from django.db import connection
+from redis import Redis
+
+from reconPoint.definitions import ENDPOINT_DUPLICATE_FINGERPRINTS
+from reconPoint.settings import DELETE_DUPLICATES_THRESHOLD
+from reconPoint.writers import chunked
+from startScan.models import EndPoint
+
+logger = get_task_logger(__name__)
+
+#------------------------#
+# Endpoint deduplication #
+#------------------------#
+# Duplicate endpoints (e.g. pages that all redirect to the same login page)
+# are found in the database: endpoints are partitioned by a fingerprint
+# (response body hash, page title and content length, body simhash, or any
+# EndPoint field), window functions rank each partition by discovery date,
+# and every endpoint but the first of partitions bigger than a threshold is
+# removed with one bulk delete. Passes can be incremental: only endpoints
+# added since the previous pass (or given ids) are candidates for removal,
+# while all endpoints of the scan are ranked.
+
+WATERMARK_TTL = 7 * 86400
+# Paths kept even when duplicated: other pages often redirect to them
+KEPT_PATHS = ['', '/', '/login']
+
+DUPLICATES_SQL = '''
+	SELECT id, http_url, {columns} FROM (
+		SELECT id, http_url, {columns},
+			ROW_NUMBER() OVER (PARTITION BY {columns} ORDER BY discovered_date, id) AS rank,
+			COUNT(*) OVER (PARTITION BY {columns}) AS total
+		FROM {table}
+		WHERE {where}
+	) AS ranked
+	WHERE rank > 1 AND total > %s
+'''
+
+
+def get_fingerprint_fields(fingerprint):
+	"""Get the EndPoint fields of a duplicate fingerprint.
+
+	Args:
+		fingerprint (str): Fingerprint name (see
+			ENDPOINT_DUPLICATE_FINGERPRINTS) or EndPoint field name.
+
+	Returns:
+		list: EndPoint fields, None if the fingerprint is unknown.
+	"""
+	names = ENDPOINT_DUPLICATE_FINGERPRINTS.get(fingerprint, [fingerprint])
+	fields = {field.name: field for field in EndPoint._meta.concrete_fields}
+	if not all(name in fields and not fields[name].primary_key for name in names):
+		return None
+	return [fields[name] for name in names]
+
+
+def find_duplicate_endpoints(
+		fingerprint,
+		scan_history_id,
+		domain_id,
+		subdomain_id=None,
+		filter_status=[],
+		candidate_ids=None,
+		since_id=None,
+		threshold=DELETE_DUPLICATES_THRESHOLD):
+	"""Find the duplicates of a fingerprint with a single query.
+
+	Args:
+		fingerprint (str): Fingerprint name or EndPoint field name.
+		scan_history_id (int): ScanHistory id.
+		domain_id (int): Domain id.
+		subdomain_id (int, optional): Subdomain id.
+		filter_status (list): HTTP status codes of the ranked endpoints.
+		candidate_ids (iterable, optional): Only remove these endpoints.
+		since_id (int, optional): Only remove endpoints with a greater id.
+		threshold (int): Min partition size for duplicates to be removed.
+
+	Returns:
+		list: (endpoint id, http_url, fingerprint value) tuples.
+	"""
+	fields = get_fingerprint_fields(fingerprint)
+	if not fields:
+		logger.warning(f'Unknown duplicate fingerprint {fingerprint}. Skipping.')
+		return []
+	columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+	where = ['scan_history_id = %s', 'target_domain_id = %s']
+	params = [scan_history_id, domain_id]
+	if subdomain_id:
+		where.append('subdomain_id = %s')
+		params.append(subdomain_id)
+	if filter_status:
+		where.append(f'http_status IN ({", ".join(["%s"] * len(filter_status))})')
+		params.extend(filter_status)
+	where.extend(f'{connection.ops.quote_name(field.column)} IS NOT NULL' for field in fields)
+	sql = DUPLICATES_SQL.format(
+		columns=columns,
+		table=connection.ops.quote_name(EndPoint._meta.db_table),
+		where=' AND '.join(where))
+
+	candidate_ids = set(candidate_ids) if candidate_ids is not None else None
+	duplicates = []
+	with connection.cursor() as cursor:
+		cursor.execute(sql, params + [threshold])
+		for row in cursor.fetchall():
+			endpoint_id, http_url, value = row[0], row[1], row[2:]
+			if since_id is not None and endpoint_id <= since_id:
+				continue
+			if candidate_ids is not None and endpoint_id not in candidate_ids:
+				continue
+			if urlparse(http_url).path in KEPT_PATHS:
+				continue
+			duplicates.append((endpoint_id, http_url, value[0] if len(value) == 1 else value))
+	return duplicates
+
+
+def delete_endpoints(endpoint_ids, batch_size=1000):
+	"""Delete endpoints and their related rows in bulk.
+
+	Returns:
+		int: Number of deleted endpoints.
+	"""
+	deleted = 0
+	for batch in chunked(endpoint_ids, batch_size):
+		_, counts = EndPoint.objects.filter(id__in=batch).delete()
+		deleted += counts.get(EndPoint._meta.label, 0)
+	return deleted
+
+
+class DedupeWatermark:
+	"""Last endpoint id covered by a deduplication pass, per scope and
+	fingerprints, kept in Redis. Passes are full without Redis.
+
+	Args:
+		client (redis.Redis): Redis client.
+		prefix (str): Redis keys prefix.
+	"""
+
+	def __init__(self, client, prefix='endpoint_dedupe'):
+		self.client = client
+		self.prefix = prefix
+
+	def key(self, scope, fingerprints):
+		return f'{self.prefix}:{":".join(str(item) for item in scope)}:{",".join(fingerprints)}'
+
+	def get(self, scope, fingerprints):
+		if not self.client:
+			return None
+		value = self.client.get(self.key(scope, fingerprints))
+		return int(value) if value else None
+
+	def set(self, scope, fingerprints, endpoint_id):
+		if self.client and endpoint_id:
+			self.client.set(self.key(scope, fingerprints), endpoint_id, ex=WATERMARK_TTL)
+
+
+redis = None
+if 'CELERY_BROKER' in os.environ:
+	redis = Redis.from_url(os.environ['CELERY_BROKER'])
+dedupe_watermark = DedupeWatermark(redis)
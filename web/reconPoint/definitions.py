@@ -33,6 +33,9 @@ EXTENSIONS = 'extensions'
 EXCLUDED_SUBDOMAINS = 'exclude_subdomains'
 EXCLUDE_EXTENSIONS = 'exclude_extensions'
 EXCLUDE_TEXT = 'exclude_text'
+COLLAPSE_URL_VARIANTS = 'collapse_url_variants'
+CONCURRENCY = 'concurrency'
+DELTA_SCAN = 'delta_scan'
 FETCH_URL = 'fetch_url'
 GF_PATTERNS = 'gf_patterns'
 HTTP_CRAWL = 'http_crawl'
@@ -71,6 +74,7 @@ STOP_ON_ERROR = 'stop_on_error'
 ENABLE_HTTP_CRAWL = 'enable_http_crawl'
 THREADS = 'threads'
 TIMEOUT = 'timeout'
+TOOL_TIMEOUT = 'tool_timeout'
 USE_AMASS_CONFIG = 'use_amass_config'
 USE_NAABU_CONFIG = 'use_naabu_config'
 USE_NUCLEI_CONFIG = 'use_nuclei_config'
@@ -187,10 +191,34 @@ OSINT_DEFAULT_CONFIG = {
 
 # subdomain scan
 SUBDOMAIN_SCAN_DEFAULT_TOOLS = ['subfinder', 'ctfr', 'sublist3r', 'tlsx']
+SUBDOMAIN_DISCOVERY_DEFAULT_CONCURRENCY = 4
+# passive sources whose output can be reused across scans of a target
+SUBDOMAIN_PASSIVE_TOOLS = ['amass-passive', 'sublist3r', 'subfinder', 'oneforall', 'ctfr', 'netlas', 'chaos']
+
+# scan tasks descriptions shown in UI
+SCAN_TASK_DESCRIPTIONS = {
+    'subdomain_discovery': 'Subdomain discovery',
+    'osint': 'OS Intelligence',
+    'port_scan': 'Port scan',
+    'fetch_url': 'Fetch URL',
+    'dir_file_fuzz': 'Directories & files fuzz',
+    'vulnerability_scan': 'Vulnerability scan',
+    'screenshot': 'Screenshot',
+    'waf_detection': 'WAF detection',
+}
 
 # endpoints scan
 ENDPOINT_SCAN_DEFAULT_TOOLS = ['gospider']
 ENDPOINT_SCAN_DEFAULT_DUPLICATE_FIELDS = ['content_length', 'page_title']
+# duplicate endpoint fingerprints -> EndPoint fields. Other duplicate fields
+# are EndPoint field names.
+ENDPOINT_DUPLICATE_FINGERPRINTS = {
+    'body_hash': ['body_hash'],
+    'body_simhash': ['body_simhash'],
+    'title_length': ['page_title', 'content_length'],
+}
+# archive sources whose output can be reused across scans of a target
+FETCH_URL_ARCHIVE_TOOLS = ['gau', 'waybackurls']
 
 
 ###############################################################################
@@ -372,6 +400,7 @@ IGNORE_WHOIS_RELATED_KEYWORD = [
 
 
 # Default FETCH URL params
+DEFAULT_COLLAPSE_URL_VARIANTS = True
 DEFAULT_IGNORE_FILE_EXTENSIONS = [
     'png',
     'jpg',
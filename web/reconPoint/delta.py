@@ -0,0 +1,205 @@
+from celery.utils.log import get_task_logger
+from django.db import transaction
+
+from reconPoint.definitions import SUCCESS_TASK
+from reconPoint.writers import chunked
+from startScan.models import EndPoint, ScanHistory, Subdomain, Vulnerability
+
+logger = get_task_logger(__name__)
+
+#-------------#
+# Delta scans #
+#-------------#
+# A delta scan diffs the subdomains it enumerates against the last completed
+# scan of the same domain with the same engine, so that carried forward
+# results come from the same tasks as the ones skipped. New subdomains go
+# through the active tasks (HTTP crawl, port scan, screenshots, fuzzing,
+# vulnerability scans) as usual. Known subdomains are not scanned again: their
+# probe results, endpoints and vulnerabilities are carried forward from the
+# base scan. Shared rows (technologies, IPs and ports, WAFs, directory scans,
+# vulnerability tags, references, CVEs and CWEs) are linked by reference, only
+# the rows that are scoped to a scan (endpoints, vulnerabilities) are copied.
+# Subdomains are diffed by name only: a known subdomain whose IPs, status or
+# endpoints changed since the base scan is not detected, and is only scanned
+# again by a full scan.
+
+SUBDOMAIN_CARRIED_FIELDS = [
+	'http_url',
+	'http_status',
+	'page_title',
+	'content_type',
+	'content_length',
+	'response_time',
+	'webserver',
+	'screenshot_path',
+	'http_header_path',
+	'cname',
+	'is_cdn',
+	'cdn_name',
+	'attack_surface',
+]
+SUBDOMAIN_CARRIED_LINKS = ['technologies', 'ip_addresses', 'directories', 'waf']
+ENDPOINT_CARRIED_LINKS = ['techs']
+VULNERABILITY_CARRIED_LINKS = ['tags', 'references', 'cve_ids', 'cwe_ids']
+
+
+def get_delta_base(scan):
+	"""Get the scan a delta scan is diffed against: the last completed scan
+	of the same domain with the same engine. A scan run with another engine
+	may have skipped tasks of this one, leaving known subdomains with results
+	that were never collected.
+
+	Args:
+		scan (startScan.models.ScanHistory): Delta scan.
+
+	Returns:
+		startScan.models.ScanHistory: Base scan, or None.
+	"""
+	return (
+		ScanHistory.objects
+		.filter(domain_id=scan.domain_id, scan_type_id=scan.scan_type_id, scan_status=SUCCESS_TASK)
+		.exclude(pk=scan.pk)
+		.order_by('-start_scan_date')
+		.first()
+	)
+
+
+def split_known_subdomains(subdomains, base_scan_id):
+	"""Split subdomains between the ones that are new and the ones that were
+	already found by the base scan.
+
+	Args:
+		subdomains (list): Subdomain objects of the delta scan.
+		base_scan_id (int): Base ScanHistory id.
+
+	Returns:
+		tuple: (new subdomains, known subdomains).
+	"""
+	names = [subdomain.name for subdomain in subdomains]
+	known_names = set()
+	for chunk in chunked(names):
+		known_names.update(
+			Subdomain.objects
+			.filter(scan_history_id=base_scan_id, name__in=chunk)
+			.values_list('name', flat=True)
+		)
+	new = [subdomain for subdomain in subdomains if subdomain.name not in known_names]
+	known = [subdomain for subdomain in subdomains if subdomain.name in known_names]
+	return new, known
+
+
+@transaction.atomic
+def carry_forward_subdomains(subdomains, base_scan_id):
+	"""Carry forward the results of known subdomains from the base scan.
+
+	Args:
+		subdomains (list): Known Subdomain objects of the delta scan.
+		base_scan_id (int): Base ScanHistory id.
+
+	Returns:
+		dict: Number of carried forward subdomains, endpoints and
+			vulnerabilities.
+	"""
+	by_name = {subdomain.name: subdomain for subdomain in subdomains}
+	subdomain_ids = {}
+	for chunk in chunked(list(by_name)):
+		base_subdomains = Subdomain.objects.filter(scan_history_id=base_scan_id, name__in=chunk)
+		updated = []
+		for base in base_subdomains:
+			subdomain = by_name[base.name]
+			for field in SUBDOMAIN_CARRIED_FIELDS:
+				setattr(subdomain, field, getattr(base, field))
+			subdomain_ids[base.id] = subdomain.id
+			updated.append(subdomain)
+		Subdomain.objects.bulk_update(updated, SUBDOMAIN_CARRIED_FIELDS)
+	if not subdomain_ids:
+		return {'subdomains': 0, 'endpoints': 0, 'vulnerabilities': 0}
+	scan_id = subdomains[0].scan_history_id
+	copy_links(Subdomain, SUBDOMAIN_CARRIED_LINKS, subdomain_ids)
+
+	# Endpoints, skipping the ones already saved by this scan
+	endpoints = EndPoint.objects.filter(scan_history_id=base_scan_id, subdomain_id__in=list(subdomain_ids))
+	endpoint_ids = copy_rows(
+		endpoints,
+		unique_field='http_url',
+		scan_history_id=scan_id,
+		subdomain_id=lambda row: subdomain_ids[row['subdomain_id']])
+	copy_links(EndPoint, ENDPOINT_CARRIED_LINKS, endpoint_ids)
+
+	# Vulnerabilities
+	vulns = Vulnerability.objects.filter(scan_history_id=base_scan_id, subdomain_id__in=list(subdomain_ids))
+	vuln_ids = copy_rows(
+		vulns,
+		scan_history_id=scan_id,
+		subdomain_id=lambda row: subdomain_ids[row['subdomain_id']],
+		endpoint_id=lambda row: endpoint_ids.get(row['endpoint_id']))
+	copy_links(Vulnerability, VULNERABILITY_CARRIED_LINKS, vuln_ids)
+
+	counts = {
+		'subdomains': len(subdomain_ids),
+		'endpoints': len(endpoint_ids),
+		'vulnerabilities': len(vuln_ids),
+	}
+	logger.info(f'Carried forward results of scan {base_scan_id} to scan {scan_id}: {counts}')
+	return counts
+
+
+def copy_rows(queryset, unique_field=None, **overrides):
+	"""Bulk copy rows, overriding some of their fields.
+
+	Args:
+		queryset (QuerySet): Rows to copy.
+		unique_field (str, optional): Field unique per scan. Rows whose value
+			already exists in the target scan are not copied, and are mapped
+			to the existing row instead.
+		overrides (dict): Field attname -> value, or callable taking the
+			source row values and returning the value.
+
+	Returns:
+		dict: Source row id -> copied row id.
+	"""
+	model = queryset.model
+	fields = [field.attname for field in model._meta.concrete_fields if not field.primary_key]
+	id_map = {}
+	for chunk in chunked(queryset.values('id', *fields).iterator()):
+		if unique_field:
+			values = [row[unique_field] for row in chunk]
+			existing = dict(
+				model.objects
+				.filter(scan_history_id=overrides['scan_history_id'], **{f'{unique_field}__in': values})
+				.values_list(unique_field, 'id')
+			)
+		source_ids = []
+		objs = []
+		for row in chunk:
+			source_id = row.pop('id')
+			if unique_field and row[unique_field] in existing:
+				id_map[source_id] = existing[row[unique_field]]
+				continue
+			for attname, value in overrides.items():
+				row[attname] = value(row) if callable(value) else value
+			source_ids.append(source_id)
+			objs.append(model(**row))
+		model.objects.bulk_create(objs)
+		id_map.update(zip(source_ids, [obj.id for obj in objs]))
+	return id_map
+
+
+def copy_links(model, field_names, id_map):
+	"""Link copied rows to the same related rows as their source.
+
+	Args:
+		model (Model): Model of the copied rows.
+		field_names (list): ManyToMany field names.
+		id_map (dict): Source row id -> copied row id.
+	"""
+	for field_name in field_names:
+		field = model._meta.get_field(field_name)
+		through = field.remote_field.through
+		source = f'{field.m2m_field_name()}_id'
+		target = f'{field.m2m_reverse_field_name()}_id'
+		for chunk in chunked(list(id_map)):
+			links = through.objects.filter(**{f'{source}__in': chunk}).values_list(source, target)
+			through.objects.bulk_create(
+				[through(**{source: id_map[source_id], target: target_id}) for source_id, target_id in links],
+				ignore_conflicts=True)
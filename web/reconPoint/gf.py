@@ -0,0 +1,171 @@
+import json
+import os
+import re
+
+#-------------#
+# gf patterns #
+#-------------#
+# gf patterns (~/.gf/*.json) are grep flags and regexes. Instead of one `gf`
+# process per pattern over the whole URL list, the patterns are compiled to
+# Python regexes and matched together in a single pass: a combined regex of
+# all patterns rejects most URLs with one search, and only the URLs it
+# accepts are matched against each pattern to get their tags. Patterns that
+# cannot be translated (basic grep syntax, unsupported constructs) are left
+# to `gf`.
+
+GF_DIR = os.path.expanduser('~/.gf')
+
+# POSIX bracket expressions, as Python character class contents
+POSIX_CLASSES = {
+	'[:alnum:]': 'a-zA-Z0-9',
+	'[:alpha:]': 'a-zA-Z',
+	'[:digit:]': '0-9',
+	'[:lower:]': 'a-z',
+	'[:upper:]': 'A-Z',
+	'[:xdigit:]': '0-9a-fA-F',
+	'[:space:]': r'\s',
+	'[:blank:]': r' \t',
+	'[:punct:]': r'!-/:-@\[-`{-~',
+	'[:word:]': r'\w',
+}
+WORD_BOUNDARIES = re.compile(r'\\[<>]')
+BACKREFERENCE = re.compile(r'\\\d')
+
+
+def load_gf_pattern(name, gf_dir=GF_DIR):
+	"""Load a gf pattern definition.
+
+	Args:
+		name (str): Pattern name.
+		gf_dir (str): gf patterns directory.
+
+	Returns:
+		dict: Pattern definition, None if not found or invalid.
+	"""
+	path = os.path.join(gf_dir, f'{name}.json')
+	try:
+		with open(path) as f:
+			definition = json.load(f)
+	except (OSError, ValueError):
+		return None
+	return definition if isinstance(definition, dict) else None
+
+
+def translate_grep_regex(pattern):
+	"""Translate a grep extended regex to a Python regex."""
+	for posix_class, python_class in POSIX_CLASSES.items():
+		pattern = pattern.replace(posix_class, python_class)
+	return WORD_BOUNDARIES.sub(r'\\b', pattern)
+
+
+def compile_gf_pattern(definition):
+	"""Compile a gf pattern definition.
+
+	Args:
+		definition (dict): Pattern definition, from `load_gf_pattern`.
+
+	Returns:
+		dict: 'regex' (re.Pattern), 'source' (str) and 'flags' (int) of the
+			pattern, 'invert' (grep -v) and 'only_matching' (grep -o). None
+			if the pattern cannot be compiled.
+	"""
+	options = set(''.join(
+		flag[1:] for flag in definition.get('flags', '').split()
+		if flag.startswith('-') and not flag.startswith('--')
+	))
+	patterns = definition.get('patterns') or [definition.get('pattern')]
+	if not all(isinstance(pattern, str) and pattern for pattern in patterns):
+		return None
+	if 'F' in options:
+		patterns = [re.escape(pattern) for pattern in patterns]
+	elif options & {'E', 'P'}:
+		patterns = [translate_grep_regex(pattern) for pattern in patterns]
+	else:
+		# basic grep syntax
+		return None
+	source = '|'.join(f'(?:{pattern})' for pattern in patterns)
+	if 'w' in options:
+		source = rf'(?<!\w)(?:{source})(?!\w)'
+	if 'x' in options:
+		source = rf'^(?:{source})$'
+	flags = re.IGNORECASE if 'i' in options else 0
+	try:
+		regex = re.compile(source, flags)
+	except re.error:
+		return None
+	return {
+		'regex': regex,
+		'source': source,
+		'flags': flags,
+		'invert': 'v' in options,
+		'only_matching': 'o' in options,
+	}
+
+
+class GfMatcher:
+	"""Match lines against several gf patterns in a single pass.
+
+	Args:
+		names (list): gf pattern names.
+		gf_dir (str): gf patterns directory.
+	"""
+
+	def __init__(self, names, gf_dir=GF_DIR):
+		self.patterns = {}
+		self.unsupported = []
+		for name in names:
+			definition = load_gf_pattern(name, gf_dir)
+			pattern = compile_gf_pattern(definition) if definition else None
+			if pattern:
+				self.patterns[name] = pattern
+			else:
+				self.unsupported.append(name)
+		self.prefilter = self.build_prefilter()
+
+	def build_prefilter(self):
+		"""Combine the patterns in one regex, matching a line if any pattern
+		does. Inverted patterns and backreferences can't be combined.
+
+		Returns:
+			re.Pattern: Combined regex, None if it can't be built.
+		"""
+		sources = []
+		for pattern in self.patterns.values():
+			if pattern['invert']:
+				continue
+			if BACKREFERENCE.search(pattern['source']):
+				return None
+			scope = 'i' if pattern['flags'] & re.IGNORECASE else ''
+			sources.append(f'(?{scope}:{pattern["source"]})')
+		if not sources:
+			return None
+		try:
+			return re.compile('|'.join(sources))
+		except re.error:
+			return None
+
+	def match(self, line):
+		"""Match a line against all patterns.
+
+		Args:
+			line (str): Line, e.g. an URL.
+
+		Returns:
+			dict: Pattern name -> matched texts: the line, or the matched
+				parts of the line for patterns with grep -o.
+		"""
+		matches = {}
+		maybe = self.prefilter is None or self.prefilter.search(line) is not None
+		for name, pattern in self.patterns.items():
+			if pattern['invert']:
+				if not pattern['regex'].search(line):
+					matches[name] = [line]
+			elif not maybe:
+				continue
+			elif pattern['only_matching']:
+				texts = [match.group() for match in pattern['regex'].finditer(line) if match.group()]
+				if texts:
+					matches[name] = texts
+			elif pattern['regex'].search(line):
+				matches[name] = [line]
+		return matches
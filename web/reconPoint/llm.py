@@ -8,13 +8,13 @@ from langchain.agents import initialize_agent, Tool
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 
-from dashboard.models import OllamaSettings
+from reconPoint.settings_snapshot import settings_snapshot
 
 
 class LLMVulnerabilityReportGenerator:
 
 	def __init__(self, logger):
-		selected_model = OllamaSettings.objects.first()
+		selected_model = settings_snapshot.get('ollama')
 		self.model_name = selected_model.selected_model if selected_model else 'gpt-3.5-turbo'
 		self.use_ollama = selected_model.use_ollama if selected_model else False
 		self.openai_api_key = None
@@ -91,7 +91,7 @@ class LLMVulnerabilityReportGenerator:
 class LLMAttackSuggestionGenerator:
 
 	def __init__(self, logger):
-		selected_model = OllamaSettings.objects.first()
+		selected_model = settings_snapshot.get('ollama')
 		self.model_name = selected_model.selected_model if selected_model else 'gpt-3.5-turbo'
 		self.use_ollama = selected_model.use_ollama if selected_model else False
 		self.openai_api_key = None
@@ -145,7 +145,7 @@ class LLMAttackSuggestionGenerator:
 
 class ReconAgent:
     def __init__(self, logger):
-        selected_model = OllamaSettings.objects.first()
+        selected_model = settings_snapshot.get('ollama')
         self.use_ollama = selected_model.use_ollama if selected_model else False
         self.model_name = selected_model.selected_model if selected_model else 'gpt-3.5-turbo'
         self.logger = logger
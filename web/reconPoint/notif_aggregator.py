@@ -0,0 +1,202 @@
+import json
+import time
+
+#-------------------------#
+# Notification aggregator #
+#-------------------------#
+# Task notifications are not sent one by one. Events are buffered in Redis per
+# scan, and a single digest task is scheduled at the start of each window. It
+# merges the buffered events (latest status per task, appended fields) and
+# sends one message per notification channel. Channels are rate limited: when
+# a channel is over its limit, its digest is kept pending and merged with the
+# events of the next window, so the traffic stays bounded whatever the scan
+# size.
+
+DEFAULT_WINDOW = 30
+DEFAULT_PENDING_TTL = 86400
+DIGEST_MAX_LENGTH = 1900
+FIELD_MAX_LENGTH = 1024
+TRUNCATED_MARKER = '[...]'
+
+
+def new_digest():
+	return {'events': 0, 'tasks': {}}
+
+
+def merge_events(digest, events):
+	"""Merge task events into a digest.
+
+	The latest status, severity, traceback and output of each task are kept.
+	Fields are overwritten, unless listed in the event's `fields_append`, in
+	which case new values are appended as lines.
+
+	Args:
+		digest (dict): Digest from `new_digest`, updated in place.
+		events (list): Events, as passed to `NotificationAggregator.add`.
+
+	Returns:
+		dict: Digest.
+	"""
+	for event in events:
+		digest['events'] += 1
+		task = digest['tasks'].setdefault(event['task'], {'fields': {}})
+		for key in ('status', 'severity', 'traceback', 'output_path', 'result'):
+			if event.get(key) is not None:
+				task[key] = event[key]
+		fields_append = event.get('fields_append') or []
+		for name, value in (event.get('fields') or {}).items():
+			if not value:
+				continue
+			value = str(value)
+			existing = task['fields'].get(name)
+			if existing and name in fields_append:
+				value = append_line(existing, value)
+			task['fields'][name] = value[:FIELD_MAX_LENGTH]
+	return digest
+
+
+def append_line(existing, value, max_length=FIELD_MAX_LENGTH):
+	"""Append a line to a field value, once, within a max length."""
+	lines = existing.split('\n')
+	if value in lines or lines[-1] == TRUNCATED_MARKER:
+		return existing
+	if len(existing) + len(value) + 1 > max_length - len(TRUNCATED_MARKER) - 1:
+		return f'{existing}\n{TRUNCATED_MARKER}'
+	return f'{existing}\n{value}'
+
+
+def format_digest(digest, title, url=None, tracebacks=False, max_length=DIGEST_MAX_LENGTH):
+	"""Render a digest as a single message.
+
+	Args:
+		digest (dict): Digest.
+		title (str): Message title.
+		url (str, optional): Scan URL.
+		tracebacks (bool): Include task tracebacks.
+		max_length (int): Max message length.
+
+	Returns:
+		str: Message.
+	"""
+	lines = [f'**{title}** ({digest["events"]} updates)']
+	if url:
+		lines.append(url)
+	for name, task in digest['tasks'].items():
+		status = task.get('status')
+		lines.append(f'• `{name}` **{status}**' if status else f'• `{name}`')
+		for field, value in task['fields'].items():
+			lines.append(f'🡆 **{field}:** {value}')
+		if tracebacks and task.get('traceback'):
+			lines.append(f'```\n{task["traceback"]}\n```')
+	message = '\n'.join(lines)
+	if len(message) > max_length:
+		message = message[:max_length - len(TRUNCATED_MARKER) - 1] + '\n' + TRUNCATED_MARKER
+	return message
+
+
+class NotificationAggregator:
+	"""Redis-backed buffer of task notification events.
+
+	Args:
+		client (redis.Redis): Redis client. Aggregation is disabled if None.
+		window (int): Digest window in seconds. Aggregation is disabled if 0.
+		rate_limits (dict, optional): Channel -> max messages per minute.
+			Channels missing from the dict are not limited.
+		prefix (str): Redis keys prefix.
+	"""
+
+	def __init__(self, client, window=DEFAULT_WINDOW, rate_limits=None, prefix='notif_digest'):
+		self.client = client
+		self.window = window
+		self.rate_limits = rate_limits or {}
+		self.prefix = prefix
+
+	@property
+	def enabled(self):
+		return bool(self.client and self.window)
+
+	def events_key(self, scan_key):
+		return f'{self.prefix}:events:{scan_key}'
+
+	def window_key(self, scan_key):
+		return f'{self.prefix}:window:{scan_key}'
+
+	def pending_key(self, scan_key, channel):
+		return f'{self.prefix}:pending:{scan_key}:{channel}'
+
+	def add(self, scan_key, event):
+		"""Buffer an event.
+
+		Args:
+			scan_key (str): Scan / subscan key.
+			event (dict): Event with 'task', and optional 'status', 'severity',
+				'fields', 'fields_append', 'traceback', 'output_path' and
+				'result' keys.
+
+		Returns:
+			bool: True if the event opened a new window, in which case the
+				caller must schedule a flush in `window` seconds.
+		"""
+		self.client.rpush(self.events_key(scan_key), json.dumps(event, default=str))
+		return self.start_window(scan_key)
+
+	def start_window(self, scan_key):
+		"""Open a window unless one is already open. The key outlives the
+		window, so that a lost flush does not block notifications forever."""
+		return bool(self.client.set(self.window_key(scan_key), 1, nx=True, ex=self.window * 2))
+
+	def pop_events(self, scan_key):
+		"""Get and remove the buffered events of a scan."""
+		pipe = self.client.pipeline()
+		pipe.lrange(self.events_key(scan_key), 0, -1)
+		pipe.delete(self.events_key(scan_key))
+		events, _ = pipe.execute()
+		return [json.loads(event) for event in events]
+
+	def allow(self, channel):
+		"""Count a message against the per-minute limit of a channel.
+
+		Returns:
+			bool: True if the message can be sent.
+		"""
+		limit = self.rate_limits.get(channel)
+		if not limit:
+			return True
+		key = f'{self.prefix}:rate:{channel}:{int(time.time() // 60)}'
+		pipe = self.client.pipeline()
+		pipe.incr(key)
+		pipe.expire(key, 120)
+		count, _ = pipe.execute()
+		return count <= limit
+
+	def flush(self, scan_key, channels, send):
+		"""Send the digest of a scan to each channel.
+
+		Args:
+			scan_key (str): Scan / subscan key.
+			channels (list): Enabled channel names.
+			send (callable): Called with (channel, digest).
+
+		Returns:
+			bool: True if a channel was rate limited, in which case the caller
+				must schedule another flush.
+		"""
+		# Close the window first: events added from now on open a new one
+		self.client.delete(self.window_key(scan_key))
+		events = self.pop_events(scan_key)
+		deferred = False
+		for channel in channels:
+			pending_key = self.pending_key(scan_key, channel)
+			pending = self.client.get(pending_key)
+			digest = json.loads(pending) if pending else new_digest()
+			merge_events(digest, events)
+			if not digest['tasks']:
+				continue
+			if self.allow(channel):
+				send(channel, digest)
+				if pending:
+					self.client.delete(pending_key)
+			else:
+				self.client.set(pending_key, json.dumps(digest), ex=DEFAULT_PENDING_TTL)
+				deferred = True
+		return deferred
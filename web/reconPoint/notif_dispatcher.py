@@ -0,0 +1,280 @@
+import asyncio
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+#-------------------------#
+# Notification dispatcher #
+#-------------------------#
+# Messages of all channels (Discord, Slack, Lark, Telegram) are sent
+# concurrently from an asyncio loop, over HTTP connections that are kept open
+# per channel between sends. Each channel has its own queue: on HTTP 429 the
+# queue pauses for the time asked by the server (Retry-After) then resumes,
+# other channels are not affected. Network errors and 5xx are retried with a
+# bounded exponential backoff.
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30
+DEFAULT_MAX_RETRY_AFTER = 60
+
+
+class NotificationMessage:
+	"""HTTP request delivering a notification to a channel.
+
+	Args:
+		channel (str): Channel name (discord, slack, lark, telegram).
+		url (str): Request URL.
+		payload (dict): JSON payload.
+		method (str): HTTP method.
+		files (list, optional): (filename, bytes) tuples. If set, the payload
+			is sent as the 'payload_json' part of a multipart body.
+		on_delivered (callable, optional): Called with the response body after
+			the message is delivered.
+	"""
+
+	def __init__(self, channel, url, payload=None, method='POST', files=None, on_delivered=None):
+		self.channel = channel
+		self.url = url
+		self.payload = payload or {}
+		self.method = method
+		self.files = files or []
+		self.on_delivered = on_delivered
+		self.queued_at = None
+
+	def encode(self):
+		"""Get the request body and headers.
+
+		Returns:
+			tuple: (bytes, dict).
+		"""
+		payload = json.dumps(self.payload).encode()
+		if not self.files:
+			return payload, {'Content-Type': 'application/json'}
+		boundary = uuid.uuid4().hex
+		parts = [
+			f'--{boundary}\r\n'
+			'Content-Disposition: form-data; name="payload_json"\r\n'
+			'Content-Type: application/json\r\n\r\n'.encode() + payload + b'\r\n'
+		]
+		for ix, (filename, content) in enumerate(self.files):
+			parts.append(
+				f'--{boundary}\r\n'
+				f'Content-Disposition: form-data; name="files[{ix}]"; filename="{filename}"\r\n'
+				'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+		parts.append(f'--{boundary}--\r\n'.encode())
+		return b''.join(parts), {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+class Delivery:
+	"""Outcome of a message delivery.
+
+	Args:
+		message (NotificationMessage): Message.
+		status (int): Last HTTP status, None if the request never completed.
+		attempts (int): Number of requests sent.
+		latency (float): Seconds from queueing to the last response.
+		error (str, optional): Error, None if delivered.
+		content (bytes, optional): Response body.
+	"""
+
+	def __init__(self, message, status, attempts, latency, error=None, content=b''):
+		self.message = message
+		self.channel = message.channel
+		self.status = status
+		self.attempts = attempts
+		self.latency = latency
+		self.error = error
+		self.content = content
+
+	@property
+	def delivered(self):
+		return self.error is None
+
+
+class ChannelSession:
+	"""HTTP connections of a channel, kept alive between requests.
+
+	Args:
+		timeout (int): Socket timeout in seconds.
+	"""
+
+	def __init__(self, timeout=DEFAULT_TIMEOUT):
+		self.timeout = timeout
+		self.connections = {}
+		self.lock = threading.Lock()
+
+	def request(self, method, url, body, headers):
+		"""Send a request, reconnecting once if a kept-alive connection was
+		closed by the server.
+
+		Returns:
+			tuple: (status, headers with lowercase names, body).
+		"""
+		parts = urlsplit(url)
+		key = (parts.scheme, parts.netloc)
+		path = parts.path or '/'
+		if parts.query:
+			path += f'?{parts.query}'
+		with self.lock:
+			while True:
+				reused = key in self.connections
+				if not reused:
+					connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+					self.connections[key] = connection_class(parts.netloc, timeout=self.timeout)
+				connection = self.connections[key]
+				try:
+					connection.request(method, path, body=body, headers=headers)
+					response = connection.getresponse()
+					content = response.read()
+				except (http.client.HTTPException, OSError):
+					connection.close()
+					del self.connections[key]
+					if reused:
+						continue
+					raise
+				if response.getheader('Connection', '').lower() == 'close':
+					connection.close()
+					del self.connections[key]
+				response_headers = {name.lower(): value for name, value in response.getheaders()}
+				return response.status, response_headers, content
+
+	def close(self):
+		with self.lock:
+			for connection in self.connections.values():
+				connection.close()
+			self.connections.clear()
+
+
+class NotificationDispatcher:
+	"""Send notification messages concurrently, one queue per channel.
+
+	Args:
+		timeout (int): Request timeout in seconds.
+		max_retries (int): Max retries of a message on errors, and separately
+			on rate limits.
+		backoff (float): Base backoff in seconds, doubled on each retry.
+		max_backoff (float): Max backoff in seconds.
+		max_retry_after (float): Max pause asked by a rate limited channel.
+	"""
+
+	def __init__(
+			self,
+			timeout=DEFAULT_TIMEOUT,
+			max_retries=DEFAULT_MAX_RETRIES,
+			backoff=DEFAULT_BACKOFF,
+			max_backoff=DEFAULT_MAX_BACKOFF,
+			max_retry_after=DEFAULT_MAX_RETRY_AFTER):
+		self.timeout = timeout
+		self.max_retries = max_retries
+		self.backoff = backoff
+		self.max_backoff = max_backoff
+		self.max_retry_after = max_retry_after
+		self.sessions = {}
+		self.sessions_lock = threading.Lock()
+
+	def get_session(self, channel):
+		with self.sessions_lock:
+			if channel not in self.sessions:
+				self.sessions[channel] = ChannelSession(self.timeout)
+			return self.sessions[channel]
+
+	def send(self, messages):
+		"""Send messages and wait for their delivery.
+
+		Args:
+			messages (list): NotificationMessage objects. None items are
+				skipped, so that disabled channels can be passed as is.
+
+		Returns:
+			list: Delivery objects.
+		"""
+		messages = [message for message in messages if message]
+		if not messages:
+			return []
+		deliveries = asyncio.run(self.dispatch(messages))
+		for delivery in deliveries:
+			if delivery.delivered and delivery.message.on_delivered:
+				delivery.message.on_delivered(delivery.content)
+		return deliveries
+
+	async def dispatch(self, messages):
+		queues = {}
+		now = time.monotonic()
+		for message in messages:
+			message.queued_at = now
+			queues.setdefault(message.channel, asyncio.Queue()).put_nowait(message)
+		results = await asyncio.gather(*[
+			self.run_queue(queue) for queue in queues.values()
+		])
+		return [delivery for channel_deliveries in results for delivery in channel_deliveries]
+
+	async def run_queue(self, queue):
+		"""Deliver the messages of a channel one at a time, in order."""
+		deliveries = []
+		while not queue.empty():
+			deliveries.append(await self.deliver(queue.get_nowait()))
+		return deliveries
+
+	async def deliver(self, message):
+		loop = asyncio.get_running_loop()
+		session = self.get_session(message.channel)
+		body, headers = message.encode()
+		attempts = 0
+		failures = 0
+		rate_limits = 0
+		while True:
+			attempts += 1
+			status, response_headers, content, error = None, {}, b'', None
+			try:
+				status, response_headers, content = await loop.run_in_executor(
+					None, session.request, message.method, message.url, body, headers)
+			except (http.client.HTTPException, OSError) as e:
+				error = f'{type(e).__name__}: {e}'
+
+			if status and 200 <= status < 300:
+				return Delivery(message, status, attempts, time.monotonic() - message.queued_at, content=content)
+
+			# Rate limited: pause the channel queue for the time asked
+			if status == 429 and rate_limits < self.max_retries:
+				rate_limits += 1
+				await asyncio.sleep(self.get_retry_after(response_headers, content))
+				continue
+
+			if status:
+				error = f'HTTP {status}: {content[:200]!r}'
+			retryable = status is None or status >= 500
+			if not retryable or failures >= self.max_retries:
+				return Delivery(message, status, attempts, time.monotonic() - message.queued_at, error)
+			await asyncio.sleep(self.get_backoff(failures))
+			failures += 1
+
+	def get_backoff(self, failures):
+		delay = min(self.backoff * 2 ** failures, self.max_backoff)
+		return delay * random.uniform(0.5, 1)
+
+	def get_retry_after(self, headers, content):
+		"""Get the pause asked by a rate limited channel, from the Retry-After
+		header or the 'retry_after' JSON field (Discord)."""
+		retry_after = headers.get('retry-after')
+		if retry_after is None:
+			try:
+				retry_after = json.loads(content).get('retry_after')
+			except (ValueError, AttributeError):
+				pass
+		try:
+			retry_after = float(retry_after)
+		except (TypeError, ValueError):
+			return self.get_backoff(0)
+		return min(max(retry_after, 0), self.max_retry_after)
+
+	def close(self):
+		with self.sessions_lock:
+			for session in self.sessions.values():
+				session.close()
+			self.sessions.clear()
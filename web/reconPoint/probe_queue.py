@@ -0,0 +1,192 @@
+import json
+import math
+import time
+import uuid
+
+#-------------#
+# Probe queue #
+#-------------#
+# URLs that need an HTTP probe (liveness, status, title, ...) are not probed
+# one httpx process at a time by each caller. They are queued in Redis per
+# scan, and a single flush task probes the whole queue with one httpx run at
+# the end of a time window, or as soon as a batch is full. Callers needing the
+# results (e.g. save_endpoint with crawl=True) wait for a reply holding the
+# endpoint of each of their URLs, other callers just queue their URLs and move
+# on. All probes are HEAD requests, like the ones they replace.
+
+DEFAULT_WINDOW = 5
+DEFAULT_MAX_BATCH = 500
+DEFAULT_TTL = 3600
+
+# Outcomes of `ProbeQueue.add`
+WINDOW_OPENED = 'window'
+BATCH_FULL = 'full'
+
+
+def index_probe_results(records):
+	"""Index http_crawl records by the URLs they answer for: the httpx input,
+	the probed URL and the final URL.
+
+	Args:
+		records (list): http_crawl records.
+
+	Returns:
+		dict: URL -> {'endpoint_id', 'endpoint_created'}.
+	"""
+	index = {}
+	for record in records:
+		result = {
+			'endpoint_id': record.get('endpoint_id'),
+			'endpoint_created': record.get('endpoint_created', False),
+		}
+		for key in ('final_url', 'url', 'input'):
+			if record.get(key):
+				index.setdefault(record[key], result)
+	return index
+
+
+def group_replies(entries, results):
+	"""Group probe results by caller.
+
+	Args:
+		entries (list): Queue entries, with 'url' and 'reply_to' keys.
+		results (dict): URL -> result, from `index_probe_results`.
+
+	Returns:
+		dict: reply id -> {URL: result, None if the URL did not answer}.
+	"""
+	replies = {}
+	for entry in entries:
+		if entry.get('reply_to'):
+			replies.setdefault(entry['reply_to'], {})[entry['url']] = results.get(entry['url'])
+	return replies
+
+
+class ProbeQueue:
+	"""Redis-backed queue of URLs to probe, coalesced per scan.
+
+	Args:
+		client (redis.Redis): Redis client. The queue is disabled if None.
+		window (int): Seconds between the first queued URL and the flush.
+		max_batch (int): Max URLs per flush. A full batch is flushed right
+			away.
+		prefix (str): Redis keys prefix.
+	"""
+
+	def __init__(self, client, window=DEFAULT_WINDOW, max_batch=DEFAULT_MAX_BATCH, prefix='probe_queue'):
+		self.client = client
+		self.window = window
+		self.max_batch = max_batch
+		self.prefix = prefix
+
+	@property
+	def enabled(self):
+		return bool(self.client)
+
+	def queue_key(self, scan_key):
+		return f'{self.prefix}:urls:{scan_key}'
+
+	def window_key(self, scan_key):
+		return f'{self.prefix}:window:{scan_key}'
+
+	def ctx_key(self, scan_key):
+		return f'{self.prefix}:ctx:{scan_key}'
+
+	def reply_key(self, reply_id):
+		return f'{self.prefix}:reply:{reply_id}'
+
+	def add(self, scan_key, urls, ctx, reply_id=None):
+		"""Queue URLs to probe.
+
+		Args:
+			scan_key (str): Scan / subscan key.
+			urls (list): URLs.
+			ctx (dict): Scan context, used by the flush.
+			reply_id (str, optional): Reply id, from `new_reply_id`, if the
+				caller waits for the results.
+
+		Returns:
+			str: WINDOW_OPENED if the caller must schedule a flush in `window`
+				seconds, BATCH_FULL if it must schedule one now, else None.
+		"""
+		if not urls:
+			return None
+		pipe = self.client.pipeline()
+		pipe.set(self.ctx_key(scan_key), json.dumps(ctx, default=str), ex=DEFAULT_TTL)
+		pipe.rpush(self.queue_key(scan_key), *[
+			json.dumps({'url': url, 'reply_to': reply_id}) for url in urls
+		])
+		pipe.expire(self.queue_key(scan_key), DEFAULT_TTL)
+		pipe.set(self.window_key(scan_key), 1, nx=True, ex=self.window * 2)
+		_, length, _, opened = pipe.execute()
+		if length - len(urls) < self.max_batch <= length:
+			return BATCH_FULL
+		if opened:
+			return WINDOW_OPENED
+		return None
+
+	def pop(self, scan_key):
+		"""Get and remove a batch of queued URLs.
+
+		Returns:
+			tuple: (scan context, list of entries, number of entries left).
+		"""
+		key = self.queue_key(scan_key)
+		pipe = self.client.pipeline()
+		pipe.delete(self.window_key(scan_key))
+		pipe.get(self.ctx_key(scan_key))
+		pipe.lrange(key, 0, self.max_batch - 1)
+		pipe.ltrim(key, self.max_batch, -1)
+		pipe.llen(key)
+		_, ctx, entries, _, left = pipe.execute()
+		ctx = json.loads(ctx) if ctx else {}
+		return ctx, [json.loads(entry) for entry in entries], left
+
+	def new_reply_id(self):
+		return uuid.uuid4().hex
+
+	def reply(self, entries, results):
+		"""Send probe results to the waiting callers.
+
+		Args:
+			entries (list): Flushed entries.
+			results (dict): URL -> result, from `index_probe_results`.
+		"""
+		replies = group_replies(entries, results)
+		if not replies:
+			return
+		pipe = self.client.pipeline()
+		for reply_id, reply in replies.items():
+			pipe.rpush(self.reply_key(reply_id), json.dumps(reply))
+			pipe.expire(self.reply_key(reply_id), DEFAULT_TTL)
+		pipe.execute()
+
+	def wait(self, reply_id, urls, timeout):
+		"""Wait for the results of queued URLs. URLs of a caller can be split
+		across several flushes, each sending its own reply: replies are read
+		until every URL has a result.
+
+		Args:
+			reply_id (str): Reply id passed to `add`.
+			urls (list): Queued URLs.
+			timeout (int): Max seconds to wait.
+
+		Returns:
+			dict: URL -> result, for the URLs answered before the timeout.
+		"""
+		pending = set(urls)
+		results = {}
+		deadline = time.monotonic() + timeout
+		while pending:
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
+				break
+			reply = self.client.blpop(self.reply_key(reply_id), timeout=math.ceil(remaining))
+			if not reply:
+				break
+			for url, result in json.loads(reply[1]).items():
+				results[url] = result
+				pending.discard(url)
+		# Late replies have no reader left
+		self.client.delete(self.reply_key(reply_id))
+		return results
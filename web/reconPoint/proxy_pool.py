@@ -0,0 +1,328 @@
+import concurrent.futures
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from functools import lru_cache
+
+#------------#
+# Proxy pool #
+#------------#
+# The proxy list input by the user is parsed once, and each proxy gets a
+# health record in Redis: latency and error rate (moving averages) and
+# consecutive failures, updated by periodic health checks (see the
+# check_proxies task). Proxies are picked at random weighted by their score,
+# proxies with too many consecutive failures are out of rotation for an
+# increasing cooldown, and each proxy is leased to a limited number of tasks
+# at a time. Leases expire on their own, so that a crashed worker does not
+# hold a proxy forever.
+
+DEFAULT_MAX_IN_USE = 4
+DEFAULT_LEASE_TTL = 1800
+DEFAULT_MAX_FAILURES = 3
+DEFAULT_COOLDOWN = 60
+MAX_COOLDOWN = 3600
+DEFAULT_CHECK_URL = 'http://connectivitycheck.gstatic.com/generate_204'
+DEFAULT_CHECK_TIMEOUT = 10
+HEALTH_TTL = 7 * 86400
+EWMA_ALPHA = 0.3
+UNKNOWN_LATENCY = 1.0
+MIN_WEIGHT = 0.01
+CHECKABLE_SCHEMES = ('http', 'https')
+
+
+@lru_cache(maxsize=8)
+def parse_proxies(text):
+	"""Parse a proxy list, one proxy per line.
+
+	Args:
+		text (str): Proxy list. Empty lines and comments are skipped.
+
+	Returns:
+		tuple: Unique proxies, in input order.
+	"""
+	proxies = {}
+	for line in (text or '').splitlines():
+		line = line.strip()
+		if line and not line.startswith('#'):
+			proxies[line] = None
+	return tuple(proxies)
+
+
+def update_health(health, ok, latency=None, now=None, max_failures=DEFAULT_MAX_FAILURES, cooldown=DEFAULT_COOLDOWN):
+	"""Update the health record of a proxy with the outcome of a request.
+
+	Args:
+		health (dict): Health record, empty for a new proxy.
+		ok (bool): Whether the request succeeded.
+		latency (float, optional): Request latency in seconds.
+		now (float, optional): Current timestamp.
+		max_failures (int): Consecutive failures before the proxy is taken
+			out of rotation.
+		cooldown (int): First out-of-rotation duration in seconds, doubled on
+			each new failure.
+
+	Returns:
+		dict: New health record.
+	"""
+	now = now or time.time()
+	health = dict(health)
+	error = 0.0 if ok else 1.0
+	if health.get('samples'):
+		health['error_rate'] = (1 - EWMA_ALPHA) * health.get('error_rate', 0.0) + EWMA_ALPHA * error
+	else:
+		health['error_rate'] = error
+	if ok and latency is not None:
+		if 'latency' in health:
+			health['latency'] = (1 - EWMA_ALPHA) * health['latency'] + EWMA_ALPHA * latency
+		else:
+			health['latency'] = latency
+	health['samples'] = health.get('samples', 0) + 1
+	health['checked_at'] = now
+	if ok:
+		health['failures'] = 0
+		health['down_until'] = 0
+	else:
+		health['failures'] = health.get('failures', 0) + 1
+		if health['failures'] >= max_failures:
+			delay = cooldown * 2 ** (health['failures'] - max_failures)
+			health['down_until'] = now + min(delay, MAX_COOLDOWN)
+	return health
+
+
+def is_down(health, now=None):
+	return health.get('down_until', 0) > (now or time.time())
+
+
+def proxy_score(health, now=None):
+	"""Score a proxy: 0 if out of rotation, otherwise higher for proxies with
+	fewer errors and lower latency. Proxies never checked get a neutral
+	score.
+
+	Args:
+		health (dict): Health record.
+		now (float, optional): Current timestamp.
+
+	Returns:
+		float: Score.
+	"""
+	if is_down(health, now):
+		return 0.0
+	latency = health.get('latency', UNKNOWN_LATENCY)
+	return (1 - health.get('error_rate', 0.0)) / (1 + latency)
+
+
+def pick_proxy(proxies, healths, in_use, max_in_use, now=None, rng=random):
+	"""Pick a proxy at random, weighted by score.
+
+	Proxies in rotation and under their usage cap are preferred, then proxies
+	in rotation, then any proxy: a proxied scan is never sent without proxy.
+
+	Args:
+		proxies (list): Proxies.
+		healths (dict): Proxy -> health record.
+		in_use (dict): Proxy -> number of active leases.
+		max_in_use (int): Max active leases per proxy.
+		now (float, optional): Current timestamp.
+		rng (random.Random): Random generator.
+
+	Returns:
+		str: Proxy, or None if there is no proxy.
+	"""
+	now = now or time.time()
+	up = [proxy for proxy in proxies if not is_down(healths.get(proxy, {}), now)]
+	free = [proxy for proxy in up if in_use.get(proxy, 0) < max_in_use]
+	candidates = free or up or list(proxies)
+	if not candidates:
+		return None
+	weights = [max(proxy_score(healths.get(proxy, {}), now), MIN_WEIGHT) for proxy in candidates]
+	return rng.choices(candidates, weights=weights)[0]
+
+
+class ProxyPool:
+	"""Health-scored pool of proxies, shared by all workers through Redis.
+	Without Redis, proxies are picked uniformly at random.
+
+	Args:
+		client (redis.Redis): Redis client.
+		max_in_use (int): Max active leases per proxy.
+		lease_ttl (int): Lease expiration in seconds.
+		max_failures (int): Consecutive failures before a proxy is taken out
+			of rotation.
+		cooldown (int): First out-of-rotation duration in seconds.
+		check_url (str): URL requested through proxies by health checks.
+		check_timeout (int): Health check timeout in seconds.
+		prefix (str): Redis keys prefix.
+	"""
+
+	def __init__(
+			self,
+			client,
+			max_in_use=DEFAULT_MAX_IN_USE,
+			lease_ttl=DEFAULT_LEASE_TTL,
+			max_failures=DEFAULT_MAX_FAILURES,
+			cooldown=DEFAULT_COOLDOWN,
+			check_url=DEFAULT_CHECK_URL,
+			check_timeout=DEFAULT_CHECK_TIMEOUT,
+			prefix='proxy_pool'):
+		self.client = client
+		self.max_in_use = max_in_use
+		self.lease_ttl = lease_ttl
+		self.max_failures = max_failures
+		self.cooldown = cooldown
+		self.check_url = check_url
+		self.check_timeout = check_timeout
+		self.prefix = prefix
+		self.local = threading.local()
+
+	def health_key(self, proxy):
+		return f'{self.prefix}:health:{proxy}'
+
+	def leases_key(self, proxy):
+		return f'{self.prefix}:leases:{proxy}'
+
+	def get_healths(self, proxies):
+		"""Get the health records of proxies.
+
+		Returns:
+			dict: Proxy -> health record.
+		"""
+		pipe = self.client.pipeline()
+		for proxy in proxies:
+			pipe.hgetall(self.health_key(proxy))
+		healths = {}
+		for proxy, record in zip(proxies, pipe.execute()):
+			healths[proxy] = {
+				(key.decode() if isinstance(key, bytes) else key): float(value)
+				for key, value in record.items()
+			}
+		return healths
+
+	def get_in_use(self, proxies, now=None):
+		"""Get the number of active leases of proxies, dropping expired ones.
+
+		Returns:
+			dict: Proxy -> number of leases.
+		"""
+		now = now or time.time()
+		pipe = self.client.pipeline()
+		for proxy in proxies:
+			pipe.zremrangebyscore(self.leases_key(proxy), 0, now - self.lease_ttl)
+			pipe.zcard(self.leases_key(proxy))
+		counts = pipe.execute()[1::2]
+		return dict(zip(proxies, counts))
+
+	def acquire(self, proxies):
+		"""Lease a proxy. Leases are held by the current thread until
+		`release_held` or until they expire.
+
+		Args:
+			proxies (list): Proxies, from `parse_proxies`.
+
+		Returns:
+			str: Proxy, or '' if there is no proxy.
+		"""
+		if not proxies:
+			return ''
+		if not self.client:
+			return random.choice(proxies)
+		now = time.time()
+		proxy = pick_proxy(
+			proxies,
+			self.get_healths(proxies),
+			self.get_in_use(proxies, now),
+			self.max_in_use,
+			now)
+		lease_id = uuid.uuid4().hex
+		pipe = self.client.pipeline()
+		pipe.zadd(self.leases_key(proxy), {lease_id: now})
+		pipe.expire(self.leases_key(proxy), self.lease_ttl)
+		pipe.execute()
+		self.held.append((proxy, lease_id))
+		return proxy
+
+	@property
+	def held(self):
+		if not hasattr(self.local, 'leases'):
+			self.local.leases = []
+		return self.local.leases
+
+	def release_held(self):
+		"""Release the leases held by the current thread."""
+		if not self.client or not self.held:
+			return
+		pipe = self.client.pipeline()
+		for proxy, lease_id in self.held:
+			pipe.zrem(self.leases_key(proxy), lease_id)
+		pipe.execute()
+		self.held.clear()
+
+	def report(self, proxy, ok, latency=None):
+		"""Update the health record of a proxy.
+
+		Args:
+			proxy (str): Proxy.
+			ok (bool): Whether the request through the proxy succeeded.
+			latency (float, optional): Request latency in seconds.
+
+		Returns:
+			dict: New health record.
+		"""
+		health = update_health(
+			self.get_healths([proxy])[proxy],
+			ok,
+			latency,
+			max_failures=self.max_failures,
+			cooldown=self.cooldown)
+		pipe = self.client.pipeline()
+		pipe.hset(self.health_key(proxy), mapping=health)
+		pipe.expire(self.health_key(proxy), HEALTH_TTL)
+		pipe.execute()
+		return health
+
+	def check(self, proxy):
+		"""Request the check URL through a proxy.
+
+		Args:
+			proxy (str): Proxy.
+
+		Returns:
+			tuple: (ok, latency), or None if the proxy scheme cannot be
+				checked (e.g. SOCKS).
+		"""
+		scheme = proxy.split('://', 1)[0] if '://' in proxy else 'http'
+		if scheme not in CHECKABLE_SCHEMES:
+			return None
+		proxy_url = proxy if '://' in proxy else f'http://{proxy}'
+		opener = urllib.request.build_opener(
+			urllib.request.ProxyHandler({'http': proxy_url, 'https': proxy_url}))
+		start = time.monotonic()
+		try:
+			with opener.open(self.check_url, timeout=self.check_timeout) as response:
+				response.read()
+		except Exception:
+			return False, None
+		return True, time.monotonic() - start
+
+	def check_all(self, proxies, max_workers=16):
+		"""Health-check proxies concurrently and update their records.
+
+		Args:
+			proxies (list): Proxies.
+			max_workers (int): Max concurrent checks.
+
+		Returns:
+			dict: Proxy -> new health record, for checked proxies.
+		"""
+		healths = {}
+		if not proxies:
+			return healths
+		with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(proxies))) as executor:
+			future_to_proxy = {executor.submit(self.check, proxy): proxy for proxy in proxies}
+			for future in concurrent.futures.as_completed(future_to_proxy):
+				proxy = future_to_proxy[future]
+				outcome = future.result()
+				if outcome is not None:
+					healths[proxy] = self.report(proxy, *outcome)
+		return healths
@@ -0,0 +1,121 @@
+import os
+from collections import OrderedDict
+
+from redis import Redis
+
+from reconPoint.settings import SCAN_CONTEXT_CACHE_SIZE
+from scanEngine.models import EngineType
+from startScan.models import ScanHistory, SubScan
+
+#--------------------#
+# Scan context cache #
+#--------------------#
+# Every tracked task needs the ScanHistory, SubScan and EngineType objects of
+# its scan, and the list of engine tasks. They are cached per worker process
+# and reloaded only when their version changed in Redis. Versions are bumped
+# by the post_save / post_delete signals of those models (see
+# reconPoint.signals), so checking a cached context costs a single Redis
+# round-trip and no database query.
+
+SCAN_CONTEXT_VERSION_KEY = 'scan_context_version:{}'
+ENGINES_CONTEXT_VERSION_KEY = 'scan_context_version:engines'
+
+redis = None
+if 'CELERY_BROKER' in os.environ:
+	redis = Redis.from_url(os.environ['CELERY_BROKER'])
+
+
+class ScanContext:
+	"""Objects shared by all the tasks of a scan / subscan.
+
+	Args:
+		scan_id (int): ScanHistory id.
+		subscan_id (int): SubScan id.
+		engine_id (int): EngineType id.
+	"""
+
+	def __init__(self, scan_id=None, subscan_id=None, engine_id=None):
+		self.scan = ScanHistory.objects.select_related('domain').filter(pk=scan_id).first()
+		self.subscan = SubScan.objects.select_related('subdomain').filter(pk=subscan_id).first()
+		self.engine = EngineType.objects.filter(pk=engine_id).first()
+		self.domain = self.scan.domain if self.scan else None
+		self.subdomain = self.subscan.subdomain if self.subscan else None
+		self.engine_tasks = self.engine.tasks if self.engine else []
+
+
+class ScanContextCache:
+	"""LRU cache of ScanContext objects, validated against Redis versions.
+	Without Redis, contexts are loaded from the database every time.
+
+	Args:
+		max_size (int): Max number of cached contexts.
+	"""
+
+	def __init__(self, max_size=SCAN_CONTEXT_CACHE_SIZE):
+		self.max_size = max_size
+		self.entries = OrderedDict()
+
+	def get(self, scan_id=None, subscan_id=None, engine_id=None):
+		"""Get the context of a scan, loading it if missing or outdated.
+
+		Args:
+			scan_id (int): ScanHistory id.
+			subscan_id (int): SubScan id.
+			engine_id (int): EngineType id.
+
+		Returns:
+			ScanContext: Scan context.
+		"""
+		version = get_scan_context_version(scan_id)
+		if version is None:
+			return ScanContext(scan_id, subscan_id, engine_id)
+		key = (scan_id, subscan_id, engine_id)
+		entry = self.entries.get(key)
+		if entry and entry[0] == version:
+			self.entries.move_to_end(key)
+			return entry[1]
+		context = ScanContext(scan_id, subscan_id, engine_id)
+		self.entries[key] = (version, context)
+		self.entries.move_to_end(key)
+		while len(self.entries) > self.max_size:
+			self.entries.popitem(last=False)
+		return context
+
+	def clear(self):
+		self.entries.clear()
+
+
+def get_scan_context_version(scan_id):
+	"""Get the current version of a scan context.
+
+	Args:
+		scan_id (int): ScanHistory id.
+
+	Returns:
+		tuple: (scan version, engines version), or None if Redis is not
+			available.
+	"""
+	if not redis:
+		return None
+	scan_version, engines_version = redis.mget(
+		SCAN_CONTEXT_VERSION_KEY.format(scan_id),
+		ENGINES_CONTEXT_VERSION_KEY)
+	return (scan_version or b'0', engines_version or b'0')
+
+
+def invalidate_scan_context(scan_id=None):
+	"""Invalidate the cached context of a scan in all workers.
+
+	Args:
+		scan_id (int, optional): ScanHistory id. If None, invalidate the
+			contexts of all scans (e.g. after an engine change).
+	"""
+	if not redis:
+		return
+	if scan_id is None:
+		redis.incr(ENGINES_CONTEXT_VERSION_KEY)
+	else:
+		redis.incr(SCAN_CONTEXT_VERSION_KEY.format(scan_id))
+
+
+scan_context_cache = ScanContextCache()
@@ -0,0 +1,125 @@
+#------------------#
+# Scan tasks graph #
+#------------------#
+# Each top-level scan task declares the data it consumes and produces. The
+# engine's task list is turned into a dependency graph from those, and the
+# graph is compiled into nested chains / groups so that every task starts as
+# soon as the tasks producing its inputs are done.
+#
+# Data names:
+#   subdomains    Subdomain objects.
+#   default_urls  Alive root HTTP URL of each subdomain (is_default=True).
+#   port_urls     HTTP URLs found on non-standard open ports.
+#   urls          Endpoints fetched from archives and crawlers.
+
+SCAN_TASK_INPUTS = {
+	'subdomain_discovery': [],
+	'osint': [],
+	'port_scan': ['subdomains'],
+	'fetch_url': ['default_urls'],
+	'dir_file_fuzz': ['default_urls'],
+	'screenshot': ['default_urls'],
+	'waf_detection': ['default_urls'],
+	'vulnerability_scan': ['default_urls', 'port_urls', 'urls'],
+}
+
+SCAN_TASK_OUTPUTS = {
+	'subdomain_discovery': ['subdomains', 'default_urls'],
+	'osint': [],
+	'port_scan': ['port_urls'],
+	'fetch_url': ['urls'],
+	'dir_file_fuzz': [],
+	'screenshot': [],
+	'waf_detection': [],
+	'vulnerability_scan': [],
+}
+
+
+def get_task_dependencies(tasks):
+	"""Build the dependency graph of a list of scan tasks. Tasks that are not
+	scan tasks (e.g. other engine YAML keys) are ignored. Inputs that no task
+	of the list produces are expected to be in DB already.
+
+	Args:
+		tasks (list): Task names, e.g. the engine tasks.
+
+	Returns:
+		dict: Task name -> list of task names it depends on, in the
+			SCAN_TASK_INPUTS order.
+	"""
+	tasks = [task for task in SCAN_TASK_INPUTS if task in tasks]
+	dependencies = {}
+	for task in tasks:
+		inputs = set(SCAN_TASK_INPUTS[task])
+		dependencies[task] = [
+			other for other in tasks
+			if other != task and inputs & set(SCAN_TASK_OUTPUTS.get(other, []))
+		]
+	return dependencies
+
+
+def compile_scan_graph(dependencies):
+	"""Compile a dependency graph into nested chains and groups.
+
+	Independent parts of the graph run in a group. Inside a connected part,
+	the tasks without dependencies run first, then the rest is compiled the
+	same way. This is exact for series-parallel graphs (which the scan graph
+	is) and only adds waits, never removes them, for other graphs.
+
+	Args:
+		dependencies (dict): Task name -> list of task names it depends on.
+
+	Returns:
+		str | tuple | None: Task name, ('chain', [...]) or ('group', [...])
+			where items are compiled plans themselves. None if the graph is
+			empty.
+
+	Raises:
+		ValueError: If the graph has a cycle.
+	"""
+	if not dependencies:
+		return None
+	return _compile(list(dependencies), dependencies)
+
+
+def _compile(nodes, dependencies):
+	components = _get_components(nodes, dependencies)
+	if len(components) > 1:
+		return ('group', [_compile(component, dependencies) for component in components])
+	if len(nodes) == 1:
+		return nodes[0]
+	sources = [node for node in nodes if not set(dependencies[node]) & set(nodes)]
+	if not sources:
+		raise ValueError(f'Cycle found in scan tasks graph: {nodes}')
+	rest = [node for node in nodes if node not in sources]
+	head = sources[0] if len(sources) == 1 else ('group', sources)
+	tail = _compile(rest, dependencies)
+	if isinstance(tail, tuple) and tail[0] == 'chain':
+		return ('chain', [head] + tail[1])
+	return ('chain', [head, tail])
+
+
+def _get_components(nodes, dependencies):
+	"""Split nodes into weakly connected components, keeping nodes order."""
+	neighbours = {node: set() for node in nodes}
+	for node in nodes:
+		for dependency in dependencies[node]:
+			if dependency in neighbours:
+				neighbours[node].add(dependency)
+				neighbours[dependency].add(node)
+	components = []
+	seen = set()
+	for node in nodes:
+		if node in seen:
+			continue
+		component = set()
+		stack = [node]
+		while stack:
+			current = stack.pop()
+			if current in component:
+				continue
+			component.add(current)
+			stack.extend(neighbours[current] - component)
+		seen |= component
+		components.append([n for n in nodes if n in component])
+	return components
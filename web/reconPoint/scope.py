@@ -0,0 +1,203 @@
+import bisect
+import functools
+import ipaddress
+import re
+
+#--------------#
+# Scope engine #
+#--------------#
+# A scan's out-of-scope subdomains and excluded paths are compiled once into a
+# `ScopeEngine`, shared by all the checks of the scan in a worker process
+# (see `get_scope_engine`). Rules are split by kind so that a check costs
+# about the same however many rules there are:
+# - `*.example.com` / `.example.com`: subdomains of example.com, found in a
+#   trie of reversed labels.
+# - `admin.example.com`: this name and its subdomains, found in a set of
+#   exact names and in the trie.
+# - IPs and CIDRs (`10.0.0.0/24`): merged ranges, found by binary search.
+# - anything else is a regex, all matched together by one combined
+#   alternation regex. Subdomain patterns that aren't valid regexes are exact
+#   names, excluded paths that aren't are matched as substrings.
+
+HOSTNAME = re.compile(r'^[a-z0-9_-]+(?:\.[a-z0-9_-]+)+$', re.IGNORECASE)
+WILDCARD = re.compile(r'^(?:\*\.|\.)([a-z0-9_-]+(?:\.[a-z0-9_-]+)+)$', re.IGNORECASE)
+BACKREFERENCE = re.compile(r'\\\d|\(\?P=')
+GLOBAL_FLAGS = re.compile(r'\(\?[aiLmsux]+\)')
+WILDCARD_MARK = '*'
+
+
+def split_host(name):
+	"""Strip the port of a host[:port] name."""
+	if name.startswith('['):
+		return name[1:].split(']')[0]
+	if name.count(':') == 1:
+		return name.split(':')[0]
+	return name
+
+
+def compile_patterns(patterns, flags=0):
+	"""Compile regex patterns into a combined alternation regex. Invalid
+	regexes are matched as literals.
+
+	Args:
+		patterns (list): Regex patterns.
+		flags (int): Regex flags.
+
+	Returns:
+		list: Compiled regexes: the combined regex, and the patterns that
+			can't be combined (backreferences, global inline flags).
+	"""
+	sources = []
+	regexes = []
+	for pattern in patterns:
+		try:
+			regex = re.compile(pattern, flags)
+		except re.error:
+			sources.append(re.escape(pattern))
+			continue
+		if BACKREFERENCE.search(pattern) or GLOBAL_FLAGS.search(pattern):
+			regexes.append(regex)
+		else:
+			sources.append(f'(?:{pattern})')
+	if sources:
+		try:
+			regexes.insert(0, re.compile('|'.join(sources), flags))
+		except re.error:
+			regexes[:0] = [re.compile(source, flags) for source in sources]
+	return regexes
+
+
+class IPRanges:
+	"""IP networks, merged into sorted ranges per IP version.
+
+	Args:
+		networks (list): ipaddress networks.
+	"""
+
+	def __init__(self, networks):
+		self.ranges = {}
+		for version in (4, 6):
+			merged = ipaddress.collapse_addresses(net for net in networks if net.version == version)
+			ranges = [(int(net.network_address), int(net.broadcast_address)) for net in merged]
+			self.ranges[version] = ([start for start, _ in ranges], [end for _, end in ranges])
+
+	def __contains__(self, address):
+		starts, ends = self.ranges[address.version]
+		ix = bisect.bisect_right(starts, int(address)) - 1
+		return ix >= 0 and int(address) <= ends[ix]
+
+
+class ScopeEngine:
+	"""Compiled scope rules of a scan.
+
+	Args:
+		out_of_scope_subdomains (list): Out-of-scope subdomain patterns.
+		excluded_paths (list): Excluded URL patterns.
+	"""
+
+	def __init__(self, out_of_scope_subdomains=[], excluded_paths=[]):
+		self.names = set()
+		self.trie = {}
+		networks = []
+		regex_patterns = []
+		for pattern in out_of_scope_subdomains:
+			pattern = pattern.strip() if pattern else ''
+			if not pattern:
+				continue
+			name = pattern.lower()
+			wildcard = WILDCARD.match(name)
+			if wildcard:
+				self.add_wildcard(wildcard.group(1))
+				continue
+			try:
+				networks.append(ipaddress.ip_network(name, strict=False))
+				continue
+			except ValueError:
+				pass
+			if HOSTNAME.match(name):
+				self.names.add(name)
+				self.add_wildcard(name)
+				continue
+			try:
+				re.compile(pattern)
+			except re.error:
+				# not a regex, plain name
+				self.names.add(name)
+				continue
+			regex_patterns.append(pattern)
+		self.networks = IPRanges(networks) if networks else None
+		self.subdomain_regexes = compile_patterns(regex_patterns, re.IGNORECASE)
+		self.path_regexes = compile_patterns([path for path in excluded_paths if path])
+
+	def add_wildcard(self, domain):
+		node = self.trie
+		for label in reversed(domain.split('.')):
+			node = node.setdefault(label, {})
+		node[WILDCARD_MARK] = True
+
+	def in_trie(self, host):
+		labels = host.split('.')
+		node = self.trie
+		for ix, label in enumerate(reversed(labels)):
+			node = node.get(label)
+			if node is None:
+				return False
+			if ix < len(labels) - 1 and WILDCARD_MARK in node:
+				return True
+		return False
+
+	def is_out_of_scope(self, subdomain):
+		"""Check if a subdomain (or IP) is out of scope.
+
+		Args:
+			subdomain (str): Subdomain name or IP, with an optional port.
+
+		Returns:
+			bool: True if the subdomain is out of scope.
+		"""
+		subdomain = subdomain.lower()
+		host = split_host(subdomain).rstrip('.')
+		if host in self.names or (self.trie and self.in_trie(host)):
+			return True
+		if self.networks:
+			try:
+				if ipaddress.ip_address(host) in self.networks:
+					return True
+			except ValueError:
+				pass
+		return any(regex.search(subdomain) for regex in self.subdomain_regexes)
+
+	def is_excluded_url(self, url):
+		"""Check if an URL matches an excluded path pattern."""
+		return any(regex.search(url) for regex in self.path_regexes)
+
+	def filter_urls(self, urls):
+		"""Filter out the excluded URLs.
+
+		Args:
+			urls (list): URLs.
+
+		Returns:
+			list: URLs that don't match any excluded path pattern.
+		"""
+		if not self.path_regexes:
+			return urls
+		return [url for url in urls if not self.is_excluded_url(url)]
+
+
+@functools.lru_cache(maxsize=32)
+def _get_scope_engine(out_of_scope_subdomains, excluded_paths):
+	return ScopeEngine(out_of_scope_subdomains, excluded_paths)
+
+
+def get_scope_engine(out_of_scope_subdomains=[], excluded_paths=[]):
+	"""Get the scope engine of a scan's rules, compiled once per process.
+
+	Args:
+		out_of_scope_subdomains (list): Out-of-scope subdomain patterns.
+		excluded_paths (list): Excluded URL patterns.
+
+	Returns:
+		ScopeEngine: Scope engine.
+	"""
+	return _get_scope_engine(tuple(out_of_scope_subdomains or []), tuple(excluded_paths or []))
@@ -235,6 +235,60 @@ NEO4J_PASSWORD = env('NEO4J_PASSWORD', default='password')
 # Number of endpoints that have the same content_length
 DELETE_DUPLICATES_THRESHOLD = 10
 
+# Number of rows written per bulk insert when ingesting scan results
+RECONPOINT_BULK_BATCH_SIZE = env.int('RECONPOINT_BULK_BATCH_SIZE', default=2000)
+
+# Spooled command output logs, flushed every N seconds or N bytes
+COMMAND_LOGS_DIR = env('RECONPOINT_COMMAND_LOGS_DIR', default=f'{RECONPOINT_RESULTS}/command_logs')
+COMMAND_LOG_FLUSH_INTERVAL = env.int('RECONPOINT_COMMAND_LOG_FLUSH_INTERVAL', default=2)
+COMMAND_LOG_FLUSH_SIZE = env.int('RECONPOINT_COMMAND_LOG_FLUSH_SIZE', default=64 * 1024)
+
+# Number of scan contexts (scan, subscan, engine) cached by each worker process
+SCAN_CONTEXT_CACHE_SIZE = env.int('RECONPOINT_SCAN_CONTEXT_CACHE_SIZE', default=32)
+
+# Task notifications are merged into one digest per scan every window
+# (seconds, 0 sends them one by one), and channels are limited to a number of
+# messages per minute
+NOTIFICATION_DIGEST_WINDOW = env.int('RECONPOINT_NOTIFICATION_DIGEST_WINDOW', default=30)
+NOTIFICATION_RATE_LIMITS = {
+    'discord': env.int('RECONPOINT_DISCORD_RATE_LIMIT', default=20),
+    'slack': env.int('RECONPOINT_SLACK_RATE_LIMIT', default=30),
+    'lark': env.int('RECONPOINT_LARK_RATE_LIMIT', default=30),
+    'telegram': env.int('RECONPOINT_TELEGRAM_RATE_LIMIT', default=20),
+}
+
+# Notification delivery: request timeout (seconds) and max retries on errors
+NOTIFICATION_TIMEOUT = env.int('RECONPOINT_NOTIFICATION_TIMEOUT', default=10)
+NOTIFICATION_MAX_RETRIES = env.int('RECONPOINT_NOTIFICATION_MAX_RETRIES', default=3)
+
+# Proxy pool: max concurrent tasks per proxy, and health checks interval
+# (seconds) and URL
+PROXY_POOL_MAX_IN_USE = env.int('RECONPOINT_PROXY_POOL_MAX_IN_USE', default=4)
+PROXY_POOL_CHECK_INTERVAL = env.int('RECONPOINT_PROXY_POOL_CHECK_INTERVAL', default=300)
+PROXY_POOL_CHECK_URL = env('RECONPOINT_PROXY_POOL_CHECK_URL', default='http://connectivitycheck.gstatic.com/generate_204')
+
+# Input sharding of long-running tool tasks: shards aim at a duration
+# (seconds) from the measured throughput, within min / max sizes (items), and
+# failed shards are retried on their own
+SHARD_ENABLED = env.bool('RECONPOINT_SHARD_ENABLED', default=True)
+SHARD_TARGET_SECONDS = env.int('RECONPOINT_SHARD_TARGET_SECONDS', default=600)
+SHARD_MIN_SIZE = env.int('RECONPOINT_SHARD_MIN_SIZE', default=50)
+SHARD_MAX_SIZE = env.int('RECONPOINT_SHARD_MAX_SIZE', default=5000)
+SHARD_MAX_COUNT = env.int('RECONPOINT_SHARD_MAX_COUNT', default=32)
+SHARD_MAX_RETRIES = env.int('RECONPOINT_SHARD_MAX_RETRIES', default=2)
+SHARD_RETRY_DELAY = env.int('RECONPOINT_SHARD_RETRY_DELAY', default=30)
+
+# HTTP probes of all callers of a scan are coalesced into one httpx run per
+# window (seconds) or batch (URLs). Callers waiting for results probe by
+# themselves after the timeout (seconds).
+PROBE_QUEUE_WINDOW = env.int('RECONPOINT_PROBE_QUEUE_WINDOW', default=5)
+PROBE_QUEUE_MAX_BATCH = env.int('RECONPOINT_PROBE_QUEUE_MAX_BATCH', default=500)
+PROBE_QUEUE_TIMEOUT = env.int('RECONPOINT_PROBE_QUEUE_TIMEOUT', default=300)
+
+# Max URL hashes kept in memory while fetch_url deduplicates URLs, others
+# spill to disk
+URL_DEDUPE_MEMORY_ITEMS = env.int('RECONPOINT_URL_DEDUPE_MEMORY_ITEMS', default=500000)
+
 '''
 CELERY settings
 '''
@@ -246,6 +300,13 @@ CELERY_IGNORE_RESULTS = False
 CELERY_EAGER_PROPAGATES_EXCEPTIONS = True
 CELERY_TRACK_STARTED = True
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+CELERY_BEAT_SCHEDULE = {
+    'check_proxies': {
+        'task': 'check_proxies',
+        'schedule': PROXY_POOL_CHECK_INTERVAL,
+        'options': {'queue': 'check_proxies_queue'},
+    },
+}
 '''
 ROLES and PERMISSIONS
 '''
@@ -255,7 +316,28 @@ ROLEPERMISSIONS_REDIRECT_TO_LOGIN = True
 '''
 Cache settings
 '''
-RECONPOINT_TASK_IGNORE_CACHE_KWARGS = ['ctx']
+RECONPOINT_TASK_IGNORE_CACHE_KWARGS = ['ctx', 'description']
+
+# Cache outputs of passive recon tools (subdomain sources, archived URLs)
+# across scans of the same target
+RECONPOINT_TOOL_CACHE_ENABLED = env.bool('RECONPOINT_TOOL_CACHE_ENABLED', default=False)
+
+# Task result cache: TTL (seconds) per task or tool name, and size budget
+TASK_CACHE_TTLS = {
+    'default': env.int('RECONPOINT_TASK_CACHE_DEFAULT_TTL', default=600),
+    # Passive subdomain sources
+    'amass-passive': 86400,
+    'sublist3r': 86400,
+    'subfinder': 86400,
+    'oneforall': 86400,
+    'ctfr': 86400,
+    'netlas': 86400,
+    'chaos': 86400,
+    # Archived URLs
+    'gau': 3 * 86400,
+    'waybackurls': 3 * 86400,
+}
+TASK_CACHE_MAX_BYTES = env.int('RECONPOINT_TASK_CACHE_MAX_BYTES', default=256 * 1024 * 1024)
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+
+from celery.utils.log import get_task_logger
+from redis import Redis
+
+from dashboard.models import (ChaosAPIKey, HackerOneAPIKey, NetlasAPIKey,
+							  OllamaSettings, OpenAiAPIKey)
+from scanEngine.models import (Hackerone, Notification, Proxy,
+							   VulnerabilityReportSetting)
+
+logger = get_task_logger(__name__)
+
+#-------------------#
+# Settings snapshot #
+#-------------------#
+# Singleton configuration rows (notification, proxy, HackerOne, API keys,
+# Ollama, report settings) are loaded once per process and kept in memory.
+# Saving or deleting one of those models publishes its name on a Redis pub/sub
+# channel (see reconPoint.signals): every process listens to it in a
+# background thread and drops the matching entry, which is reloaded on next
+# access. Entries are only cached while the process is subscribed, so that a
+# missed invalidation can never serve a stale value.
+
+SETTINGS_SNAPSHOT_CHANNEL = 'settings_snapshot'
+SETTINGS_SNAPSHOT_RECONNECT_DELAY = 5
+
+# Setting name -> (model, loader)
+SETTINGS_SNAPSHOT_LOADERS = {
+	'notification': (Notification, lambda: Notification.objects.first()),
+	'proxy': (Proxy, lambda: Proxy.objects.first()),
+	'hackerone': (Hackerone, lambda: Hackerone.objects.first()),
+	'hackerone_api_key': (HackerOneAPIKey, lambda: HackerOneAPIKey.objects.first()),
+	'openai_api_key': (OpenAiAPIKey, lambda: OpenAiAPIKey.objects.first()),
+	'netlas_api_key': (NetlasAPIKey, lambda: NetlasAPIKey.objects.first()),
+	'chaos_api_key': (ChaosAPIKey, lambda: ChaosAPIKey.objects.first()),
+	'ollama': (OllamaSettings, lambda: OllamaSettings.objects.first()),
+	'vulnerability_report': (VulnerabilityReportSetting, lambda: VulnerabilityReportSetting.objects.first()),
+}
+
+
+class SettingsSnapshot:
+	"""In-memory snapshot of singleton settings, invalidated over Redis
+	pub/sub. Without Redis, settings are loaded from the database every time.
+
+	Args:
+		client (redis.Redis): Redis client.
+		loaders (dict): Setting name -> (model, loader).
+		channel (str): Pub/sub channel.
+	"""
+
+	def __init__(self, client, loaders=SETTINGS_SNAPSHOT_LOADERS, channel=SETTINGS_SNAPSHOT_CHANNEL):
+		self.client = client
+		self.loaders = loaders
+		self.channel = channel
+		self.values = {}
+		self.generation = 0
+		self.listening = False
+		self.listener = None
+		self.pid = None
+		self.lock = threading.Lock()
+
+	def get(self, name):
+		"""Get a setting.
+
+		Args:
+			name (str): Setting name, from SETTINGS_SNAPSHOT_LOADERS.
+
+		Returns:
+			Model: Settings object, or None if not configured.
+		"""
+		_, loader = self.loaders[name]
+		if not self.client:
+			return loader()
+		self.ensure_listener()
+		with self.lock:
+			if name in self.values:
+				return self.values[name]
+			generation = self.generation
+		value = loader()
+		with self.lock:
+			# Do not cache a value that was invalidated while loading
+			if self.listening and generation == self.generation:
+				self.values[name] = value
+		return value
+
+	def invalidate(self, name=None):
+		"""Drop a setting from the snapshot of this process.
+
+		Args:
+			name (str, optional): Setting name. If None, drop all settings.
+		"""
+		with self.lock:
+			self.generation += 1
+			if name:
+				self.values.pop(name, None)
+			else:
+				self.values.clear()
+
+	def publish(self, name=None):
+		"""Invalidate a setting in all processes.
+
+		Args:
+			name (str, optional): Setting name. If None, invalidate all
+				settings.
+		"""
+		self.invalidate(name)
+		if self.client:
+			self.client.publish(self.channel, name or '')
+
+	def ensure_listener(self):
+		"""Start the pub/sub listener thread, once per process (the thread
+		does not survive a fork)."""
+		if self.pid == os.getpid() and self.listener.is_alive():
+			return
+		with self.lock:
+			if self.pid == os.getpid() and self.listener.is_alive():
+				return
+			self.pid = os.getpid()
+			self.values.clear()
+			self.listening = False
+			self.listener = threading.Thread(target=self.listen, name='settings-snapshot', daemon=True)
+			self.listener.start()
+
+	def listen(self):
+		while True:
+			try:
+				pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+				pubsub.subscribe(self.channel)
+				with self.lock:
+					self.listening = True
+				for message in pubsub.listen():
+					name = message['data']
+					name = name.decode() if isinstance(name, bytes) else name
+					self.invalidate(name or None)
+			except Exception as e:
+				logger.warning(f'Settings snapshot listener disconnected: {e}')
+			with self.lock:
+				self.listening = False
+			self.invalidate()
+			time.sleep(SETTINGS_SNAPSHOT_RECONNECT_DELAY)
+
+
+def get_setting_name(model):
+	"""Get the snapshot setting name of a model.
+
+	Args:
+		model (Model): Model class.
+
+	Returns:
+		str: Setting name, or None if the model is not part of the snapshot.
+	"""
+	for name, (setting_model, _) in SETTINGS_SNAPSHOT_LOADERS.items():
+		if setting_model is model:
+			return name
+	return None
+
+
+redis = None
+if 'CELERY_BROKER' in os.environ:
+	redis = Redis.from_url(os.environ['CELERY_BROKER'])
+settings_snapshot = SettingsSnapshot(redis)
@@ -0,0 +1,165 @@
+import math
+import os
+
+#----------------#
+# Input sharding #
+#----------------#
+# Long-running tool tasks (naabu, nuclei, dalfox, EyeWitness) can split their
+# input in shards that run as parallel Celery tasks, so that one big scan
+# spreads over all workers. Shard sizes adapt to the throughput measured
+# on previous shards of the same task (seconds per item, moving average in
+# Redis), aiming at a fixed duration per shard. Shard results are merged in
+# input order once all shards are done, and a failed shard is retried on its
+# own (see ReconpointTask.shard).
+
+DEFAULT_MIN_SIZE = 50
+DEFAULT_MAX_SIZE = 5000
+DEFAULT_MAX_SHARDS = 32
+DEFAULT_TARGET_SECONDS = 600
+THROUGHPUT_TTL = 30 * 86400
+EWMA_ALPHA = 0.3
+
+
+def plan_shards(
+		total,
+		seconds_per_item=None,
+		target_seconds=DEFAULT_TARGET_SECONDS,
+		min_size=DEFAULT_MIN_SIZE,
+		max_size=DEFAULT_MAX_SIZE,
+		max_shards=DEFAULT_MAX_SHARDS):
+	"""Get the sizes of the shards of an input.
+
+	Shards aim at `target_seconds` of work each, from the measured throughput,
+	within `min_size` and `max_size` items. Without measurement, the input is
+	spread over `max_shards` shards of at least `min_size` items. The number
+	of shards is capped to `max_shards`, which wins over `max_size`.
+
+	Args:
+		total (int): Number of input items.
+		seconds_per_item (float, optional): Measured seconds per item.
+		target_seconds (int): Target duration of a shard.
+		min_size (int): Min shard size.
+		max_size (int): Max shard size.
+		max_shards (int): Max number of shards.
+
+	Returns:
+		list: Shard sizes, balanced, summing to `total`. A single shard means
+			the input should not be sharded.
+	"""
+	if total <= 0:
+		return []
+	if seconds_per_item:
+		size = int(target_seconds / seconds_per_item)
+	else:
+		size = math.ceil(total / max_shards)
+	size = min(max(size, min_size), max_size)
+	count = min(math.ceil(total / size), max_shards)
+	base, remainder = divmod(total, count)
+	return [base + 1 if ix < remainder else base for ix in range(count)]
+
+
+def split_items(items, sizes):
+	"""Split items in consecutive shards.
+
+	Args:
+		items (list): Input items.
+		sizes (list): Shard sizes, from `plan_shards`.
+
+	Returns:
+		list: Lists of items.
+	"""
+	shards = []
+	start = 0
+	for size in sizes:
+		shards.append(items[start:start + size])
+		start += size
+	return shards
+
+
+def merge_results(results):
+	"""Merge shard results, in shard order. Lists are concatenated and dicts
+	merged, list values of the same key being concatenated. Other results
+	(e.g. None from a failed shard) are dropped.
+
+	Args:
+		results (list): Shard results.
+
+	Returns:
+		list or dict: Merged result, None if no shard returned a list or dict.
+	"""
+	merged = None
+	for result in results:
+		if isinstance(result, list):
+			merged = (merged or []) + result
+		elif isinstance(result, dict):
+			merged = merged or {}
+			for key, value in result.items():
+				if isinstance(value, list) and isinstance(merged.get(key), list):
+					merged[key] = merged[key] + value
+				else:
+					merged[key] = value
+	return merged
+
+
+def shard_path(path, index):
+	"""Make a file or directory path unique to a shard.
+
+	Args:
+		path (str): Path.
+		index (int): Shard index, None if not a shard.
+
+	Returns:
+		str: Path.
+	"""
+	if index is None:
+		return path
+	root, ext = os.path.splitext(path)
+	return f'{root}_shard{index}{ext}'
+
+
+class ThroughputTracker:
+	"""Seconds per input item of each task, shared by all workers through
+	Redis.
+
+	Args:
+		client (redis.Redis): Redis client. Nothing is measured if None.
+		prefix (str): Redis keys prefix.
+	"""
+
+	def __init__(self, client, prefix='shard_throughput'):
+		self.client = client
+		self.prefix = prefix
+
+	def key(self, task_name):
+		return f'{self.prefix}:{task_name}'
+
+	def get(self, task_name):
+		"""Get the seconds per item of a task.
+
+		Returns:
+			float: Seconds per item, None if never measured.
+		"""
+		if not self.client:
+			return None
+		value = self.client.get(self.key(task_name))
+		return float(value) if value else None
+
+	def record(self, task_name, items, seconds):
+		"""Record the duration of a shard.
+
+		Args:
+			task_name (str): Task name.
+			items (int): Number of items of the shard.
+			seconds (float): Shard duration.
+
+		Returns:
+			float: New seconds per item.
+		"""
+		if not self.client or not items:
+			return None
+		value = seconds / items
+		previous = self.get(task_name)
+		if previous:
+			value = (1 - EWMA_ALPHA) * previous + EWMA_ALPHA * value
+		self.client.set(self.key(task_name), value, ex=THROUGHPUT_TTL)
+		return value
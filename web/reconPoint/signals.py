@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from startScan.models import ScanHistory
+from scanEngine.models import EngineType
+from startScan.models import ScanHistory, SubScan
 from reconPoint.celery import app
+from reconPoint.scan_context import invalidate_scan_context
+from reconPoint.settings_snapshot import (SETTINGS_SNAPSHOT_LOADERS,
+                                          get_setting_name, settings_snapshot)
 
 @receiver(post_save, sender=ScanHistory)
 def scan_completed_signal(sender, instance, **kwargs):
@@ -9,6 +13,27 @@ def scan_completed_signal(sender, instance, **kwargs):
         # Emit event for downstream processing
         app.send_task('reconPoint.tasks.handle_scan_completion', args=[instance.id])
 
+# Invalidate workers' cached scan contexts on scan state changes
+@receiver([post_save, post_delete], sender=ScanHistory)
+def scan_changed_signal(sender, instance, **kwargs):
+    invalidate_scan_context(instance.id)
+
+@receiver([post_save, post_delete], sender=SubScan)
+def subscan_changed_signal(sender, instance, **kwargs):
+    invalidate_scan_context(instance.scan_history_id)
+
+@receiver([post_save, post_delete], sender=EngineType)
+def engine_changed_signal(sender, instance, **kwargs):
+    invalidate_scan_context()
+
+# Invalidate workers' settings snapshots on configuration changes
+def settings_changed_signal(sender, instance, **kwargs):
+    settings_snapshot.publish(get_setting_name(sender))
+
+for setting_model, _ in SETTINGS_SNAPSHOT_LOADERS.values():
+    post_save.connect(settings_changed_signal, sender=setting_model)
+    post_delete.connect(settings_changed_signal, sender=setting_model)
+
 # Celery signal for task success
 from celery.signals import task_success
 
@@ -0,0 +1,105 @@
+import os
+import time
+
+#--------------#
+# Scan streams #
+#--------------#
+# A scan stream is an append-only file of newline-separated items stored in
+# the scan results directory, so that it is shared by all workers. Producers
+# append batches of items while they run, and consumers read the new items
+# as they arrive instead of waiting for the producer's final output file.
+# Once the producer is done, it creates a `.done` marker next to the stream.
+
+DEFAULT_POLL_INTERVAL = 1
+
+
+class ScanStream:
+	"""Append-only stream of items shared between scan stages.
+
+	Args:
+		results_dir (str): Scan results directory.
+		name (str): Stream name, e.g. 'subdomains'.
+	"""
+
+	def __init__(self, results_dir, name):
+		self.path = os.path.join(results_dir, f'{name}.stream')
+		self.done_path = f'{self.path}.done'
+
+	@property
+	def closed(self):
+		return os.path.exists(self.done_path)
+
+	def reset(self):
+		"""Remove stream content and done marker, e.g. before a new run."""
+		for path in (self.path, self.done_path):
+			if os.path.exists(path):
+				os.remove(path)
+
+	def publish(self, items):
+		"""Append items to the stream. Items are written in a single append so
+		that readers never see a partial batch.
+
+		Args:
+			items (list): Items (str), without newlines.
+		"""
+		items = [item for item in items if item]
+		if not items:
+			return
+		data = ''.join(f'{item}\n' for item in items).encode('utf-8')
+		fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+		try:
+			os.write(fd, data)
+		finally:
+			os.close(fd)
+
+	def close(self):
+		"""Mark the stream as complete."""
+		open(self.done_path, 'a').close()
+
+	def read(self, offset=0):
+		"""Read complete items written after an offset.
+
+		Args:
+			offset (int): Byte offset to read from.
+
+		Returns:
+			tuple: (list of items, next offset).
+		"""
+		if not os.path.exists(self.path):
+			return [], offset
+		with open(self.path, 'rb') as f:
+			f.seek(offset)
+			data = f.read()
+		end = data.rfind(b'\n') + 1
+		if not end:
+			return [], offset
+		items = data[:end].decode('utf-8', errors='replace').splitlines()
+		return items, offset + end
+
+	def consume(self, offset=0, poll_interval=DEFAULT_POLL_INTERVAL, timeout=None):
+		"""Yield batches of new items until the stream is closed and read.
+
+		Args:
+			offset (int): Byte offset to start from.
+			poll_interval (float): Seconds to wait when no new items are there.
+			timeout (float, optional): Stop waiting for the producer after this
+				many seconds without new items.
+
+		Yields:
+			list: Batch of items.
+		"""
+		last_item_time = time.monotonic()
+		while True:
+			# Check closed before reading so that items written right before
+			# the marker are not missed.
+			closed = self.closed
+			items, offset = self.read(offset)
+			if items:
+				last_item_time = time.monotonic()
+				yield items
+				continue
+			if closed:
+				return
+			if timeout is not None and time.monotonic() - last_item_time > timeout:
+				return
+			time.sleep(poll_interval)
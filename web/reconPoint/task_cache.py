@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+
+#-------------------#
+# Task result cache #
+#-------------------#
+# Results are stored in Redis under a content-addressed key: the sha256 of
+# the task name, its normalized inputs and the contents of its input files.
+# Values bigger than a threshold are zlib-compressed. Each task type has its
+# own TTL, and the least recently used entries are evicted once the cache
+# grows over its size budget. Hits, misses and bytes are counted globally and
+# per task type in a Redis hash.
+
+DEFAULT_TTL = 600
+DEFAULT_COMPRESS_THRESHOLD = 1024
+
+RAW_PREFIX = b'r'
+ZLIB_PREFIX = b'z'
+
+
+def make_cache_key(name, inputs=None, input_files=()):
+	"""Build a content-addressed cache key.
+
+	Args:
+		name (str): Task or tool name.
+		inputs (dict, optional): JSON-serializable inputs. Keys order does not
+			matter.
+		input_files (list, optional): Paths of files the result depends on.
+			Missing files are hashed as empty.
+
+	Returns:
+		str: Hex digest.
+	"""
+	digest = hashlib.sha256()
+	digest.update(name.encode())
+	digest.update(json.dumps(inputs or {}, sort_keys=True, default=str).encode())
+	for path in input_files:
+		digest.update(b'\0file\0')
+		if path and os.path.isfile(path):
+			with open(path, 'rb') as f:
+				for chunk in iter(lambda: f.read(1024 * 1024), b''):
+					digest.update(chunk)
+	return digest.hexdigest()
+
+
+def encode_value(data, compress_threshold=DEFAULT_COMPRESS_THRESHOLD):
+	"""Prefix a value with its encoding, compressing it if big enough.
+
+	Args:
+		data (bytes): Raw value.
+		compress_threshold (int): Min size to compress.
+
+	Returns:
+		bytes: Stored value.
+	"""
+	if len(data) >= compress_threshold:
+		compressed = zlib.compress(data, 6)
+		if len(compressed) < len(data):
+			return ZLIB_PREFIX + compressed
+	return RAW_PREFIX + data
+
+
+def decode_value(stored):
+	"""Decode a value stored by `encode_value`.
+
+	Args:
+		stored (bytes): Stored value.
+
+	Returns:
+		bytes: Raw value.
+	"""
+	if stored[:1] == ZLIB_PREFIX:
+		return zlib.decompress(stored[1:])
+	return stored[1:]
+
+
+class TaskCache:
+	"""Redis-backed cache of task results and tool outputs.
+
+	Args:
+		client (redis.Redis): Redis client. The cache is disabled if None.
+		ttls (dict, optional): Task name -> TTL in seconds. Names missing from
+			the dict use 'default' or DEFAULT_TTL.
+		max_bytes (int, optional): Size budget of stored values. Least
+			recently used entries are evicted above it.
+		compress_threshold (int): Min value size to compress.
+		prefix (str): Redis keys prefix.
+	"""
+
+	def __init__(self, client, ttls=None, max_bytes=None, compress_threshold=DEFAULT_COMPRESS_THRESHOLD, prefix='task_cache'):
+		self.client = client
+		self.ttls = ttls or {}
+		self.max_bytes = max_bytes
+		self.compress_threshold = compress_threshold
+		self.prefix = prefix
+		self.stats_key = f'{prefix}:stats'
+		self.sizes_key = f'{prefix}:sizes'
+		self.lru_key = f'{prefix}:lru'
+		self.bytes_key = f'{prefix}:bytes'
+
+	def get_ttl(self, name):
+		return self.ttls.get(name, self.ttls.get('default', DEFAULT_TTL))
+
+	def value_key(self, key):
+		return f'{self.prefix}:{key}'
+
+	def get(self, name, key):
+		"""Get a cached value.
+
+		Args:
+			name (str): Task or tool name, for stats.
+			key (str): Key from `make_cache_key`.
+
+		Returns:
+			bytes: Raw value, or None on miss.
+		"""
+		if not self.client:
+			return None
+		stored = self.client.get(self.value_key(key))
+		if stored is None:
+			self.count(name, misses=1)
+			self.forget(key)
+			return None
+		self.client.zadd(self.lru_key, {key: time.time()})
+		self.count(name, hits=1, bytes_read=len(stored))
+		return decode_value(stored)
+
+	def set(self, name, key, data, ttl=None):
+		"""Cache a value.
+
+		Args:
+			name (str): Task or tool name, for TTL and stats.
+			key (str): Key from `make_cache_key`.
+			data (bytes): Raw value.
+			ttl (int, optional): TTL in seconds, overrides the task TTL.
+		"""
+		ttl = ttl or self.get_ttl(name)
+		if not self.client or not ttl:
+			return
+		stored = encode_value(data, self.compress_threshold)
+		old_size = int(self.client.hget(self.sizes_key, key) or 0)
+		pipe = self.client.pipeline()
+		pipe.set(self.value_key(key), stored, ex=ttl)
+		pipe.hset(self.sizes_key, key, len(stored))
+		pipe.zadd(self.lru_key, {key: time.time()})
+		pipe.incrby(self.bytes_key, len(stored) - old_size)
+		pipe.execute()
+		self.count(name, sets=1, bytes_written=len(stored), bytes_raw=len(data))
+		if self.max_bytes and int(self.client.get(self.bytes_key) or 0) > self.max_bytes:
+			self.evict()
+
+	def get_json(self, name, key):
+		data = self.get(name, key)
+		return None if data is None else json.loads(data)
+
+	def set_json(self, name, key, value, ttl=None):
+		self.set(name, key, json.dumps(value).encode(), ttl=ttl)
+
+	def forget(self, key):
+		"""Drop an entry and its size accounting. The size is only known if
+		the entry was accounted for, the other keys are dropped either way."""
+		size = self.client.hget(self.sizes_key, key)
+		pipe = self.client.pipeline()
+		pipe.delete(self.value_key(key))
+		pipe.hdel(self.sizes_key, key)
+		pipe.zrem(self.lru_key, key)
+		if size is not None:
+			pipe.decrby(self.bytes_key, int(size))
+		pipe.execute()
+
+	def reconcile(self):
+		"""Reset the stored bytes counter to the sum of the entry sizes."""
+		total = sum(int(size) for size in self.client.hvals(self.sizes_key))
+		self.client.set(self.bytes_key, total)
+		return total
+
+	def evict(self, batch_size=100):
+		"""Evict least recently used entries until the cache is back under 90%
+		of its size budget."""
+		target = self.max_bytes * 0.9
+		evicted = 0
+		total = int(self.client.get(self.bytes_key) or 0)
+		while total > target:
+			keys = self.client.zrange(self.lru_key, 0, batch_size - 1)
+			if not keys:
+				# counter drifted from the entries left
+				self.reconcile()
+				break
+			for key in keys:
+				self.forget(key.decode() if isinstance(key, bytes) else key)
+				evicted += 1
+			previous, total = total, int(self.client.get(self.bytes_key) or 0)
+			if total >= previous:
+				# evicted entries were not accounted for, each batch still
+				# shrinks the LRU index so the loop ends once it is empty
+				total = self.reconcile()
+		if evicted:
+			self.client.hincrby(self.stats_key, 'evictions', evicted)
+
+	def count(self, name, **counters):
+		pipe = self.client.pipeline()
+		for counter, value in counters.items():
+			pipe.hincrby(self.stats_key, counter, value)
+			pipe.hincrby(self.stats_key, f'{name}:{counter}', value)
+		pipe.execute()
+
+	def stats(self):
+		"""Get cache counters.
+
+		Returns:
+			dict: Global counters, stored bytes, and per task counters under
+				'tasks'.
+		"""
+		if not self.client:
+			return {}
+		stats = {'bytes': int(self.client.get(self.bytes_key) or 0), 'tasks': {}}
+		for field, value in self.client.hgetall(self.stats_key).items():
+			field = field.decode() if isinstance(field, bytes) else field
+			if ':' in field:
+				name, counter = field.rsplit(':', 1)
+				stats['tasks'].setdefault(name, {})[counter] = int(value)
+			else:
+				stats[field] = int(value)
+		return stats
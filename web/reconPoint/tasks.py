@@ -2,33 +2,56 @@ import csv
 import json
 import os
 import pprint
+import signal
 import subprocess
-import time
+import threading
 import validators
 import xmltodict
 import yaml
 import tldextract
 import concurrent.futures
 import base64
+import uuid
 from urllib.parse import urlparse
 from api.serializers import SubdomainSerializer
-from celery import chain, chord, group
-from celery.result import allow_join_result
+from celery import chain, group
 from celery.utils.log import get_task_logger
-from django.db.models import Count
+from django.db import connection
+from django.db.models import Max
 from dotted_dict import DottedDict
 from django.utils import timezone
 from pycvesearch import CVESearch
 from metafinder.extractor import extract_metadata_from_google_search
 
 from reconPoint.celery import app
-from reconPoint.celery_custom_task import ReconpointTask
+from reconPoint.celery_custom_task import (ReconpointTask, notification_aggregator,
+										 probe_queue, task_cache)
+from reconPoint.command_log import CommandLog
 from reconPoint.common_func import *
 from reconPoint.definitions import *
+from reconPoint.dedupe import (dedupe_watermark, delete_endpoints,
+							   find_duplicate_endpoints)
+from reconPoint.notif_aggregator import format_digest
+from reconPoint.probe_queue import (BATCH_FULL, WINDOW_OPENED,
+								 index_probe_results)
+from reconPoint.gf import GfMatcher
+from reconPoint.delta import (carry_forward_subdomains, get_delta_base,
+							   split_known_subdomains)
+from reconPoint.scope import get_scope_engine
 from reconPoint.settings import *
 from reconPoint.llm import *
+from reconPoint.settings_snapshot import settings_snapshot
+from reconPoint.sharding import merge_results, shard_path
+from reconPoint.scan_graph import compile_scan_graph, get_task_dependencies
+from reconPoint.streams import ScanStream
+from reconPoint.task_cache import make_cache_key
+from reconPoint.url_canon import SeenSet, iter_unique_urls
 from reconPoint.utilities import *
-from scanEngine.models import (EngineType, InstalledExternalTool, Notification, Proxy)
+from reconPoint.writers import (EndpointWriter, HttpCrawlWriter,
+							   PortScanWriter, VulnerabilityWriter,
+							   bulk_save_s3_buckets, bulk_save_subdomains,
+							   parse_subdomain_names)
+from scanEngine.models import (EngineType, InstalledExternalTool)
 from startScan.models import *
 from startScan.models import EndPoint, Subdomain, Vulnerability
 from targetApp.models import Domain
@@ -79,8 +102,8 @@ def initiate_scan(
 		engine_id = engine_id or scan.scan_type.id # scan history engine_id
 		engine = EngineType.objects.get(pk=engine_id)
 
-		# Get YAML config
-		config = yaml.safe_load(engine.yaml_configuration)
+		# Get parsed engine config
+		config = engine.get_configuration()
 		enable_http_crawl = config.get(ENABLE_HTTP_CRAWL, DEFAULT_ENABLE_HTTP_CRAWL)
 		gf_patterns = config.get(GF_PATTERNS, [])
 
@@ -120,6 +143,15 @@ def initiate_scan(
 
 		if add_gf_patterns:
 			scan.used_gf_patterns = ','.join(gf_patterns)
+
+		# Delta scan: only new subdomains go through the active tasks, the
+		# results of known ones are carried forward from the last completed
+		# scan of the domain with the same engine
+		if config.get(DELTA_SCAN, False):
+			if 'subdomain_discovery' in engine.tasks:
+				scan.delta_base = get_delta_base(scan)
+			if not scan.delta_base:
+				logger.warning(f'No base scan with engine {engine.engine_name} for a delta scan of {domain.name}, running a full scan.')
 		scan.save()
 
 		# Create scan results dir
@@ -136,6 +168,8 @@ def initiate_scan(
 			'yaml_configuration': config,
 			'out_of_scope_subdomains': out_of_scope_subdomains
 		}
+		if scan.delta_base_id:
+			ctx['delta_base_id'] = scan.delta_base_id
 		ctx_str = json.dumps(ctx, indent=2)
 
 		# Send start notif
@@ -179,33 +213,21 @@ def initiate_scan(
 			subdomain.save()
 
 
-		# Build Celery tasks, crafted according to the dependency graph below:
-		# subdomain_discovery --> port_scan --> fetch_url --> dir_file_fuzz
-		# osint								             	  vulnerability_scan
-		# osint								             	  dalfox xss scan
-		#						 	   		         	  	  screenshot
-		#													  waf_detection
-		workflow = chain(
-			group(
-				subdomain_discovery.si(ctx=ctx, description='Subdomain discovery'),
-				osint.si(ctx=ctx, description='OS Intelligence')
-			),
-			port_scan.si(ctx=ctx, description='Port scan'),
-			fetch_url.si(ctx=ctx, description='Fetch URL'),
-			group(
-				dir_file_fuzz.si(ctx=ctx, description='Directories & files fuzz'),
-				vulnerability_scan.si(ctx=ctx, description='Vulnerability scan'),
-				screenshot.si(ctx=ctx, description='Screenshot'),
-				waf_detection.si(ctx=ctx, description='WAF detection')
-			)
-		)
+		# Build Celery tasks from the engine tasks dependency graph (see
+		# reconPoint.scan_graph): each task starts as soon as the tasks
+		# producing its inputs are done.
+		dependencies = get_task_dependencies(engine.tasks)
+		plan = compile_scan_graph(dependencies)
 
 		# Build callback
 		callback = report.si(ctx=ctx).set(link_error=[report.si(ctx=ctx)])
 
-		# Run Celery chord
-		logger.info(f'Running Celery workflow with {len(workflow.tasks) + 1} tasks')
-		task = chain(workflow, callback).on_error(callback).delay()
+		# Run Celery workflow
+		logger.info(f'Running Celery workflow with {len(dependencies) + 1} tasks: {plan}')
+		if plan:
+			task = chain(build_scan_workflow(plan, ctx), callback).on_error(callback).delay()
+		else:
+			task = callback.delay()
 		scan.celery_ids.append(task.id)
 		scan.save()
 
@@ -225,6 +247,23 @@ def initiate_scan(
 		}
 
 
+def build_scan_workflow(plan, ctx):
+	"""Build a Celery workflow from a compiled scan tasks graph.
+
+	Args:
+		plan (str | tuple): Plan returned by compile_scan_graph.
+		ctx (dict): Scan context.
+
+	Returns:
+		celery.canvas.Signature: Workflow.
+	"""
+	if isinstance(plan, str):
+		return globals()[plan].si(ctx=ctx, description=SCAN_TASK_DESCRIPTIONS.get(plan))
+	kind, items = plan
+	sigs = [build_scan_workflow(item, ctx) for item in items]
+	return chain(*sigs) if kind == 'chain' else group(*sigs)
+
+
 @app.task(name='initiate_subscan', bind=False, queue='subscan_queue')
 def initiate_subscan(
 		scan_history_id,
@@ -256,8 +295,8 @@ def initiate_subscan(
 	engine_id = engine_id or scan.scan_type.id
 	engine = EngineType.objects.get(pk=engine_id)
 
-	# Get YAML config
-	config = yaml.safe_load(engine.yaml_configuration)
+	# Get parsed engine config
+	config = engine.get_configuration()
 	enable_http_crawl = config.get(ENABLE_HTTP_CRAWL, DEFAULT_ENABLE_HTTP_CRAWL)
 
 	# Create scan activity of SubScan Model
@@ -271,9 +310,6 @@ def initiate_subscan(
 		engine=engine)
 	subscan.save()
 
-	# Get YAML configuration
-	config = yaml.safe_load(engine.yaml_configuration)
-
 	# Create results directory
 	results_dir = f'{scan.results_dir}/subscans/{subscan.id}'
 	os.makedirs(results_dir, exist_ok=True)
@@ -388,6 +424,69 @@ def report(ctx={}, description=None):
 		status=status_h)
 
 
+@app.task(name='complete_scan_activity', bind=False, queue='scan_activity_queue')
+def complete_scan_activity(
+		activity_id,
+		status=SUCCESS_TASK,
+		task_name=None,
+		output_path=None,
+		scan_history_id=None,
+		subscan_id=None,
+		engine_id=None):
+	"""Complete the ScanActivity of a task that replaced itself with a
+	workflow (see ReconpointTask.replace), once that workflow has finished.
+
+	Args:
+		activity_id (int): ScanActivity id.
+		status (int): Final task status.
+		task_name (str, optional): Task name, for notifications.
+		output_path (str, optional): Task output path.
+		scan_history_id (int, optional): ScanHistory id.
+		subscan_id (int, optional): SubScan id.
+		engine_id (int, optional): EngineType id.
+	"""
+	activity = ScanActivity.objects.filter(pk=activity_id).first()
+	if not activity or activity.status != RUNNING_TASK:
+		# Already completed, e.g. error callback ran for another failed sub-task
+		return
+	activity.status = status
+	activity.time = timezone.now()
+	activity.save()
+	logger.warning(f'Task {task_name} status is {CELERY_TASK_STATUS_MAP.get(status)}')
+	send_task_notif.delay(
+		task_name or activity.name,
+		status=CELERY_TASK_STATUS_MAP.get(status),
+		output_path=output_path,
+		scan_history_id=scan_history_id,
+		engine_id=engine_id,
+		subscan_id=subscan_id)
+
+
+@app.task(name='merge_shards', bind=False, queue='scan_activity_queue')
+def merge_shards(results, task_name=None, output_path=None, shard_output_paths=[]):
+	"""Merge the results of the shards of a task (see ReconpointTask.shard),
+	in input order, into the task output file.
+
+	Args:
+		results (list): Shard results, in shard order.
+		task_name (str, optional): Task name.
+		output_path (str, optional): Task output path.
+		shard_output_paths (list): Shard output paths, removed once merged.
+
+	Returns:
+		list or dict: Merged results.
+	"""
+	result = merge_results(results)
+	if result and output_path and not os.path.exists(output_path):
+		with open(output_path, 'w') as f:
+			json.dump(result, f, indent=4)
+	for path in shard_output_paths:
+		if os.path.isfile(path):
+			os.remove(path)
+	logger.warning(f'Merged {len(results)} {task_name} shards to {output_path}')
+	return result
+
+
 #------------------------- #
 # Tracked reconPoint tasks    #
 #--------------------------#
@@ -423,8 +522,7 @@ def subdomain_discovery(
 	default_subdomain_tools = [tool.name.lower() for tool in InstalledExternalTool.objects.filter(is_default=True).filter(is_subdomain_gathering=True)]
 	custom_subdomain_tools = [tool.name.lower() for tool in InstalledExternalTool.objects.filter(is_default=False).filter(is_subdomain_gathering=True)]
 	send_subdomain_changes, send_interesting = False, False
-	notif = Notification.objects.first()
-	subdomain_scope_checker = SubdomainScopeChecker(self.out_of_scope_subdomains)
+	notif = settings_snapshot.get('notification')
 	if notif:
 		send_subdomain_changes = notif.send_subdomain_changes_notif
 		send_interesting = notif.send_interesting_notif
@@ -438,30 +536,34 @@ def subdomain_discovery(
 	default_subdomain_tools.append('amass-passive')
 	default_subdomain_tools.append('amass-active')
 
-	# Run tools
+	# Build tools commands
+	tool_cmds = []
 	for tool in tools:
 		cmd = None
-		logger.info(f'Scanning subdomains for {host} with {tool}')
+		results_file = f'{self.results_dir}/subdomains_{tool}.txt'
 		proxy = get_random_proxy()
 		if tool in default_subdomain_tools:
 			if tool == 'amass-passive':
 				use_amass_config = config.get(USE_AMASS_CONFIG, False)
-				cmd = f'amass enum -passive -d {host} -o {self.results_dir}/subdomains_amass.txt'
+				results_file = f'{self.results_dir}/subdomains_amass.txt'
+				cmd = f'amass enum -passive -d {host} -o {results_file}'
 				cmd += ' -config /root/.config/amass.ini' if use_amass_config else ''
 
 			elif tool == 'amass-active':
 				use_amass_config = config.get(USE_AMASS_CONFIG, False)
 				amass_wordlist_name = config.get(AMASS_WORDLIST, 'deepmagic.com-prefixes-top50000')
 				wordlist_path = f'/usr/src/wordlist/{amass_wordlist_name}.txt'
-				cmd = f'amass enum -active -d {host} -o {self.results_dir}/subdomains_amass_active.txt'
+				results_file = f'{self.results_dir}/subdomains_amass_active.txt'
+				cmd = f'amass enum -active -d {host} -o {results_file}'
 				cmd += ' -config /root/.config/amass.ini' if use_amass_config else ''
 				cmd += f' -brute -w {wordlist_path}'
 
 			elif tool == 'sublist3r':
-				cmd = f'python3 /usr/src/github/Sublist3r/sublist3r.py -d {host} -t {threads} -o {self.results_dir}/subdomains_sublister.txt'
+				results_file = f'{self.results_dir}/subdomains_sublister.txt'
+				cmd = f'python3 /usr/src/github/Sublist3r/sublist3r.py -d {host} -t {threads} -o {results_file}'
 
 			elif tool == 'subfinder':
-				cmd = f'subfinder -d {host} -o {self.results_dir}/subdomains_subfinder.txt'
+				cmd = f'subfinder -d {host} -o {results_file}'
 				use_subfinder_config = config.get(USE_SUBFINDER_CONFIG, False)
 				cmd += ' -config /root/.config/subfinder/config.yaml' if use_subfinder_config else ''
 				cmd += f' -proxy {proxy}' if proxy else ''
@@ -471,24 +573,21 @@ def subdomain_discovery(
 
 			elif tool == 'oneforall':
 				cmd = f'python3 /usr/src/github/OneForAll/oneforall.py --target {host} run'
-				cmd_extract = f'cut -d\',\' -f6 /usr/src/github/OneForAll/results/{host}.csv | tail -n +2 > {self.results_dir}/subdomains_oneforall.txt'
+				cmd_extract = f'cut -d\',\' -f6 /usr/src/github/OneForAll/results/{host}.csv | tail -n +2 > {results_file}'
 				cmd_rm = f'rm -rf /usr/src/github/OneForAll/results/{host}.csv'
 				cmd += f' && {cmd_extract} && {cmd_rm}'
 
 			elif tool == 'ctfr':
-				results_file = self.results_dir + '/subdomains_ctfr.txt'
 				cmd = f'python3 /usr/src/github/ctfr/ctfr.py -d {host} -o {results_file}'
 				cmd_extract = rf"cat {results_file} | sed 's/\*.//g' | tail -n +12 | uniq | sort > {results_file}"
 				cmd += f' && {cmd_extract}'
 
 			elif tool == 'tlsx':
-				results_file = self.results_dir + '/subdomains_tlsx.txt'
 				cmd = f'tlsx -san -cn -silent -ro -host {host}'
 				cmd += rf" | sed -n '/^\([a-zA-Z0-9]\([-a-zA-Z0-9]*[a-zA-Z0-9]\)\?\.\)\+{host}$/p' | uniq | sort"
 				cmd += f' > {results_file}'
 
 			elif tool == 'netlas':
-				results_file = self.results_dir + '/subdomains_netlas.txt'
 				cmd = f'netlas search -d domain -i domain domain:"*.{host}" -f json'
 				netlas_key = get_netlas_key()
 				cmd += f' -a {netlas_key}' if netlas_key else ''
@@ -501,7 +600,6 @@ def subdomain_discovery(
 				if not chaos_key:
 					logger.error('Chaos API key not found. Skipping.')
 					continue
-				results_file = self.results_dir + '/subdomains_chaos.txt'
 				cmd = f'chaos -d {host} -silent -key {chaos_key} -o {results_file}'
 
 		elif tool in custom_subdomain_tools:
@@ -520,84 +618,116 @@ def subdomain_discovery(
 
 			
 			cmd = cmd.replace('{TARGET}', host)
-			cmd = cmd.replace('{OUTPUT}', f'{self.results_dir}/subdomains_{tool}.txt')
+			cmd = cmd.replace('{OUTPUT}', results_file)
 			cmd = cmd.replace('{PATH}', custom_tool.github_clone_path) if '{PATH}' in cmd else cmd
 		else:
 			logger.warning(
 				f'Subdomain discovery tool "{tool}" is not supported by reconPoint. Skipping.')
 			continue
 
-		# Run tool
+		tool_cmds.append((tool, cmd, results_file))
+
+	# Run tools concurrently, each one with its own timeout (either a single
+	# value for all tools or a {tool: seconds} mapping). Results are merged and
+	# de-duplicated as soon as a tool finishes.
+	concurrency = config.get(CONCURRENCY, SUBDOMAIN_DISCOVERY_DEFAULT_CONCURRENCY)
+	tool_timeout = config.get(TOOL_TIMEOUT)
+	def run_tool(tool, cmd, results_file):
+		logger.info(f'Scanning subdomains for {host} with {tool}')
+		cmd_timeout = tool_timeout.get(tool) if isinstance(tool_timeout, dict) else tool_timeout
 		try:
-			run_command(
+			run_cached_command(
+				tool,
 				cmd,
+				results_file,
+				cacheable=tool in SUBDOMAIN_PASSIVE_TOOLS,
+				results_dir=self.results_dir,
 				shell=True,
 				history_file=self.history_file,
 				scan_id=self.scan_id,
-				activity_id=self.activity_id)
-		except Exception as e:
-			logger.error(
-				f'Subdomain discovery tool "{tool}" raised an exception')
-			logger.exception(e)
-
-	# Gather all the tools' results in one single file. Write subdomains into
-	# separate files, and sort all subdomains.
-	run_command(
-		f'cat {self.results_dir}/subdomains_*.txt > {self.output_path}',
-		shell=True,
-		history_file=self.history_file,
-		scan_id=self.scan_id,
-		activity_id=self.activity_id)
-	run_command(
-		f'sort -u {self.output_path} -o {self.output_path}',
-		shell=True,
-		history_file=self.history_file,
-		scan_id=self.scan_id,
-		activity_id=self.activity_id)
-
-	with open(self.output_path) as f:
-		lines = f.readlines()
-
-	# Parse the output_file file and store Subdomain and EndPoint objects found
-	# in db.
-	subdomain_count = 0
+				activity_id=self.activity_id,
+				timeout=cmd_timeout)
+		finally:
+			# Threads get their own db connection, close it once done
+			connection.close()
+
+	# New subdomains are validated, scope-filtered and stored in db as soon as
+	# a tool finishes, then published to the scan's subdomains stream. The
+	# stream is probed with httpx while the remaining tools are still running.
+	# Only httpx overlaps enumeration: nuclei still runs in the vulnerability
+	# scan stage, over the URLs of all stages, as starting it from the stream
+	# would scan each live URL twice.
+	domain_name = self.domain.name if ctx.get('domain_id') and self.domain else None
+	stream = ScanStream(self.results_dir, get_output_file_name(self.scan_id, self.subscan_id, 'subdomains'))
+	stream.reset()
+	def probe_stream():
+		try:
+			for names in stream.consume():
+				ctx_crawl = ctx.copy()
+				ctx_crawl['track'] = False
+				http_crawl(names, ctx=ctx_crawl, is_ran_from_subdomain_scan=True)
+		finally:
+			connection.close()
+
+	delta_base_id = ctx.get('delta_base_id')
+	all_subdomains = {}
+	saved_names = set()
 	subdomains = []
-	urls = []
-	for line in lines:
-		subdomain_name = line.strip()
-		valid_url = bool(validators.url(subdomain_name))
-		valid_domain = (
-			bool(validators.domain(subdomain_name)) or
-			bool(validators.ipv4(subdomain_name)) or
-			bool(validators.ipv6(subdomain_name)) or
-			valid_url
-		)
-		if not valid_domain:
-			logger.error(f'Subdomain {subdomain_name} is not a valid domain, IP or URL. Skipping.')
-			continue
-
-		if valid_url:
-			subdomain_name = urlparse(subdomain_name).netloc
-
-		if subdomain_scope_checker.is_out_of_scope(subdomain_name):
-			logger.error(f'Subdomain {subdomain_name} is out of scope. Skipping.')
-			continue
-
-		# Add subdomain
-		subdomain, _ = save_subdomain(subdomain_name, ctx=ctx)
-		if subdomain:
-			subdomain_count += 1
-			subdomains.append(subdomain)
-			urls.append(subdomain.name)
-
-	# Bulk crawl subdomains
-	if enable_http_crawl:
-		ctx['track'] = True
-		http_crawl(urls, ctx=ctx, is_ran_from_subdomain_scan=True)
-
-	# Find root subdomain endpoints
-	for subdomain in subdomains:
-		pass
+	with concurrent.futures.ThreadPoolExecutor(max_workers=max(concurrency, 1) + 1) as executor:
+		probe = executor.submit(probe_stream) if enable_http_crawl else None
+		future_to_tool = {
+			executor.submit(run_tool, tool, cmd, results_file): (tool, results_file)
+			for tool, cmd, results_file in tool_cmds
+		}
+		try:
+			for future in concurrent.futures.as_completed(future_to_tool):
+				tool, results_file = future_to_tool[future]
+				try:
+					future.result()
+				except Exception as e:
+					logger.error(
+						f'Subdomain discovery tool "{tool}" raised an exception')
+					logger.exception(e)
+				if not os.path.isfile(results_file):
+					logger.warning(f'Subdomain discovery tool "{tool}" produced no output file.')
+					continue
+				new_lines = []
+				with open(results_file, errors='replace') as f:
+					for line in f:
+						line = line.strip()
+						if line and line not in all_subdomains:
+							all_subdomains[line] = None
+							new_lines.append(line)
+				subdomain_names = [
+					name for name in parse_subdomain_names(
+						new_lines,
+						out_of_scope_subdomains=self.out_of_scope_subdomains,
+						domain_name=domain_name)
+					if name not in saved_names
+				]
+				saved, _ = bulk_save_subdomains(subdomain_names, ctx=ctx)
+				saved_names.update(subdomain.name for subdomain in saved)
+				subdomains.extend(saved)
+				# Delta scan: carry forward the results of the subdomains known
+				# by the base scan and only probe the new ones
+				if delta_base_id:
+					saved, known = split_known_subdomains(saved, delta_base_id)
+					carry_forward_subdomains(known, delta_base_id)
+				stream.publish([subdomain.name for subdomain in saved])
+				logger.info(f'{tool} found {len(saved)} new subdomains ({len(subdomains)} total)')
+		finally:
+			stream.close()
+
+		# Wait for the last probes
+		if probe:
+			try:
+				probe.result()
+			except Exception as e:
+				logger.exception(e)
+
+	# Write all the tools' results, sorted and unique, in one single file.
+	with open(self.output_path, 'w') as f:
+		f.write('\n'.join(sorted(all_subdomains)))
 
 	# Send notifications
 	subdomains_str = '\n'.join([f'• `{subdomain.name}`' for subdomain in subdomains])
@@ -662,13 +792,10 @@ def osint(self, host=None, ctx={}, description=None):
 		)
 		grouped_tasks.append(_task)
 
-	celery_group = group(grouped_tasks)
-	job = celery_group.apply_async()
-	while not job.ready():
-		# wait for all jobs to complete
-		time.sleep(5)
-
-	logger.info('OSINT Tasks finished...')
+	# Hand over to the OSINT sub-tasks instead of waiting for them
+	logger.info('Starting OSINT tasks...')
+	if grouped_tasks:
+		return self.replace(group(grouped_tasks))
 
 	# with open(self.output_path, 'w') as f:
 	# 	json.dump(results, f, indent=4)
@@ -676,8 +803,8 @@ def osint(self, host=None, ctx={}, description=None):
 	# return results
 
 
-@app.task(name='osint_discovery', queue='osint_discovery_queue', bind=False)
-def osint_discovery(config, host, scan_history_id, activity_id, results_dir, ctx={}):
+@app.task(name='osint_discovery', queue='osint_discovery_queue', bind=True)
+def osint_discovery(self, config, host, scan_history_id, activity_id, results_dir, ctx={}):
 	"""Run OSINT discovery.
 
 	Args:
@@ -748,11 +875,9 @@ def osint_discovery(config, host, scan_history_id, activity_id, results_dir, ctx
 		)
 		grouped_tasks.append(_task)
 
-	celery_group = group(grouped_tasks)
-	job = celery_group.apply_async()
-	while not job.ready():
-		# wait for all jobs to complete
-		time.sleep(5)
+	# Hand over to the emails / employees lookups instead of waiting for them
+	if grouped_tasks:
+		return self.replace(group(grouped_tasks))
 
 	return results
 
@@ -1049,14 +1174,12 @@ def theHarvester(config, host, scan_history_id, activity_id, results_dir, ctx={}
 	cmd  = f'python3 {theHarvester_dir}/theHarvester.py -d {host} -b all -f {output_path_json}'
 
 	# Update proxies.yaml
-	proxy_query = Proxy.objects.all()
-	if proxy_query.exists():
-		proxy = proxy_query.first()
-		if proxy.use_proxy:
-			proxy_list = proxy.proxies.splitlines()
-			yaml_data = {'http' : proxy_list}
-			with open(f'{theHarvester_dir}/proxies.yaml', 'w') as file:
-				yaml.dump(yaml_data, file)
+	proxy = settings_snapshot.get('proxy')
+	if proxy and proxy.use_proxy:
+		proxy_list = proxy.proxies.splitlines()
+		yaml_data = {'http' : proxy_list}
+		with open(f'{theHarvester_dir}/proxies.yaml', 'w') as file:
+			yaml.dump(yaml_data, file)
 
 	# Run cmd
 	run_command(
@@ -1173,17 +1296,19 @@ def h8mail(config, host, scan_history_id, activity_id, results_dir, ctx={}):
 
 
 @app.task(name='screenshot', queue='main_scan_queue', base=ReconpointTask, bind=True)
-def screenshot(self, ctx={}, description=None):
+def screenshot(self, urls=[], ctx={}, description=None):
 	"""Uses EyeWitness to gather screenshot of a domain and/or url.
 
 	Args:
+		urls (list, optional): URLs to take screenshot of. Overrides default
+			behavior which queries the alive default URLs of this scan.
 		description (str, optional): Task description shown in UI.
 	"""
 
 	# Config
-	screenshots_path = f'{self.results_dir}/screenshots'
-	output_path = f'{self.results_dir}/screenshots/{self.filename}'
-	alive_endpoints_file = f'{self.results_dir}/endpoints_alive.txt'
+	screenshots_path = shard_path(f'{self.results_dir}/screenshots', self.shard_index)
+	output_path = f'{screenshots_path}/{self.filename}'
+	alive_endpoints_file = shard_path(f'{self.results_dir}/endpoints_alive.txt', self.shard_index)
 	config = self.yaml_configuration.get(SCREENSHOT) or {}
 	enable_http_crawl = config.get(ENABLE_HTTP_CRAWL, DEFAULT_ENABLE_HTTP_CRAWL)
 	intensity = config.get(INTENSITY) or self.yaml_configuration.get(INTENSITY, DEFAULT_SCAN_INTENSITY)
@@ -1194,16 +1319,24 @@ def screenshot(self, ctx={}, description=None):
 	strict = True if intensity == 'normal' else False
 
 	# Get URLs to take screenshot of
-	get_http_urls(
-		is_alive=enable_http_crawl,
-		strict=strict,
-		write_filepath=alive_endpoints_file,
-		get_only_default_urls=True,
-		ctx=ctx
-	)
+	if urls:
+		with open(alive_endpoints_file, 'w') as f:
+			f.write('\n'.join(urls))
+	else:
+		urls = get_http_urls(
+			is_alive=enable_http_crawl,
+			strict=strict,
+			write_filepath=alive_endpoints_file,
+			get_only_default_urls=True,
+			ctx=ctx
+		)
+
+	# Split large inputs in parallel shards
+	if self.shard(urls, 'urls', ctx=ctx, description=description):
+		return
 
 	# Send start notif
-	notification = Notification.objects.first()
+	notification = settings_snapshot.get('notification')
 	send_output_file = notification.send_scan_output_file if notification else False
 
 	# Run cmd
@@ -1286,7 +1419,7 @@ def port_scan(self, hosts=[], ctx={}, description=None):
 	Returns:
 		list: List of open ports (dict).
 	"""
-	input_file = f'{self.results_dir}/input_subdomains_port_scan.txt'
+	input_file = shard_path(f'{self.results_dir}/input_subdomains_port_scan.txt', self.shard_index)
 	proxy = get_random_proxy()
 
 	# Config
@@ -1318,6 +1451,10 @@ def port_scan(self, hosts=[], ctx={}, description=None):
 			exclude_subdomains=exclude_subdomains,
 			ctx=ctx)
 
+	# Split large inputs in parallel shards
+	if self.shard(hosts, 'hosts', ctx=ctx, description=description):
+		return
+
 	# Build cmd
 	cmd = 'naabu -json -exclude-cdn'
 	cmd += f' -list {input_file}' if len(hosts) > 0 else f' -host {hosts[0]}'
@@ -1340,10 +1477,16 @@ def port_scan(self, hosts=[], ctx={}, description=None):
 	cmd += f' -exclude-ports {exclude_ports_str}' if exclude_ports else ''
 	cmd += f' -silent'
 
-	# Execute cmd and gather results
+	def process_results(records, new_ips):
+		"""Geo-localize new IPs."""
+		for address, ip_id in new_ips.items():
+			geo_localize.delay(address, ip_id)
+
+	# Execute cmd and gather results, open ports are written to DB in batches
 	results = []
 	urls = []
 	ports_data = {}
+	writer = PortScanWriter(ctx=ctx, on_flush=process_results)
 	for line in stream_command(
 			cmd,
 			shell=True,
@@ -1360,49 +1503,14 @@ def port_scan(self, hosts=[], ctx={}, description=None):
 		if port_number == 0:
 			continue
 
-		# Grab subdomain
-		subdomain = Subdomain.objects.filter(
-			name=host,
-			target_domain=self.domain,
-			scan_history=self.scan
-		).first()
-
-		# Add IP DB
-		ip, _ = save_ip_address(ip_address, subdomain, subscan=self.subscan)
-		if self.subscan:
-			ip.ip_subscan_ids.add(self.subscan)
-			ip.save()
+		# Queue IP, port and their links to the subdomain
+		writer.add({'host': host, 'ip': ip_address, 'port': port_number})
 
-		# Add endpoint to DB
+		# Queue endpoint, crawled in one batch below.
 		# port 80 and 443 not needed as http crawl already does that.
 		if port_number not in [80, 443]:
-			http_url = f'{host}:{port_number}'
-			endpoint, _ = save_endpoint(
-				http_url,
-				crawl=enable_http_crawl,
-				ctx=ctx,
-				subdomain=subdomain)
-			if endpoint:
-				http_url = endpoint.http_url
-			urls.append(http_url)
-
-		# Add Port in DB
-		res = get_port_service_description(port_number)
-		# get or create port
-		port, created = update_or_create_port(
-			port_number=port_number,
-			service_name=res.get('service_name', ''),
-			description=res.get('description', '')
-		)
-
-		if created:
-			logger.warning(f'Added new port {port_number} to DB')
+			urls.append(f'{host}:{port_number}')
 
-		if port_number in UNCOMMON_WEB_PORTS:
-			port.is_uncommon = True
-			port.save()
-		ip.ports.add(port)
-		ip.save()
 		if host in ports_data:
 			ports_data[host].append(port_number)
 		else:
@@ -1410,6 +1518,12 @@ def port_scan(self, hosts=[], ctx={}, description=None):
 
 		# Send notification
 		logger.warning(f'Found opened port {port_number} on {ip_address} ({host})')
+	writer.flush()
+
+	# Add endpoints to DB with a coalesced httpx run instead of one per port.
+	# Results are not needed here, so the worker doesn't wait for the probe
+	if enable_http_crawl and urls:
+		probe_http_urls(urls, ctx=ctx)
 
 	if len(ports_data) == 0:
 		logger.info('Finished running naabu port scan - No open ports found.')
@@ -1449,9 +1563,10 @@ def port_scan(self, hosts=[], ctx={}, description=None):
 				max_rate=rate_limit,
 				ctx=ctx_nmap)
 			sigs.append(sig)
-		task = group(sigs).apply_async()
-		with allow_join_result():
-			results = task.get()
+
+	# Hand over to the nmap scans instead of waiting for them
+	if sigs:
+		return self.replace(group(sigs))
 
 	return ports_data
 
@@ -1480,7 +1595,7 @@ def nmap(
 		max_rate (int): Max rate.
 		description (str, optional): Task description shown in UI.
 	"""
-	notif = Notification.objects.first()
+	notif = settings_snapshot.get('notification')
 	ports_str = ','.join(str(port) for port in ports)
 	self.filename = self.filename.replace('.txt', '.xml')
 	filename_vulns = self.filename.replace('.xml', '_vulns.json')
@@ -1515,24 +1630,29 @@ def nmap(
 
 	# Save vulnerabilities found by nmap
 	vulns_str = ''
-	for vuln_data in vulns:
-		# URL is not necessarily an HTTP URL when running nmap (can be any
-		# other vulnerable protocols). Look for existing endpoint and use its
-		# URL as vulnerability.http_url if it exists.
-		url = vuln_data['http_url']
-		endpoint = EndPoint.objects.filter(http_url__contains=url).first()
-		if endpoint:
-			vuln_data['http_url'] = endpoint.http_url
-		vuln, created = save_vulnerability(
-			target_domain=self.domain,
-			subdomain=self.subdomain,
-			scan_history=self.scan,
-			subscan=self.subscan,
-			endpoint=endpoint,
-			**vuln_data)
-		vulns_str += f'• {str(vuln)}\n'
-		if created:
-			logger.warning(str(vuln))
+	endpoints = {}
+	with VulnerabilityWriter() as writer:
+		for vuln_data in vulns:
+			# URL is not necessarily an HTTP URL when running nmap (can be any
+			# other vulnerable protocols). Look for existing endpoint and use its
+			# URL as vulnerability.http_url if it exists.
+			url = vuln_data['http_url']
+			if url not in endpoints:
+				endpoints[url] = EndPoint.objects.filter(http_url__contains=url).first()
+			endpoint = endpoints[url]
+			if endpoint:
+				vuln_data['http_url'] = endpoint.http_url
+			writer.add(
+				target_domain=self.domain,
+				subdomain=self.subdomain,
+				scan_history=self.scan,
+				subscan=self.subscan,
+				endpoint=endpoint,
+				**vuln_data)
+		for vuln in writer.flush():
+			vulns_str += f'• {str(vuln)}\n'
+			if vuln.is_new:
+				logger.warning(str(vuln))
 
 	# Send only 1 notif for all vulns to reduce number of notifs
 	if notif and notif.send_vuln_notif and vulns_str:
@@ -1560,6 +1680,7 @@ def waf_detection(self, ctx={}, description=None):
 	get_http_urls(
 		is_alive=enable_http_crawl,
 		write_filepath=input_path,
+		as_list=False,
 		get_only_default_urls=True,
 		ctx=ctx
 	)
@@ -1672,6 +1793,7 @@ def dir_file_fuzz(self, ctx={}, description=None):
 
 	# Loop through URLs and run command
 	results = []
+	endpoints = EndpointWriter(ctx=ctx)
 	for url in urls:
 		'''
 			Above while fetching urls, we are not ignoring files, because some
@@ -1729,21 +1851,17 @@ def dir_file_fuzz(self, ctx={}, description=None):
 				logger.error(f'FUZZ not found for "{url}"')
 				continue
 
-			# Get or create endpoint from URL
-			endpoint, created = save_endpoint(url, crawl=False, ctx=ctx)
-
-			# Continue to next line if endpoint returned is None
-			if endpoint == None:
+			# Queue endpoint with FFUF output data, continue to next line if
+			# the URL is rejected
+			http_url = endpoints.add(
+				url,
+				http_status=status,
+				content_length=length,
+				response_time=duration / 1000000000,
+				content_type=content_type)
+			if not http_url:
 				continue
 
-			# Save endpoint data from FFUF output
-			endpoint.http_status = status
-			endpoint.content_length = length
-			endpoint.response_time = duration / 1000000000
-			endpoint.content_type = content_type
-			endpoint.content_length = length
-			endpoint.save()
-
 			# Save directory file output from FFUF output
 			dfile, created = DirectoryFile.objects.get_or_create(
 				name=name,
@@ -1772,11 +1890,13 @@ def dir_file_fuzz(self, ctx={}, description=None):
 			if ctx.get('subdomain_id', 0) > 0:
 				subdomain = Subdomain.objects.get(id=ctx['subdomain_id'])
 			else:
-				subdomain_name = get_subdomain_from_url(endpoint.http_url)
+				subdomain_name = get_subdomain_from_url(http_url)
 				subdomain = Subdomain.objects.get(name=subdomain_name, scan_history=self.scan)
 			subdomain.directories.add(dirscan)
 			subdomain.save()
 
+	endpoints.flush()
+
 	# Crawl discovered URLs
 	if enable_http_crawl:
 		ctx['track'] = False
@@ -1803,6 +1923,7 @@ def fetch_url(self, urls=[], ctx={}, description=None):
 	enable_http_crawl = config.get(ENABLE_HTTP_CRAWL, DEFAULT_ENABLE_HTTP_CRAWL)
 	gf_patterns = config.get(GF_PATTERNS, DEFAULT_GF_PATTERNS)
 	ignore_file_extension = config.get(IGNORE_FILE_EXTENSION, DEFAULT_IGNORE_FILE_EXTENSIONS)
+	collapse_url_variants = config.get(COLLAPSE_URL_VARIANTS, DEFAULT_COLLAPSE_URL_VARIANTS)
 	tools = config.get(USES_TOOLS, ENDPOINT_SCAN_DEFAULT_TOOLS)
 	threads = config.get(THREADS) or self.yaml_configuration.get(THREADS, DEFAULT_THREADS)
 	custom_headers = self.yaml_configuration.get(CUSTOM_HEADERS, [])
@@ -1863,74 +1984,79 @@ def fetch_url(self, urls=[], ctx={}, description=None):
 		tool: f'{cat_input} | {cmd} | {grep_output} > {self.results_dir}/urls_{tool}.txt'
 		for tool, cmd in cmd_map.items()
 	}
-	tasks = group(
-		run_command.si(
-			cmd,
-			shell=True,
-			scan_id=self.scan_id,
-			activity_id=self.activity_id)
-		for tool, cmd in cmd_map.items()
-		if tool in tools
-	)
+	def run_tool(tool, cmd):
+		try:
+			run_cached_command(
+				tool,
+				cmd,
+				f'{self.results_dir}/urls_{tool}.txt',
+				cacheable=tool in FETCH_URL_ARCHIVE_TOOLS,
+				input_files=[input_path],
+				results_dir=self.results_dir,
+				shell=True,
+				history_file=self.history_file,
+				scan_id=self.scan_id,
+				activity_id=self.activity_id)
+		finally:
+			# Threads get their own db connection, close it once done
+			connection.close()
+
+	# Run tools from this task's threads rather than as sub-tasks we would
+	# have to wait on, so that no other worker slot is held.
+	tool_cmds = [(tool, cmd) for tool, cmd in cmd_map.items() if tool in tools]
+	if tool_cmds:
+		with concurrent.futures.ThreadPoolExecutor(max_workers=len(tool_cmds)) as executor:
+			for future in concurrent.futures.as_completed([executor.submit(run_tool, tool, cmd) for tool, cmd in tool_cmds]):
+				try:
+					future.result()
+				except Exception as e:
+					logger.exception(e)
 
-	# Cleanup task
-	sort_output = [
-		f'cat {self.results_dir}/urls_* > {self.output_path}',
-		f'cat {input_path} >> {self.output_path}',
-		f'sort -u {self.output_path} -o {self.output_path}',
-	]
+	# Canonicalize and deduplicate discovered URLs in a single streaming pass
+	# over the tools outputs, with bounded memory (see reconPoint.url_canon)
+	ignore_ext_regex = None
 	if ignore_file_extension:
-		ignore_exts = '|'.join(ignore_file_extension)
-		grep_ext_filtered_output = [
-			f'cat {self.output_path} | grep -Eiv "\\.({ignore_exts}).*" > {self.results_dir}/urls_filtered.txt',
-			f'mv {self.results_dir}/urls_filtered.txt {self.output_path}'
-		]
-		sort_output.extend(grep_ext_filtered_output)
-	cleanup = chain(
-		run_command.si(
-			cmd,
-			shell=True,
-			scan_id=self.scan_id,
-			activity_id=self.activity_id)
-		for cmd in sort_output
-	)
-
-	# Run all commands
-	task = chord(tasks)(cleanup)
-	with allow_join_result():
-		task.get()
-
-	# Store all the endpoints and run httpx
-	with open(self.output_path) as f:
-		discovered_urls = f.readlines()
-		self.notify(fields={'Discovered URLs': len(discovered_urls)})
-
-	# Some tools can have an URL in the format <URL>] - <PATH> or <URL> - <PATH>, add them
-	# to the final URL list
-	all_urls = []
-	for url in discovered_urls:
-		url = url.strip()
-		urlpath = None
-		base_url = None
-		if '] ' in url: # found JS scraped endpoint e.g from gospider
-			split = tuple(url.split('] '))
-			if not len(split) == 2:
-				logger.warning(f'URL format not recognized for "{url}". Skipping.')
+		ignore_exts = '|'.join(re.escape(ext) for ext in ignore_file_extension)
+		ignore_ext_regex = re.compile(rf'\.({ignore_exts})', re.IGNORECASE)
+	discovered_count = 0
+
+	def iter_discovered_urls():
+		nonlocal discovered_count
+		output_paths = [f'{self.results_dir}/urls_{tool}.txt' for tool, _ in tool_cmds]
+		for path in output_paths + [input_path]:
+			if not os.path.exists(path):
 				continue
-			base_url, urlpath = split
-			urlpath = urlpath.lstrip('- ')
-		elif ' - ' in url: # found JS scraped endpoint e.g from gospider
-			base_url, urlpath = tuple(url.split(' - '))
-
-		if base_url and urlpath:
-			subdomain = urlparse(base_url)
-			url = f'{subdomain.scheme}://{subdomain.netloc}{self.starting_point_path}'
+			with open(path, errors='ignore') as f:
+				for url in f:
+					discovered_count += 1
+					url = url.strip()
+					if ignore_ext_regex and ignore_ext_regex.search(url):
+						continue
 
-		if not validators.url(url):
-			logger.warning(f'Invalid URL "{url}". Skipping.')
+					# Some tools can have an URL in the format <URL>] - <PATH> or
+					# <URL> - <PATH>, add them to the final URL list
+					urlpath = None
+					base_url = None
+					if '] ' in url: # found JS scraped endpoint e.g from gospider
+						split = tuple(url.split('] '))
+						if not len(split) == 2:
+							logger.warning(f'URL format not recognized for "{url}". Skipping.')
+							continue
+						base_url, urlpath = split
+						urlpath = urlpath.lstrip('- ')
+					elif ' - ' in url: # found JS scraped endpoint e.g from gospider
+						base_url, urlpath = tuple(url.split(' - ', 1))
+
+					if base_url and urlpath:
+						subdomain = urlparse(base_url)
+						url = f'{subdomain.scheme}://{subdomain.netloc}{self.starting_point_path}'
+					yield url
 
-		if url not in all_urls:
+	all_urls = []
+	with SeenSet(max_memory_items=URL_DEDUPE_MEMORY_ITEMS, spill_dir=self.results_dir) as seen:
+		for url in iter_unique_urls(iter_discovered_urls(), seen, collapse_variants=collapse_url_variants):
 			all_urls.append(url)
+	self.notify(fields={'Discovered URLs': discovered_count})
 
 	# Filter out URLs if a path filter was passed
 	if self.starting_point_path:
@@ -1938,14 +2064,14 @@ def fetch_url(self, urls=[], ctx={}, description=None):
 
 	# if exclude_paths is found, then remove urls matching those paths
 	if self.excluded_paths:
-		all_urls = exclude_urls_by_patterns(self.excluded_paths, all_urls)
+		all_urls = self.scope.filter_urls(all_urls)
 
 	# Write result to output path
 	with open(self.output_path, 'w') as f:
 		f.write('\n'.join(all_urls))
 	logger.warning(f'Found {len(all_urls)} usable URLs')
 
-	# Crawl discovered URLs
+	# Crawl discovered URLs, or store them as is when crawling is disabled
 	if enable_http_crawl:
 		ctx['track'] = False
 		http_crawl(
@@ -1954,6 +2080,10 @@ def fetch_url(self, urls=[], ctx={}, description=None):
 			should_remove_duplicate_endpoints=should_remove_duplicate_endpoints,
 			duplicate_removal_fields=duplicate_removal_fields
 		)
+	else:
+		with EndpointWriter(ctx=ctx, create_subdomains=True) as endpoints:
+			for url in all_urls:
+				endpoints.add(url)
 
 
 	#-------------------#
@@ -1963,17 +2093,30 @@ def fetch_url(self, urls=[], ctx={}, description=None):
 	# Combine old gf patterns with new ones
 	if gf_patterns:
 		self.scan.used_gf_patterns = ','.join(gf_patterns)
-		self.scan.save()
-
-	# Run gf patterns on saved endpoints
-	# TODO: refactor to Celery task
-	for gf_pattern in gf_patterns:
-		# TODO: js var is causing issues, removing for now
-		if gf_pattern == 'jsvar':
-			logger.info('Ignoring jsvar as it is causing issues.')
-			continue
+		self.scan.save(update_fields=['used_gf_patterns'])
+
+	# Match all gf patterns in a single pass over the URLs, matched patterns
+	# are appended to the ones already stored
+	# TODO: js var is causing issues, removing for now
+	if 'jsvar' in gf_patterns:
+		logger.info('Ignoring jsvar as it is causing issues.')
+	matcher = GfMatcher([pattern for pattern in gf_patterns if pattern != 'jsvar'])
+	host_url_regex = re.compile(rf'https?://([a-z0-9]+[.])*{re.escape(host)}.*')
+	matched_urls = {}
+	gf_outputs = {}
+	if matcher.patterns:
+		logger.warning(f'Running gf patterns {list(matcher.patterns)}')
+		for url in all_urls:
+			for gf_pattern, texts in matcher.match(url).items():
+				for text in texts:
+					match = host_url_regex.search(text)
+					if not match:
+						continue
+					matched_urls.setdefault(match.group(), []).append(gf_pattern)
+					gf_outputs.setdefault(gf_pattern, []).append(match.group())
 
-		# Run gf on current pattern
+	# Patterns that can't be compiled are run by gf itself
+	for gf_pattern in matcher.unsupported:
 		logger.warning(f'Running gf on pattern "{gf_pattern}"')
 		gf_output_file = f'{self.results_dir}/gf_patterns_{gf_pattern}.txt'
 		cmd = f'cat {self.output_path} | gf {gf_pattern} | grep -Eo {host_regex} >> {gf_output_file}'
@@ -1988,32 +2131,19 @@ def fetch_url(self, urls=[], ctx={}, description=None):
 		if not os.path.exists(gf_output_file):
 			logger.error(f'Could not find GF output file {gf_output_file}. Skipping GF pattern "{gf_pattern}"')
 			continue
-
-		# Read output file line by line and
 		with open(gf_output_file, 'r') as f:
-			lines = f.readlines()
+			for url in f:
+				matched_urls.setdefault(url.strip(), []).append(gf_pattern)
 
-		# Add endpoints / subdomains to DB
-		for url in lines:
-			http_url = sanitize_url(url)
-			subdomain_name = get_subdomain_from_url(http_url)
-			subdomain, _ = save_subdomain(subdomain_name, ctx=ctx)
-			if not subdomain:
-				continue
-			endpoint, created = save_endpoint(
-				http_url,
-				crawl=False,
-				subdomain=subdomain,
-				ctx=ctx)
-			if not endpoint:
-				continue
-			earlier_pattern = None
-			if not created:
-				earlier_pattern = endpoint.matched_gf_patterns
-			pattern = f'{earlier_pattern},{gf_pattern}' if earlier_pattern else gf_pattern
-			endpoint.matched_gf_patterns = pattern
-			endpoint.save()
+	for gf_pattern, urls in gf_outputs.items():
+		with open(f'{self.results_dir}/gf_patterns_{gf_pattern}.txt', 'w') as f:
+			f.write('\n'.join(urls))
 
+	# Tag endpoints / subdomains in bulk, one row per URL
+	endpoints = EndpointWriter(ctx=ctx, create_subdomains=True)
+	for url, patterns in matched_urls.items():
+		endpoints.add(url, matched_gf_patterns=','.join(dict.fromkeys(patterns)))
+	endpoints.flush()
 	return all_urls
 
 
@@ -2078,30 +2208,114 @@ def vulnerability_scan(self, urls=[], ctx={}, description=None):
 		)
 		grouped_tasks.append(_task)
 
-	celery_group = group(grouped_tasks)
-	job = celery_group.apply_async()
-
-	while not job.ready():
-		# wait for all jobs to complete
-		time.sleep(5)
-
-	logger.info('Vulnerability scan completed...')
+	# Hand over to the vulnerability scanners instead of waiting for them
+	if grouped_tasks:
+		return self.replace(group(grouped_tasks))
 
 	return None
 
 @app.task(name='nuclei_individual_severity_module', queue='main_scan_queue', base=ReconpointTask, bind=True)
-def nuclei_individual_severity_module(self, cmd, severity, enable_http_crawl, should_fetch_gpt_report, ctx={}, description=None):
+def nuclei_individual_severity_module(self, cmd, severity, enable_http_crawl, should_fetch_gpt_report, urls=[], input_path=None, ctx={}, description=None):
 	'''
 		This celery task will run vulnerability scan in parallel.
 		All severities supplied should run in parallel as grouped tasks.
+		URLs are read from `input_path`, or passed as `urls` by shards.
 	'''
 	results = []
 	logger.info(f'Running vulnerability scan with severity: {severity}')
+	if urls:
+		input_path = shard_path(
+			f'{self.results_dir}/input_endpoints_vulnerability_scan_{severity}.txt',
+			self.shard_index)
+		with open(input_path, 'w') as f:
+			f.write('\n'.join(urls))
+	elif input_path:
+		with open(input_path) as f:
+			urls = [url.strip() for url in f if url.strip()]
+
+	# Split large inputs in parallel shards
+	if self.shard(
+			urls,
+			'urls',
+			cmd,
+			severity,
+			enable_http_crawl,
+			should_fetch_gpt_report,
+			ctx=ctx,
+			description=description):
+		return
+	cmd += f' -l {input_path}' if input_path else ''
 	cmd += f' -severity {severity}'
 	# Send start notification
-	notif = Notification.objects.first()
+	notif = settings_snapshot.get('notification')
 	send_status = notif.send_scan_status_notif if notif else False
+	send_vuln_notif = notif and notif.send_vuln_notif
+
+	"""
+		Send report to hackerone when
+		1. send_report is True from Hackerone model in ScanEngine
+		2. username and key is set in HackerOneAPIKey in Dashboard
+		3. severity is not info or low
+	"""
+	hackerone = get_hackerone_settings()
+	hackerone_api_key_exists = get_hackerone_api_key() is not None
 
+	def process_vulnerabilities(vulns):
+		"""Notify and report newly stored vulnerabilities."""
+		for vuln in vulns:
+			severity = NUCLEI_REVERSE_SEVERITY_MAP.get(vuln.severity, 'unknown')
+			logger.warning(str(vuln))
+
+			# Send notification for all vulnerabilities except info
+			send_vuln = send_vuln_notif and severity in ['low', 'medium', 'high', 'critical']
+			if send_vuln:
+				fields = {
+					'Severity': f'**{severity.upper()}**',
+					'URL': vuln.http_url,
+					'Subdomain': vuln.subdomain.name if vuln.subdomain else '',
+					'Name': vuln.name,
+					'Type': vuln.type,
+					'Description': vuln.description,
+					'Template': vuln.template_url,
+					'Tags': vuln.get_tags_str(),
+					'CVEs': vuln.get_cve_str(),
+					'CWEs': vuln.get_cwe_str(),
+					'References': vuln.get_refs_str()
+				}
+				severity_map = {
+					'low': 'info',
+					'medium': 'warning',
+					'high': 'error',
+					'critical': 'error'
+				}
+				self.notify(
+					f'vulnerability_scan_#{vuln.id}',
+					severity_map[severity],
+					fields,
+					add_meta_info=False)
+
+			send_report = (
+				hackerone and
+				hackerone_api_key_exists and
+				severity not in ('info', 'low') and
+				vuln.target_domain.h1_team_handle
+			)
+			if send_report:
+				if hackerone.send_critical and severity == 'critical':
+					send_hackerone_report.delay(vuln.id)
+				elif hackerone.send_high and severity == 'high':
+					send_hackerone_report.delay(vuln.id)
+				elif hackerone.send_medium and severity == 'medium':
+					send_hackerone_report.delay(vuln.id)
+
+	# Look for duplicate vulnerabilities by excluding records that might
+	# change but are irrelevant. Duplicates are skipped.
+	vulns = VulnerabilityWriter(
+		exclude_keys=['response', 'curl_command'],
+		on_flush=process_vulnerabilities)
+	endpoints = EndpointWriter(ctx=ctx)
+	subdomains = {}
+	probe_urls = []
 	for line in stream_command(
 			cmd,
 			history_file=self.history_file,
@@ -2121,115 +2335,38 @@ def nuclei_individual_severity_module(self, cmd, severity, enable_http_crawl, sh
 		subdomain_name = get_subdomain_from_url(http_url)
 
 		# TODO: this should be get only
-		subdomain, _ = Subdomain.objects.get_or_create(
-			name=subdomain_name,
-			scan_history=self.scan,
-			target_domain=self.domain
-		)
-
-		# Look for duplicate vulnerabilities by excluding records that might change but are irrelevant.
-		object_comparison_exclude = ['response', 'curl_command', 'tags', 'references', 'cve_ids', 'cwe_ids']
-
-		# Add subdomain and target domain to the duplicate check
-		vuln_data_copy = vuln_data.copy()
-		vuln_data_copy['subdomain'] = subdomain
-		vuln_data_copy['target_domain'] = self.domain
-
-		# Check if record exists, if exists do not save it
-		if record_exists(Vulnerability, data=vuln_data_copy, exclude_keys=object_comparison_exclude):
-			logger.warning(f'Nuclei vulnerability of severity {severity} : {vuln_data_copy["name"]} for {subdomain_name} already exists')
-			continue
+		if subdomain_name not in subdomains:
+			subdomains[subdomain_name], _ = Subdomain.objects.get_or_create(
+				name=subdomain_name,
+				scan_history=self.scan,
+				target_domain=self.domain
+			)
+		subdomain = subdomains[subdomain_name]
 
-		# Get or create EndPoint object
+		# Queue EndPoint object. Without a response, it is probed with the
+		# others in one batch below.
 		response = line.get('response')
-		httpx_crawl = False if response else enable_http_crawl # avoid yet another httpx crawl
-		endpoint, _ = save_endpoint(
+		http_status = parse_curl_output(response)['http_status'] if response else None
+		http_url = endpoints.add(
 			http_url,
-			crawl=httpx_crawl,
 			subdomain=subdomain,
-			ctx=ctx)
-		if endpoint:
-			http_url = endpoint.http_url
-			if not httpx_crawl:
-				output = parse_curl_output(response)
-				endpoint.http_status = output['http_status']
-				endpoint.save()
-
-		# Get or create Vulnerability object
-		vuln, _ = save_vulnerability(
+			http_status=http_status) or http_url
+		if not response and enable_http_crawl:
+			probe_urls.append(http_url)
+
+		# Queue Vulnerability object
+		vulns.add(
 			target_domain=self.domain,
 			http_url=http_url,
 			scan_history=self.scan,
 			subscan=self.subscan,
 			subdomain=subdomain,
 			**vuln_data)
-		if not vuln:
-			continue
-
-		# Print vuln
-		severity = line['info'].get('severity', 'unknown')
-		logger.warning(str(vuln))
-
-
-		# Send notification for all vulnerabilities except info
-		url = vuln.http_url or vuln.subdomain
-		send_vuln = (
-			notif and
-			notif.send_vuln_notif and
-			vuln and
-			severity in ['low', 'medium', 'high', 'critical'])
-		if send_vuln:
-			fields = {
-				'Severity': f'**{severity.upper()}**',
-				'URL': http_url,
-				'Subdomain': subdomain_name,
-				'Name': vuln.name,
-				'Type': vuln.type,
-				'Description': vuln.description,
-				'Template': vuln.template_url,
-				'Tags': vuln.get_tags_str(),
-				'CVEs': vuln.get_cve_str(),
-				'CWEs': vuln.get_cwe_str(),
-				'References': vuln.get_refs_str()
-			}
-			severity_map = {
-				'low': 'info',
-				'medium': 'warning',
-				'high': 'error',
-				'critical': 'error'
-			}
-			self.notify(
-				f'vulnerability_scan_#{vuln.id}',
-				severity_map[severity],
-				fields,
-				add_meta_info=False)
-
-		"""
-			Send report to hackerone when
-			1. send_report is True from Hackerone model in ScanEngine
-			2. username and key is set in HackerOneAPIKey in Dashboard
-			3. severity is not info or low
-		"""
-		hackerone_query = Hackerone.objects.filter(send_report=True)
-		api_key_check_query = HackerOneAPIKey.objects.filter(
-			Q(username__isnull=False) & Q(key__isnull=False)
-		)
-
-		send_report = (
-			hackerone_query.exists() and
-			api_key_check_query.exists() and
-			severity not in ('info', 'low') and
-			vuln.target_domain.h1_team_handle
-		)
 
-		if send_report:
-			hackerone = hackerone_query.first()
-			if hackerone.send_critical and severity == 'critical':
-				send_hackerone_report.delay(vuln.id)
-			elif hackerone.send_high and severity == 'high':
-				send_hackerone_report.delay(vuln.id)
-			elif hackerone.send_medium and severity == 'medium':
-				send_hackerone_report.delay(vuln.id)
+	endpoints.flush()
+	vulns.flush()
+	if probe_urls:
+		probe_http_urls(probe_urls, ctx=ctx)
 
 	# Write results to JSON file
 	with open(self.output_path, 'w') as f:
@@ -2407,6 +2544,7 @@ def nuclei_scan(self, urls=[], ctx={}, description=None):
 			is_alive=enable_http_crawl,
 			ignore_files=True,
 			write_filepath=input_path,
+			as_list=False,
 			ctx=ctx
 		)
 
@@ -2456,7 +2594,6 @@ def nuclei_scan(self, urls=[], ctx={}, description=None):
 	formatted_headers = ' '.join(f'-H "{header}"' for header in custom_headers)
 	if formatted_headers:
 		cmd += formatted_headers
-	cmd += f' -l {input_path}'
 	cmd += f' -c {str(concurrency)}' if concurrency > 0 else ''
 	cmd += f' -proxy {proxy} ' if proxy else ''
 	cmd += f' -retries {retries}' if retries > 0 else ''
@@ -2477,19 +2614,15 @@ def nuclei_scan(self, urls=[], ctx={}, description=None):
 			severity,
 			enable_http_crawl,
 			should_fetch_gpt_report,
+			input_path=input_path,
 			ctx=custom_ctx,
 			description=f'Nuclei Scan with severity {severity}'
 		)
 		grouped_tasks.append(_task)
 
-	celery_group = group(grouped_tasks)
-	job = celery_group.apply_async()
-
-	while not job.ready():
-		# wait for all jobs to complete
-		time.sleep(5)
-
-	logger.info('Vulnerability scan with all severities completed...')
+	# Hand over to the per-severity scans instead of waiting for them
+	if grouped_tasks:
+		return self.replace(group(grouped_tasks))
 
 	return None
 
@@ -2521,20 +2654,24 @@ def dalfox_xss_scan(self, urls=[], ctx={}, description=None):
 	timeout = dalfox_config.get(TIMEOUT)
 	delay = dalfox_config.get(DELAY)
 	threads = dalfox_config.get(THREADS) or self.yaml_configuration.get(THREADS, DEFAULT_THREADS)
-	input_path = f'{self.results_dir}/input_endpoints_dalfox_xss.txt'
+	input_path = shard_path(f'{self.results_dir}/input_endpoints_dalfox_xss.txt', self.shard_index)
 
 	if urls:
 		with open(input_path, 'w') as f:
 			f.write('\n'.join(urls))
 	else:
-		get_http_urls(
+		urls = get_http_urls(
 			is_alive=False,
 			ignore_files=False,
 			write_filepath=input_path,
 			ctx=ctx
 		)
 
-	notif = Notification.objects.first()
+	# Split large inputs in parallel shards
+	if self.shard(urls, 'urls', ctx=ctx, description=description):
+		return
+
+	notif = settings_snapshot.get('notification')
 	send_status = notif.send_scan_status_notif if notif else False
 
 	# command builder
@@ -2556,6 +2693,9 @@ def dalfox_xss_scan(self, urls=[], ctx={}, description=None):
 	cmd += f' --format json'
 
 	results = []
+	probe_urls = []
+	endpoints = EndpointWriter(ctx=ctx, create_subdomains=True)
+	vulns = VulnerabilityWriter()
 	for line in stream_command(
 			cmd,
 			history_file=self.history_file,
@@ -2571,25 +2711,10 @@ def dalfox_xss_scan(self, urls=[], ctx={}, description=None):
 		vuln_data = parse_dalfox_result(line)
 
 		http_url = sanitize_url(line.get('data'))
-		subdomain_name = get_subdomain_from_url(http_url)
+		if endpoints.add(http_url):
+			probe_urls.append(http_url)
 
-		# TODO: this should be get only
-		subdomain, _ = Subdomain.objects.get_or_create(
-			name=subdomain_name,
-			scan_history=self.scan,
-			target_domain=self.domain
-		)
-		endpoint, _ = save_endpoint(
-			http_url,
-			crawl=True,
-			subdomain=subdomain,
-			ctx=ctx
-		)
-		if endpoint:
-			http_url = endpoint.http_url
-			endpoint.save()
-
-		vuln, _ = save_vulnerability(
+		vulns.add(
 			target_domain=self.domain,
 			http_url=http_url,
 			scan_history=self.scan,
@@ -2597,8 +2722,11 @@ def dalfox_xss_scan(self, urls=[], ctx={}, description=None):
 			**vuln_data
 		)
 
-		if not vuln:
-			continue
+	# Store vulnerable endpoints, then queue them for a coalesced probe
+	endpoints.flush()
+	vulns.flush()
+	if probe_urls:
+		probe_http_urls(probe_urls, ctx=ctx)
 
 	# after vulnerability scan is done, we need to run gpt if
 	# should_fetch_gpt_report and openapi key exists
@@ -2664,10 +2792,11 @@ def crlfuzz_scan(self, urls=[], ctx={}, description=None):
 			is_alive=False,
 			ignore_files=True,
 			write_filepath=input_path,
+			as_list=False,
 			ctx=ctx
 		)
 
-	notif = Notification.objects.first()
+	notif = settings_snapshot.get('notification')
 	send_status = notif.send_scan_status_notif if notif else False
 
 	# command builder
@@ -2696,31 +2825,19 @@ def crlfuzz_scan(self, urls=[], ctx={}, description=None):
 	with open(output_path, 'r') as file:
 		crlfs = file.readlines()
 
+	probe_urls = []
+	endpoints = EndpointWriter(ctx=ctx, create_subdomains=True)
+	vulns = VulnerabilityWriter()
 	for crlf in crlfs:
 		url = crlf.strip()
 
 		vuln_data = parse_crlfuzz_result(url)
 
 		http_url = sanitize_url(url)
-		subdomain_name = get_subdomain_from_url(http_url)
+		if endpoints.add(http_url):
+			probe_urls.append(http_url)
 
-		subdomain, _ = Subdomain.objects.get_or_create(
-			name=subdomain_name,
-			scan_history=self.scan,
-			target_domain=self.domain
-		)
-
-		endpoint, _ = save_endpoint(
-			http_url,
-			crawl=True,
-			subdomain=subdomain,
-			ctx=ctx
-		)
-		if endpoint:
-			http_url = endpoint.http_url
-			endpoint.save()
-
-		vuln, _ = save_vulnerability(
+		vulns.add(
 			target_domain=self.domain,
 			http_url=http_url,
 			scan_history=self.scan,
@@ -2728,8 +2845,11 @@ def crlfuzz_scan(self, urls=[], ctx={}, description=None):
 			**vuln_data
 		)
 
-		if not vuln:
-			continue
+	# Store vulnerable endpoints, then queue them for a coalesced probe
+	endpoints.flush()
+	vulns.flush()
+	if probe_urls:
+		probe_http_urls(probe_urls, ctx=ctx)
 
 	# after vulnerability scan is done, we need to run gpt if
 	# should_fetch_gpt_report and openapi key exists
@@ -2777,6 +2897,7 @@ def s3scanner(self, ctx={}, description=None):
 	providers = s3_config.get(PROVIDERS, S3SCANNER_DEFAULT_PROVIDERS)
 	scan_history = ScanHistory.objects.filter(pk=self.scan_id).first()
 	for provider in providers:
+		buckets = []
 		cmd = f's3scanner -bucket-file {input_path} -enumerate -provider {provider} -threads {threads} -json'
 		for line in stream_command(
 				cmd,
@@ -2789,9 +2910,11 @@ def s3scanner(self, ctx={}, description=None):
 
 			if line.get('bucket', {}).get('exists', 0) == 1:
 				result = parse_s3scanner_result(line)
-				s3bucket, created = S3Bucket.objects.get_or_create(**result)
-				scan_history.buckets.add(s3bucket)
-				logger.info(f"s3 bucket added {result['provider']}-{result['name']}-{result['region']}")
+				buckets.append(result)
+				logger.info(f"s3 bucket found {result['provider']}-{result['name']}-{result['region']}")
+
+		# Store all buckets found by this provider at once
+		bulk_save_s3_buckets(buckets, scan_history=scan_history)
 
 
 @app.task(name='http_crawl', queue='main_scan_queue', base=ReconpointTask, bind=True)
@@ -2819,7 +2942,7 @@ def http_crawl(
 		duplicate_removal_fields (list): List of Endpoint model fields to check for duplicates
 
 	Returns:
-		list: httpx results.
+		list: httpx results, as compact records (see `parse_httpx_result`).
 	"""
 	logger.info('Initiating HTTP Crawl')
 	if is_ran_from_subdomain_scan:
@@ -2857,12 +2980,15 @@ def http_crawl(
 
 	# exclude urls by pattern
 	if self.excluded_paths:
-		urls = exclude_urls_by_patterns(self.excluded_paths, urls)
+		urls = self.scope.filter_urls(urls)
 
 	# If no URLs found, skip it
 	if not urls:
 		return
 
+	# Not sharded: callers run http_crawl inline and use its records, and it
+	# has no output file to merge shards into
+
 	# Re-adjust thread number if few URLs to avoid spinning up a monster to
 	# kill a fly.
 	if len(urls) < threads:
@@ -2873,6 +2999,7 @@ def http_crawl(
 
 	# Run command
 	cmd += f' -cl -ct -rt -location -td -websocket -cname -asn -cdn -probe -random-agent'
+	cmd += ' -hash md5,simhash'
 	cmd += f' -t {threads}' if threads > 0 else ''
 	cmd += f' --http-proxy {proxy}' if proxy else ''
 	formatted_headers = ' '.join(f'-H "{header}"' for header in custom_headers)
@@ -2884,8 +3011,40 @@ def http_crawl(
 	cmd += f' -silent'
 	if follow_redirect:
 		cmd += ' -fr'
-	results = []
-	endpoint_ids = []
+
+	def get_endpoint_str(record):
+		return (
+			f'{record["final_url"]} [{record["status_code"]}] '
+			f'`{record["content_length"]}B` `{record["webserver"]}` `{record["time"]}`')
+
+	def process_results(records, new_ips):
+		"""Geo-localize new IPs and notify one summary per flushed batch."""
+		for address, ip_id in new_ips.items():
+			geo_localize.delay(address, ip_id)
+		if not records:
+			return
+		alive = []
+		techs = {}
+		ips = {}
+		for record in records:
+			http_status = record['status_code']
+			if http_status and (0 < http_status < 500) and http_status not in (403, 404):
+				alive.append(f'• {get_endpoint_str(record)}')
+			techs.update((tech, None) for tech in record['tech'] or [])
+			ips.update((ip, None) for ip in (record['a'] or []) + [record['host']] if ip)
+		self.notify(
+			fields={
+				'Alive endpoint': '\n'.join(alive),
+				'Technologies': ', '.join(f'`{tech}`' for tech in techs),
+				'IPs': '\n'.join(f'• `{ip}`' for ip in ips),
+			},
+			add_meta_info=False)
+
+	# httpx results are written to DB in batches
+	writer = HttpCrawlWriter(
+		ctx=ctx,
+		is_ran_from_subdomain_scan=is_ran_from_subdomain_scan,
+		on_flush=process_results)
 	for line in stream_command(
 			cmd,
 			history_file=history_file,
@@ -2901,117 +3060,14 @@ def http_crawl(
 		if line.get('failed', False):
 			continue
 
-		# Parse httpx output
-		host = line.get('host', '')
-		content_length = line.get('content_length', 0)
-		http_status = line.get('status_code')
-		http_url, is_redirect = extract_httpx_url(line)
-		page_title = line.get('title')
-		webserver = line.get('webserver')
-		cdn = line.get('cdn', False)
-		rt = line.get('time')
-		techs = line.get('tech', [])
-		cname = line.get('cname', '')
-		content_type = line.get('content_type', '')
-		response_time = -1
-		if rt:
-			response_time = float(''.join(ch for ch in rt if not ch.isalpha()))
-			if rt[-2:] == 'ms':
-				response_time = response_time / 1000
-
-		# Create Subdomain object in DB
-		subdomain_name = get_subdomain_from_url(http_url)
-		subdomain, _ = save_subdomain(subdomain_name, ctx=ctx)
-
-		if not subdomain:
-			continue
+		record = parse_httpx_result(line)
+		record['_cmd'] = cmd
+		logger.warning(get_endpoint_str(record))
+		writer.add(record)
 
-		# Save default HTTP URL to endpoint object in DB
-		endpoint, created = save_endpoint(
-			http_url,
-			crawl=False,
-			ctx=ctx,
-			subdomain=subdomain,
-			is_default=is_ran_from_subdomain_scan
-		)
-		if not endpoint:
-			continue
-		endpoint.http_status = http_status
-		endpoint.page_title = page_title
-		endpoint.content_length = content_length
-		endpoint.webserver = webserver
-		endpoint.response_time = response_time
-		endpoint.content_type = content_type
-		endpoint.save()
-		endpoint_str = f'{http_url} [{http_status}] `{content_length}B` `{webserver}` `{rt}`'
-		logger.warning(endpoint_str)
-		if endpoint and endpoint.is_alive and endpoint.http_status != 403:
-			self.notify(
-				fields={'Alive endpoint': f'• {endpoint_str}'},
-				add_meta_info=False)
-
-		# Add endpoint to results
-		line['_cmd'] = cmd
-		line['final_url'] = http_url
-		line['endpoint_id'] = endpoint.id
-		line['endpoint_created'] = created
-		line['is_redirect'] = is_redirect
-		results.append(line)
-
-		# Add technology objects to DB
-		for technology in techs:
-			tech, _ = Technology.objects.get_or_create(name=technology)
-			endpoint.techs.add(tech)
-			if is_ran_from_subdomain_scan:
-				subdomain.technologies.add(tech)
-				subdomain.save()
-			endpoint.save()
-		techs_str = ', '.join([f'`{tech}`' for tech in techs])
-		self.notify(
-			fields={'Technologies': techs_str},
-			add_meta_info=False)
-
-		# Add IP objects for 'a' records to DB
-		a_records = line.get('a', [])
-		for ip_address in a_records:
-			ip, created = save_ip_address(
-				ip_address,
-				subdomain,
-				subscan=self.subscan,
-				cdn=cdn)
-		ips_str = '• ' + '\n• '.join([f'`{ip}`' for ip in a_records])
-		self.notify(
-			fields={'IPs': ips_str},
-			add_meta_info=False)
-
-		# Add IP object for host in DB
-		if host:
-			ip, created = save_ip_address(
-				host,
-				subdomain,
-				subscan=self.subscan,
-				cdn=cdn)
-			self.notify(
-				fields={'IPs': f'• `{ip.address}`'},
-				add_meta_info=False)
-
-		# Save subdomain and endpoint
-		if is_ran_from_subdomain_scan:
-			# save subdomain stuffs
-			subdomain.http_url = http_url
-			subdomain.http_status = http_status
-			subdomain.page_title = page_title
-			subdomain.content_length = content_length
-			subdomain.webserver = webserver
-			subdomain.response_time = response_time
-			subdomain.content_type = content_type
-			subdomain.cname = ','.join(cname)
-			subdomain.is_cdn = cdn
-			if cdn:
-				subdomain.cdn_name = line.get('cdn_name')
-			subdomain.save()
-		endpoint.save()
-		endpoint_ids.append(endpoint.id)
+	writer.flush()
+	results = writer.results
+	endpoint_ids = [record['endpoint_id'] for record in results if record['endpoint_id']]
 
 	if should_remove_duplicate_endpoints:
 		# Remove 'fake' alive endpoints that are just redirects to the same page
@@ -3019,7 +3075,8 @@ def http_crawl(
 			self.scan_id,
 			self.domain_id,
 			self.subdomain_id,
-			filter_ids=endpoint_ids
+			filter_ids=endpoint_ids,
+			duplicate_removal_fields=duplicate_removal_fields or ENDPOINT_SCAN_DEFAULT_DUPLICATE_FIELDS
 		)
 
 	# Remove input file
@@ -3033,6 +3090,26 @@ def http_crawl(
 	return results
 
 
+@app.task(name='flush_probe_queue', bind=False, queue='probe_queue')
+def flush_probe_queue(scan_key):
+	"""Probe a batch of the URLs queued for a scan with one httpx run, and send
+	the results to the callers waiting for them (see probe_http_urls).
+
+	Args:
+		scan_key (str): Scan / subscan key.
+	"""
+	ctx, entries, left = probe_queue.pop(scan_key)
+	if left:
+		flush_probe_queue.delay(scan_key)
+	if not entries:
+		return
+	urls = list(dict.fromkeys(entry['url'] for entry in entries))
+	logger.info(f'Probing {len(urls)} queued URLs')
+	ctx['track'] = False
+	records = http_crawl(urls=urls, method='HEAD', ctx=ctx) or []
+	probe_queue.reply(entries, index_probe_results(records))
+
+
 #---------------------#
 # Notifications tasks #
 #---------------------#
@@ -3045,10 +3122,13 @@ def send_notif(
 		**options):
 	if not 'title' in options:
 		message = enrich_notification(message, scan_history_id, subscan_id)
-	send_discord_message(message, **options)
-	send_slack_message(message)
-	send_lark_message(message)
-	send_telegram_message(message)
+	notif = settings_snapshot.get('notification')
+	send_notification_messages([
+		get_discord_message(message, notif, **options),
+		get_slack_message(message, notif),
+		get_lark_message(message, notif),
+		get_telegram_message(message, notif),
+	])
 
 
 @app.task(name='send_scan_notif', bind=False, queue='send_scan_notif_queue')
@@ -3067,7 +3147,7 @@ def send_scan_notif(
 	"""
 
 	# Skip send if notification settings are not configured
-	notif = Notification.objects.first()
+	notif = settings_snapshot.get('notification')
 	if not (notif and notif.send_scan_status_notif):
 		return
 
@@ -3185,7 +3265,7 @@ def send_task_notif(
 	"""
 
 	# Skip send if notification settings are not configured
-	notif = Notification.objects.first()
+	notif = settings_snapshot.get('notification')
 	if not (notif and notif.send_scan_status_notif):
 		return
 
@@ -3249,22 +3329,100 @@ def send_task_notif(
 		**opts)
 
 
+@app.task(name='send_notif_digest', bind=False, queue='send_task_notif_queue')
+def send_notif_digest(scan_history_id=None, subscan_id=None):
+	"""Send the task notifications of a scan buffered during the last window
+	as a single message per channel (see reconPoint.notif_aggregator).
+
+	Args:
+		scan_history_id (int, optional): ScanHistory id.
+		subscan_id (int, optional): SubScan id.
+	"""
+	scan_key = f'{scan_history_id}:{subscan_id}'
+
+	# Drop buffered events if notification settings are not configured
+	notif = settings_snapshot.get('notification')
+	if not (notif and notif.send_scan_status_notif):
+		notification_aggregator.pop_events(scan_key)
+		return
+
+	channels = []
+	if notif.send_to_discord and notif.discord_hook_url:
+		channels.append('discord')
+	if notif.send_to_slack and notif.slack_hook_url:
+		channels.append('slack')
+	if notif.send_to_lark and notif.lark_hook_url:
+		channels.append('lark')
+	if notif.send_to_telegram and notif.telegram_bot_token and notif.telegram_bot_chat_id:
+		channels.append('telegram')
+
+	title = get_scan_title(scan_history_id, subscan_id) if scan_history_id else 'Tasks summary'
+	url = get_scan_url(scan_history_id, subscan_id)
+
+	messages = []
+	def send(channel, digest):
+		message = format_digest(digest, title, url, tracebacks=notif.send_scan_tracebacks)
+		logger.warning(f'Sending notification digest "{title}" to {channel} ({digest["events"]} events)')
+		if channel == 'discord':
+			files = []
+			if notif.send_scan_output_file:
+				files = [
+					(task['output_path'], task['output_path'].split('/')[-1])
+					for task in digest['tasks'].values()
+					if task.get('output_path') and task.get('result') and not task.get('traceback')
+					and os.path.isfile(task['output_path'])
+				]
+			messages.append(get_discord_message(message, notif, files=files))
+		elif channel == 'slack':
+			messages.append(get_slack_message(message, notif))
+		elif channel == 'lark':
+			messages.append(get_lark_message(message, notif))
+		elif channel == 'telegram':
+			messages.append(get_telegram_message(message, notif))
+
+	# Rate limited channels keep their digest, send it next window
+	deferred = notification_aggregator.flush(scan_key, channels, send)
+	send_notification_messages(messages)
+	if deferred and notification_aggregator.start_window(scan_key):
+		send_notif_digest.apply_async(
+			kwargs={'scan_history_id': scan_history_id, 'subscan_id': subscan_id},
+			countdown=notification_aggregator.window)
+
+
 @app.task(name='send_file_to_discord', bind=False, queue='send_file_to_discord_queue')
 def send_file_to_discord(file_path, title=None):
-	notif = Notification.objects.first()
+	notif = settings_snapshot.get('notification')
 	do_send = notif and notif.send_to_discord and notif.discord_hook_url
 	if not do_send:
 		return False
 
-	webhook = DiscordWebhook(
-		url=notif.discord_hook_url,
-		rate_limit_retry=True,
-		username=title or "reconPoint Discord Plugin"
-	)
-	with open(file_path, "rb") as f:
-		head, tail = os.path.split(file_path)
-		webhook.add_file(file=f.read(), filename=tail)
-	webhook.execute()
+	head, tail = os.path.split(file_path)
+	send_notification_messages([
+		get_discord_message(
+			'',
+			notif,
+			files=[(file_path, tail)],
+			username=title or "reconPoint Discord Plugin")
+	])
+
+
+@app.task(name='check_proxies', bind=False, queue='check_proxies_queue')
+def check_proxies():
+	"""Health-check the proxies of the proxy pool. Scheduled by celery beat
+	every PROXY_POOL_CHECK_INTERVAL seconds.
+
+	Returns:
+		dict: Proxy -> health record, for checked proxies.
+	"""
+	proxy = settings_snapshot.get('proxy')
+	if not (proxy and proxy.use_proxy):
+		return {}
+	healths = proxy_pool.check_all(parse_proxies(proxy.proxies))
+	down = [name for name, health in healths.items() if health.get('down_until')]
+	logger.info(f'Checked {len(healths)} proxies, {len(down)} out of rotation')
+	for name in down:
+		logger.warning(f'Proxy {name} is out of rotation after {int(healths[name]["failures"])} failed checks')
+	return healths
 
 
 @app.task(name='send_hackerone_report', bind=False, queue='send_hackerone_report_queue')
@@ -3281,8 +3439,8 @@ def send_hackerone_report(vulnerability_id):
 	severities = {v: k for k,v in NUCLEI_SEVERITY_MAP.items()}
 
 	# can only send vulnerability report if team_handle exists and send_report is True and api_key exists
-	hackerone = Hackerone.objects.filter(send_report=True).first()
-	api_key = HackerOneAPIKey.objects.filter(username__isnull=False, key__isnull=False).first()
+	hackerone = get_hackerone_settings()
+	api_key = get_hackerone_api_key()
 
 	if not (vulnerability.target_domain.h1_team_handle and hackerone and api_key):
 		logger.error('Missing required data: team handle, Hackerone config, or API key.')
@@ -3961,61 +4119,72 @@ def remove_duplicate_endpoints(
 		subdomain_id=None,
 		filter_ids=[],
 		filter_status=[200, 301, 404],
-		duplicate_removal_fields=ENDPOINT_SCAN_DEFAULT_DUPLICATE_FIELDS
+		duplicate_removal_fields=ENDPOINT_SCAN_DEFAULT_DUPLICATE_FIELDS,
+		incremental=True
 	):
 	"""Remove duplicate endpoints.
 
 	Check for implicit redirections by comparing endpoints:
 	- [x] `content_length` similarities indicating redirections
 	- [x] `page_title` (check for same page title)
+	- [x] `body_hash` / `body_simhash` (same or near-identical response body)
 	- [ ] Sign-in / login page (check for endpoints with the same words)
 
+	Each fingerprint is checked with one query ranking all endpoints of the
+	scan (see reconPoint.dedupe), and duplicates are deleted in bulk.
+
 	Args:
 		scan_history_id: ScanHistory id.
 		domain_id (int): Domain id.
 		subdomain_id (int, optional): Subdomain id.
-		filter_ids (list): List of endpoint ids to filter on.
+		filter_ids (list): List of endpoint ids that can be removed. Duplicates
+			are still counted among all endpoints of the scan.
 		filter_status (list): List of HTTP status codes to filter on.
-		duplicate_removal_fields (list): List of Endpoint model fields to check for duplicates
+		duplicate_removal_fields (list): List of Endpoint model fields or
+			fingerprints (see ENDPOINT_DUPLICATE_FINGERPRINTS) to check for
+			duplicates.
+		incremental (bool): Without filter_ids, only remove endpoints added
+			since the previous pass.
 	"""
 	logger.info(f'Removing duplicate endpoints based on {duplicate_removal_fields}')
-	endpoints = (
-		EndPoint.objects
-		.filter(scan_history__id=scan_history_id)
-		.filter(target_domain__id=domain_id)
-	)
-	if filter_status:
-		endpoints = endpoints.filter(http_status__in=filter_status)
-
-	if subdomain_id:
-		endpoints = endpoints.filter(subdomain__id=subdomain_id)
-
-	if filter_ids:
-		endpoints = endpoints.filter(id__in=filter_ids)
-
-	for field_name in duplicate_removal_fields:
-		cl_query = (
-			endpoints
-			.values_list(field_name)
-			.annotate(mc=Count(field_name))
-			.order_by('-mc')
-		)
-		for (field_value, count) in cl_query:
-			if count > DELETE_DUPLICATES_THRESHOLD:
-				eps_to_delete = (
-					endpoints
-					.filter(**{field_name: field_value})
-					.order_by('discovered_date')
-					.all()[1:]
-				)
-				msg = f'Deleting {len(eps_to_delete)} endpoints [reason: same {field_name} {field_value}]'
-				for ep in eps_to_delete:
-					url = urlparse(ep.http_url)
-					if url.path in ['', '/', '/login']: # try do not delete the original page that other pages redirect to
-						continue
-					msg += f'\n\t {ep.http_url} [{ep.http_status}] [{field_name}={field_value}]'
-					ep.delete()
-				logger.warning(msg)
+	scope = (scan_history_id, domain_id, subdomain_id or '')
+	since_id = None
+	last_id = None
+	if not filter_ids and incremental:
+		since_id = dedupe_watermark.get(scope, duplicate_removal_fields)
+		endpoints = EndPoint.objects.filter(
+			scan_history__id=scan_history_id,
+			target_domain__id=domain_id)
+		if subdomain_id:
+			endpoints = endpoints.filter(subdomain__id=subdomain_id)
+		last_id = endpoints.aggregate(last_id=Max('id'))['last_id']
+
+	to_delete = {}
+	for fingerprint in duplicate_removal_fields:
+		duplicates = find_duplicate_endpoints(
+			fingerprint,
+			scan_history_id,
+			domain_id,
+			subdomain_id=subdomain_id,
+			filter_status=filter_status,
+			candidate_ids=filter_ids or None,
+			since_id=since_id)
+		groups = {}
+		for endpoint_id, http_url, value in duplicates:
+			if endpoint_id in to_delete:
+				continue
+			to_delete[endpoint_id] = http_url
+			groups.setdefault(value, []).append(http_url)
+		for value, urls in groups.items():
+			msg = f'Deleting {len(urls)} endpoints [reason: same {fingerprint} {value}]'
+			for url in urls:
+				msg += f'\n\t {url} [{fingerprint}={value}]'
+			logger.warning(msg)
+
+	if to_delete:
+		deleted = delete_endpoints(list(to_delete))
+		logger.warning(f'Deleted {deleted} duplicate endpoints')
+	dedupe_watermark.set(scope, duplicate_removal_fields, last_id)
 
 @app.task(name='run_command', bind=False, queue='run_command_queue')
 def run_command(
@@ -4025,7 +4194,8 @@ def run_command(
 		history_file=None, 
 		scan_id=None, 
 		activity_id=None,
-		remove_ansi_sequence=False
+		remove_ansi_sequence=False,
+		timeout=None
 	):
 	"""Run a given command using subprocess module.
 
@@ -4036,49 +4206,152 @@ def run_command(
 		shell (bool): Run within separate shell if True.
 		history_file (str): Write command + output to history file.
 		remove_ansi_sequence (bool): Used to remove ANSI escape sequences from output such as color coding
+		timeout (int, optional): Kill the command (and its children) after
+			this many seconds.
 	Returns:
 		tuple: Tuple with return_code, output.
 	"""
 	logger.info(cmd)
 	logger.warning(activity_id)
 
-	# Create a command record in the database
-	command_obj = Command.objects.create(
-		command=cmd,
-		time=timezone.now(),
-		scan_history_id=scan_id,
-		activity_id=activity_id)
+	# Create a command record in the database, output is spooled to disk
+	command_obj, command_log = create_command(cmd, scan_id=scan_id, activity_id=activity_id)
 
-	# Run the command using subprocess
+	# Run the command using subprocess. With a timeout, the command gets its
+	# own process group so that shell pipelines are killed as a whole.
 	popen = subprocess.Popen(
 		cmd if shell else cmd.split(),
 		shell=shell,
 		stdout=subprocess.PIPE,
 		stderr=subprocess.STDOUT,
 		cwd=cwd,
-		universal_newlines=True)
-	output = ''
-	for stdout_line in iter(popen.stdout.readline, ""):
-		item = stdout_line.strip()
-		output += '\n' + item
-		logger.debug(item)
-	popen.stdout.close()
-	popen.wait()
+		universal_newlines=True,
+		start_new_session=bool(timeout))
+	timer = None
+	if timeout:
+		timer = threading.Timer(timeout, kill_process_group, args=(popen, cmd, timeout))
+		timer.start()
+	lines = ['']
+	try:
+		with command_log:
+			for stdout_line in iter(popen.stdout.readline, ""):
+				item = stdout_line.strip()
+				lines.append(item)
+				command_log.write(item)
+				logger.debug(item)
+		popen.stdout.close()
+		popen.wait()
+	finally:
+		if timer:
+			timer.cancel()
 	return_code = popen.returncode
-	command_obj.output = output
-	command_obj.return_code = return_code
-	command_obj.save()
-	if history_file:
-		mode = 'a'
-		if not os.path.exists(history_file):
-			mode = 'w'
-		with open(history_file, mode) as f:
-			f.write(f'\n{cmd}\n{return_code}\n{output}\n------------------\n')
+	finish_command(command_obj, command_log, return_code, history_file=history_file)
+	output = '\n'.join(lines)
 	if remove_ansi_sequence:
 		output = remove_ansi_escape_sequences(output)
 	return return_code, output
 
 
+def run_cached_command(name, cmd, output_file, cacheable=True, input_files=[], results_dir=None, **kwargs):
+	"""Run a command writing its results to a file, or restore that file from
+	the tool cache if the same command already ran on the same inputs (see
+	RECONPOINT_TOOL_CACHE_ENABLED and TASK_CACHE_TTLS).
+
+	Args:
+		name (str): Tool name.
+		cmd (str): Command to run.
+		output_file (str): File the command writes its results to.
+		cacheable (bool): Whether the tool output can be cached.
+		input_files (list): Files the command reads.
+		results_dir (str, optional): Scan results directory, left out of the
+			cache key so that other scans can hit the cache.
+		kwargs: run_command kwargs.
+
+	Returns:
+		tuple: Tuple with return_code, output.
+	"""
+	cacheable = cacheable and RECONPOINT_TOOL_CACHE_ENABLED
+	if cacheable:
+		normalized_cmd = cmd.replace(results_dir, '{RESULTS_DIR}') if results_dir else cmd
+		key = make_cache_key(name, {'cmd': normalized_cmd}, input_files)
+		data = task_cache.get(name, key)
+		if data is not None:
+			logger.warning(f'Restored {name} results from cache to {output_file}')
+			with open(output_file, 'wb') as f:
+				f.write(data)
+			return 0, ''
+	return_code, output = run_command(cmd, **kwargs)
+	if cacheable and return_code == 0 and os.path.isfile(output_file):
+		with open(output_file, 'rb') as f:
+			task_cache.set(name, key, f.read())
+	return return_code, output
+
+
+def kill_process_group(popen, cmd, timeout):
+	"""Kill a command started with `start_new_session` and all its children.
+
+	Args:
+		popen (subprocess.Popen): Running process.
+		cmd (str): Command, for logging.
+		timeout (int): Timeout that expired, for logging.
+	"""
+	if popen.poll() is not None:
+		return
+	logger.warning(f'Command timed out after {timeout}s, killing it: {cmd}')
+	try:
+		os.killpg(popen.pid, signal.SIGKILL)
+	except ProcessLookupError:
+		pass
+
+
+def create_command(cmd, scan_id=None, activity_id=None):
+	"""Create a Command record and the compressed log its output is spooled
+	to.
+
+	Args:
+		cmd (str): Command.
+		scan_id (int, optional): ScanHistory id.
+		activity_id (int, optional): ScanActivity id.
+
+	Returns:
+		tuple: (startScan.models.Command, reconPoint.command_log.CommandLog).
+	"""
+	log_dir = os.path.join(COMMAND_LOGS_DIR, str(scan_id or 'misc'))
+	os.makedirs(log_dir, exist_ok=True)
+	output_path = os.path.join(log_dir, f'{uuid.uuid4().hex}.log.gz')
+	command_obj = Command.objects.create(
+		command=cmd,
+		time=timezone.now(),
+		scan_history_id=scan_id,
+		activity_id=activity_id,
+		output_path=output_path)
+	command_log = CommandLog(
+		output_path,
+		flush_interval=COMMAND_LOG_FLUSH_INTERVAL,
+		flush_size=COMMAND_LOG_FLUSH_SIZE)
+	return command_obj, command_log
+
+
+def finish_command(command_obj, command_log, return_code, history_file=None):
+	"""Flush a command log and store the command return code and output size.
+	The history file only gets the command, its return code and a pointer to
+	the output log.
+
+	Args:
+		command_obj (startScan.models.Command): Command record.
+		command_log (reconPoint.command_log.CommandLog): Output log.
+		return_code (int): Command return code.
+		history_file (str, optional): Scan history file.
+	"""
+	command_log.close()
+	Command.objects.filter(pk=command_obj.pk).update(
+		return_code=return_code,
+		output_size=command_log.size)
+	if history_file:
+		with open(history_file, 'a') as f:
+			f.write(f'\n{command_obj.command}\n{return_code}\n[output: {command_obj.output_path}]\n------------------\n')
+
+
 #-------------#
 # Other utils #
 #-------------#
@@ -4088,12 +4361,9 @@ def stream_command(cmd, cwd=None, shell=False, history_file=None, encoding='utf-
 	logger.info(cmd)
 	# logger.warning(activity_id)
 
-	# Create a command record in the database
-	command_obj = Command.objects.create(
-		command=cmd,
-		time=timezone.now(),
-		scan_history_id=scan_id,
-		activity_id=activity_id)
+	# Create a command record in the database, output is spooled to disk and
+	# flushed periodically
+	command_obj, command_log = create_command(cmd, scan_id=scan_id, activity_id=activity_id)
 
 	# Sanitize the cmd
 	command = cmd if shell else cmd.split()
@@ -4106,50 +4376,38 @@ def stream_command(cmd, cwd=None, shell=False, history_file=None, encoding='utf-
 		universal_newlines=True,
 		shell=shell)
 
-	# Log the output in real-time to the database
-	output = ""
-
 	# Process the output
-	for line in iter(lambda: process.stdout.readline(), b''):
-		if not line:
-			break
-		line = line.strip()
-		ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-		line = ansi_escape.sub('', line)
-		line = line.replace('\\x0d\\x0a', '\n')
-		if trunc_char and line.endswith(trunc_char):
-			line = line[:-1]
-		item = line
-
-		# Try to parse the line as JSON
-		try:
-			item = json.loads(line)
-		except json.JSONDecodeError:
-			pass
-
-		# Yield the line
-		#logger.debug(item)
-		yield item
-
-		# Add the log line to the output
-		output += line + "\n"
-
-		# Update the command record in the database
-		command_obj.output = output
-		command_obj.save()
-
-	# Retrieve the return code and output
-	process.wait()
-	return_code = process.returncode
-
-	# Update the return code and final output in the database
-	command_obj.return_code = return_code
-	command_obj.save()
-
-	# Append the command, return code and output to the history file
-	if history_file is not None:
-		with open(history_file, "a") as f:
-			f.write(f"{cmd}\n{return_code}\n{output}\n")
+	ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+	try:
+		for line in iter(lambda: process.stdout.readline(), b''):
+			if not line:
+				break
+			line = line.strip()
+			line = ansi_escape.sub('', line)
+			line = line.replace('\\x0d\\x0a', '\n')
+			if trunc_char and line.endswith(trunc_char):
+				line = line[:-1]
+			item = line
+
+			# Try to parse the line as JSON
+			try:
+				item = json.loads(line)
+			except json.JSONDecodeError:
+				pass
+
+			# Yield the line
+			#logger.debug(item)
+			yield item
+
+			# Add the log line to the output log
+			command_log.write(line)
+
+		# Retrieve the return code
+		process.wait()
+	finally:
+		# Store the return code and output size in the database, and append
+		# the command to the history file
+		finish_command(command_obj, command_log, process.returncode, history_file=history_file)
 
 
 def process_httpx_response(line):
@@ -4195,6 +4453,52 @@ def extract_httpx_url(line):
 	return http_url, is_redirect
 
 
+# httpx result field -> default, kept in http_crawl records
+HTTPX_RECORD_FIELDS = {
+	'input': None,
+	'url': None,
+	'host': '',
+	'status_code': None,
+	'title': None,
+	'content_length': 0,
+	'webserver': None,
+	'content_type': '',
+	'time': None,
+	'tech': [],
+	'a': [],
+	'cname': '',
+	'cdn': False,
+	'cdn_name': None,
+}
+
+
+def parse_httpx_result(line):
+	"""Decode an httpx JSON line into a compact record, as expected by
+	HttpCrawlWriter.
+
+	Args:
+		line (dict): URL data output by httpx.
+
+	Returns:
+		dict: Record with the HTTPX_RECORD_FIELDS keys, plus 'final_url',
+			'is_redirect', 'response_time' (seconds, -1 if unknown),
+			'body_hash' and 'body_simhash'.
+	"""
+	record = {key: line.get(key, default) for key, default in HTTPX_RECORD_FIELDS.items()}
+	record['final_url'], record['is_redirect'] = extract_httpx_url(line)
+	hashes = line.get('hash') or {}
+	record['body_hash'] = hashes.get('body_md5')
+	record['body_simhash'] = hashes.get('body_simhash')
+	rt = record['time']
+	response_time = -1
+	if rt:
+		response_time = float(''.join(ch for ch in rt if not ch.isalpha()))
+		if rt[-2:] == 'ms':
+			response_time = response_time / 1000
+	record['response_time'] = response_time
+	return record
+
+
 #-------------#
 # OSInt utils #
 #-------------#
@@ -4328,56 +4632,62 @@ def create_scan_activity(scan_history_id, message, status):
 
 
 def save_vulnerability(**vuln_data):
-	references = vuln_data.pop('references', [])
-	cve_ids = vuln_data.pop('cve_ids', [])
-	cwe_ids = vuln_data.pop('cwe_ids', [])
-	tags = vuln_data.pop('tags', [])
-	subscan = vuln_data.pop('subscan', None)
-
-	# remove nulls
-	vuln_data = replace_nulls(vuln_data)
-
-	# Create vulnerability
-	vuln, created = Vulnerability.objects.get_or_create(**vuln_data)
-	if created:
-		vuln.discovered_date = timezone.now()
-		vuln.open_status = True
-		vuln.save()
+	"""Get or create a single Vulnerability object with its tags, CVEs, CWEs,
+	references and subscan links. Tasks ingesting many findings should use
+	`VulnerabilityWriter` directly.
 
-	# Save vuln tags
-	for tag_name in tags or []:
-		tag, created = VulnerabilityTags.objects.get_or_create(name=tag_name)
-		if tag:
-			vuln.tags.add(tag)
-			vuln.save()
-
-	# Save CVEs
-	for cve_id in cve_ids or []:
-		cve, created = CveId.objects.get_or_create(name=cve_id)
-		if cve:
-			vuln.cve_ids.add(cve)
-			vuln.save()
+	Returns:
+		tuple: (startScan.models.Vulnerability, created).
+	"""
+	writer = VulnerabilityWriter()
+	writer.add(**vuln_data)
+	vulns = writer.flush()
+	vuln = vulns[0] if vulns else None
+	return vuln, bool(vuln and vuln.is_new)
 
-	# Save CWEs
-	for cve_id in cwe_ids or []:
-		cwe, created = CweId.objects.get_or_create(name=cve_id)
-		if cwe:
-			vuln.cwe_ids.add(cwe)
-			vuln.save()
 
-	# Save vuln reference
-	for url in references or []:
-		ref, created = VulnerabilityReference.objects.get_or_create(url=url)
-		if created:
-			vuln.references.add(ref)
-			vuln.save()
+def probe_http_urls(urls, ctx={}, wait=False):
+	"""Probe URLs with httpx (HEAD requests). Probes of all callers of a scan
+	are coalesced into one httpx run per window (see reconPoint.probe_queue).
+	Without Redis, URLs are probed right away, and so are the URLs left
+	without results if waiting times out.
 
-	# Save subscan id in vuln object
-	if subscan:
-		vuln.vuln_subscan_ids.add(subscan)
-		vuln.save()
+	Args:
+		urls (list): URLs to probe.
+		ctx (dict): Scan context.
+		wait (bool): Wait for the results.
 
-	return vuln, created
+	Returns:
+		dict: URL -> {'endpoint_id', 'endpoint_created'}, None if the URL
+			did not answer. Empty if `wait` is False.
+	"""
+	urls = list(dict.fromkeys(urls))
+	if not urls:
+		return {}
+	ctx = {key: value for key, value in ctx.items() if key != 'track'}
+	results = {}
+	if probe_queue.enabled:
+		scan_key = f'{ctx.get("scan_history_id")}:{ctx.get("subscan_id")}'
+		reply_id = probe_queue.new_reply_id() if wait else None
+		outcome = probe_queue.add(scan_key, urls, ctx, reply_id)
+		if outcome == BATCH_FULL:
+			flush_probe_queue.delay(scan_key)
+		elif outcome == WINDOW_OPENED:
+			flush_probe_queue.apply_async(args=[scan_key], countdown=probe_queue.window)
+		if not wait:
+			return {}
+		results = probe_queue.wait(reply_id, urls, PROBE_QUEUE_TIMEOUT)
+		missing = [url for url in urls if url not in results]
+		if not missing:
+			return results
+		logger.warning(f'No probe results after {PROBE_QUEUE_TIMEOUT}s. Probing {len(missing)} URLs directly.')
+		urls = missing
+
+	ctx['track'] = False
+	records = http_crawl(urls=urls, method='HEAD', ctx=ctx) or []
+	probed = index_probe_results(records)
+	results.update((url, probed.get(url)) for url in urls)
+	return results
 
 
 def save_endpoint(
@@ -4416,16 +4726,10 @@ def save_endpoint(
 			logger.error(f"{http_url} is not a URL of domain {domain.name}. Skipping.")
 			return None, False
 	if crawl:
-		ctx['track'] = False
-		results = http_crawl(
-			urls=[http_url],
-			method='HEAD',
-			ctx=ctx)
-		if results:
-			endpoint_data = results[0]
-			endpoint_id = endpoint_data['endpoint_id']
-			created = endpoint_data['endpoint_created']
-			endpoint = EndPoint.objects.get(pk=endpoint_id)
+		result = probe_http_urls([http_url], ctx=ctx, wait=True).get(http_url)
+		if result and result['endpoint_id']:
+			created = result['endpoint_created']
+			endpoint = EndPoint.objects.get(pk=result['endpoint_id'])
 	elif not scheme:
 		return None, False
 	else: # add dumb endpoint without probing it
@@ -4435,27 +4739,13 @@ def save_endpoint(
 			return None, False
 		http_url = sanitize_url(http_url)
 
-		# Try to get the first matching record (prevent duplicate error)
-		endpoints = EndPoint.objects.filter(
+		# URLs are unique per scan, extra data only applies to new records
+		endpoint, created = EndPoint.objects.get_or_create(
 			scan_history=scan,
-			target_domain=domain,
 			http_url=http_url,
-			**endpoint_data
+			defaults={'target_domain': domain, **endpoint_data}
 		)
 
-		if endpoints.exists():
-			endpoint = endpoints.first()
-			created = False
-		else:
-			# No existing record, create a new one
-			endpoint = EndPoint.objects.create(
-				scan_history=scan,
-				target_domain=domain,
-				http_url=http_url,
-				**endpoint_data
-			)
-			created = True
-
 	if created:
 		endpoint.is_default = is_default
 		endpoint.discovered_date = timezone.now()
@@ -4482,7 +4772,7 @@ def save_subdomain(subdomain_name, ctx={}):
 	scan_id = ctx.get('scan_history_id')
 	subscan_id = ctx.get('subscan_id')
 	out_of_scope_subdomains = ctx.get('out_of_scope_subdomains', [])
-	subdomain_checker = SubdomainScopeChecker(out_of_scope_subdomains)
+	subdomain_checker = get_scope_engine(out_of_scope_subdomains)
 	valid_domain = (
 		validators.domain(subdomain_name) or
 		validators.ipv4(subdomain_name) or
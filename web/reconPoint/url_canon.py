@@ -0,0 +1,219 @@
+import bisect
+import hashlib
+import math
+import mmap
+import re
+import tempfile
+from array import array
+from urllib.parse import urlsplit, urlunsplit
+
+#----------------------#
+# URL canonicalization #
+#----------------------#
+# URLs harvested from archives and crawlers (gau, waybackurls, gospider, ...)
+# are canonicalized and deduplicated while they are read, in one pass: scheme
+# and host are lowercased, default ports dropped, paths normalized and query
+# parameters sorted. Like uro, URLs that only differ by parameter values or by
+# ids, hashes and slugs in their path can be collapsed to the first one seen.
+# Seen URLs are kept in a `SeenSet`, whose memory is bounded: a Bloom filter
+# answers for new URLs, and hashes of seen URLs spill to sorted files on disk.
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+DEFAULT_MEMORY_ITEMS = 500000
+DEFAULT_CAPACITY = 10000000
+DEFAULT_ERROR_RATE = 0.01
+
+UNRESERVED = re.compile(r'[A-Za-z0-9._~-]')
+PERCENT_ENCODED = re.compile(r'%[0-9A-Fa-f]{2}')
+INT_SEGMENT = re.compile(r'^\d+$')
+HEX_SEGMENT = re.compile(r'^(?=.*\d)(?=.*[a-f])[0-9a-f-]{16,}$', re.I)
+SLUG_SEGMENT = re.compile(r'^[a-z0-9]+(?:[-_][a-z0-9]+){3,}$', re.I)
+
+
+def normalize_percent_encoding(value):
+	"""Uppercase percent-encodings and decode the unreserved characters."""
+	def replace(match):
+		char = chr(int(match.group()[1:], 16))
+		return char if UNRESERVED.match(char) else match.group().upper()
+	return PERCENT_ENCODED.sub(replace, value)
+
+
+def normalize_path(path):
+	"""Normalize an URL path: percent-encodings, duplicate slashes and dot
+	segments.
+
+	Args:
+		path (str): URL path.
+
+	Returns:
+		str: Path, '/' if empty.
+	"""
+	segments = []
+	for segment in normalize_percent_encoding(path).split('/'):
+		if segment in ('', '.'):
+			continue
+		if segment == '..':
+			if segments:
+				segments.pop()
+			continue
+		segments.append(segment)
+	normalized = '/' + '/'.join(segments)
+	if segments and (path.endswith('/') or path.endswith('/.') or path.endswith('/..')):
+		normalized += '/'
+	return normalized
+
+
+def canonicalize_url(url):
+	"""Canonicalize an HTTP URL.
+
+	Args:
+		url (str): URL.
+
+	Returns:
+		str: Canonical URL, None if not an HTTP URL.
+	"""
+	url = url.strip()
+	try:
+		parts = urlsplit(url)
+		port = parts.port
+	except ValueError:
+		return None
+	scheme = parts.scheme.lower()
+	host = (parts.hostname or '').rstrip('.')
+	if scheme not in DEFAULT_PORTS or not host:
+		return None
+	netloc = f'[{host}]' if ':' in host else host
+	if port and port != DEFAULT_PORTS[scheme]:
+		netloc += f':{port}'
+	params = [normalize_percent_encoding(param) for param in parts.query.split('&') if param]
+	params.sort(key=lambda param: param.split('=', 1)[0])
+	return urlunsplit((scheme, netloc, normalize_path(parts.path), '&'.join(params), ''))
+
+
+def get_variant_key(url):
+	"""Get the key shared by the variants of a canonical URL: URLs with the
+	same parameter names, and with the same path once ids, hashes and slugs
+	are masked.
+
+	Args:
+		url (str): Canonical URL, from `canonicalize_url`.
+
+	Returns:
+		str: Variant key.
+	"""
+	parts = urlsplit(url)
+	segments = []
+	for segment in parts.path.split('/'):
+		if INT_SEGMENT.match(segment):
+			segment = '{int}'
+		elif HEX_SEGMENT.match(segment):
+			segment = '{hex}'
+		elif SLUG_SEGMENT.match(segment):
+			segment = '{slug}'
+		segments.append(segment)
+	names = sorted({param.split('=', 1)[0] for param in parts.query.split('&') if param})
+	return f'{parts.scheme}://{parts.netloc}{"/".join(segments)}?{"&".join(names)}'
+
+
+class SeenSet:
+	"""Memory-bounded set of strings.
+
+	Items are stored as 64-bit hashes. At most `max_memory_items` hashes are
+	kept in memory, older ones spill to sorted runs on disk, searched only
+	when the Bloom filter (sized for `capacity` items) reports an item as
+	possibly seen. The filter saturates past `capacity` items, which makes
+	lookups slower but not wrong.
+
+	Args:
+		max_memory_items (int): Max hashes kept in memory.
+		capacity (int): Expected number of items.
+		error_rate (float): Bloom filter false positive rate at capacity.
+		spill_dir (str, optional): Directory of the spilled runs.
+	"""
+
+	def __init__(
+			self,
+			max_memory_items=DEFAULT_MEMORY_ITEMS,
+			capacity=DEFAULT_CAPACITY,
+			error_rate=DEFAULT_ERROR_RATE,
+			spill_dir=None):
+		self.max_memory_items = max_memory_items
+		self.spill_dir = spill_dir
+		self.bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+		self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+		self.bloom = bytearray((self.bits + 7) // 8)
+		self.memory = set()
+		self.runs = []
+		self.count = 0
+
+	def __len__(self):
+		return self.count
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def add(self, item):
+		"""Add an item.
+
+		Returns:
+			bool: True if the item was not seen yet.
+		"""
+		digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+		key = int.from_bytes(digest[:8], 'little')
+		h1, h2 = key, int.from_bytes(digest[8:], 'little') | 1
+		positions = [(h1 + ix * h2) % self.bits for ix in range(self.hashes)]
+		if all(self.bloom[pos >> 3] & (1 << (pos & 7)) for pos in positions):
+			if key in self.memory or any(self.in_run(run, key) for run in self.runs):
+				return False
+		for pos in positions:
+			self.bloom[pos >> 3] |= 1 << (pos & 7)
+		self.memory.add(key)
+		self.count += 1
+		if len(self.memory) >= self.max_memory_items:
+			self.spill()
+		return True
+
+	def spill(self):
+		"""Write the in-memory hashes to a sorted run on disk."""
+		keys = array('Q', sorted(self.memory))
+		with tempfile.TemporaryFile(dir=self.spill_dir) as f:
+			keys.tofile(f)
+			f.flush()
+			mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		self.runs.append((mapped, memoryview(mapped).cast('Q')))
+		self.memory = set()
+
+	def in_run(self, run, key):
+		_, keys = run
+		ix = bisect.bisect_left(keys, key)
+		return ix < len(keys) and keys[ix] == key
+
+	def close(self):
+		for mapped, keys in self.runs:
+			keys.release()
+			mapped.close()
+		self.runs = []
+		self.memory = set()
+
+
+def iter_unique_urls(urls, seen, collapse_variants=True):
+	"""Canonicalize and deduplicate URLs, streaming.
+
+	Args:
+		urls (iterable): URLs.
+		seen (SeenSet): URLs (or variant keys) already seen.
+		collapse_variants (bool): Only yield the first URL of each variant
+			(see `get_variant_key`).
+
+	Yields:
+		str: New canonical URLs, in input order.
+	"""
+	for url in urls:
+		url = canonicalize_url(url)
+		if not url:
+			continue
+		if seen.add(get_variant_key(url) if collapse_variants else url):
+			yield url
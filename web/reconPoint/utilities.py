@@ -1,4 +1,3 @@
-import re
 import os
 import validators
 
@@ -117,51 +116,6 @@ def is_valid_url(url, validate_only_http_scheme=True):
 	return False
 
 
-class SubdomainScopeChecker:
-	"""
-		SubdomainScopeChecker is a utility class to check if a subdomain is in scope or not.
-		it supports both regex and string matching.
-	"""
-
-	def __init__(self, patterns):
-		self.regex_patterns = set()
-		self.plain_patterns = set()
-		self.load_patterns(patterns)
-
-	def load_patterns(self, patterns):
-		"""
-			Load patterns into the checker.
-
-			Args:
-				patterns (list): List of patterns to load.
-			Returns: 
-				None
-		"""
-		for pattern in patterns:
-			# skip empty patterns
-			if not pattern:
-				continue
-			try:
-				self.regex_patterns.add(re.compile(pattern, re.IGNORECASE))
-			except re.error:
-				self.plain_patterns.add(pattern.lower())
-
-	def is_out_of_scope(self, subdomain):
-		"""
-			Check if a subdomain is out of scope.
-
-			Args:
-				subdomain (str): The subdomain to check.
-			Returns:
-				bool: True if the subdomain is out of scope, False otherwise.
-		"""
-		subdomain = subdomain.lower() # though we wont encounter this, but just in case
-		if subdomain in self.plain_patterns:
-			return True
-		return any(pattern.search(subdomain) for pattern in self.regex_patterns)
-
-
-
 def sorting_key(subdomain):
 	# sort subdomains based on their http status code with priority 200 < 300 < 400 < rest
 	status = subdomain['http_status']
@@ -0,0 +1,1295 @@
+import io
+import validators
+
+from urllib.parse import urlparse
+from celery.utils.log import get_task_logger
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from reconPoint.common_func import (get_port_service_description,
+									get_subdomain_from_url, sanitize_url)
+from reconPoint.definitions import UNCOMMON_WEB_PORTS
+from reconPoint.settings import RECONPOINT_BULK_BATCH_SIZE
+from reconPoint.scope import get_scope_engine
+from reconPoint.utilities import replace_nulls
+from startScan.models import (CveId, CweId, EndPoint, IpAddress, Port,
+							  S3Bucket, ScanHistory, SubScan, Subdomain,
+							  Technology, Vulnerability,
+							  VulnerabilityReference, VulnerabilityTags)
+from targetApp.models import Domain
+
+logger = get_task_logger(__name__)
+
+
+#---------#
+# Helpers #
+#---------#
+def chunked(iterable, size=RECONPOINT_BULK_BATCH_SIZE):
+	"""Yield successive lists of at most `size` items from an iterable.
+
+	Args:
+		iterable (iterable): Items to split.
+		size (int): Maximum chunk size.
+
+	Yields:
+		list: Chunk of items.
+	"""
+	chunk = []
+	for item in iterable:
+		chunk.append(item)
+		if len(chunk) >= size:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+
+def freeze(value):
+	"""Make a value hashable (lists become tuples).
+
+	Args:
+		value: Value to freeze.
+
+	Returns:
+		Hashable value.
+	"""
+	if isinstance(value, (list, tuple)):
+		return tuple(freeze(item) for item in value)
+	if isinstance(value, dict):
+		return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+	return value
+
+
+def merge_patterns(patterns, new_patterns):
+	"""Append comma-separated patterns to a comma-separated list, skipping
+	the ones already listed.
+
+	Args:
+		patterns (str): Patterns list, may be None.
+		new_patterns (str): Patterns to add.
+
+	Returns:
+		str: Merged patterns, in first-seen order.
+	"""
+	merged = [pattern for pattern in (patterns or '').split(',') + new_patterns.split(',') if pattern]
+	return ','.join(dict.fromkeys(merged))
+
+
+def copy_value(value):
+	"""Format a Python value for Postgres COPY text format.
+
+	Args:
+		value: Value to format.
+
+	Returns:
+		str: Escaped value, `\\N` for None.
+	"""
+	if value is None:
+		return '\\N'
+	if isinstance(value, bool):
+		return 't' if value else 'f'
+	return (
+		str(value)
+		.replace('\x00', '')
+		.replace('\\', '\\\\')
+		.replace('\t', '\\t')
+		.replace('\n', '\\n')
+		.replace('\r', '\\r')
+	)
+
+
+#------------#
+# Subdomains #
+#------------#
+def parse_subdomain_names(lines, out_of_scope_subdomains=[], domain_name=None):
+	"""Validate raw tool output in memory and return the in-scope subdomain
+	names, without touching the database.
+
+	Args:
+		lines (iterable): Raw lines (subdomains, IPs or URLs).
+		out_of_scope_subdomains (list): Out-of-scope patterns.
+		domain_name (str, optional): Root domain that names must belong to.
+
+	Returns:
+		list: Unique subdomain names, in input order.
+	"""
+	scope_checker = get_scope_engine(out_of_scope_subdomains)
+	seen = set()
+	names = []
+	skipped = 0
+	for line in lines:
+		name = line.strip()
+		if not name:
+			continue
+		valid_url = bool(validators.url(name))
+		valid_domain = (
+			bool(validators.domain(name)) or
+			bool(validators.ipv4(name)) or
+			bool(validators.ipv6(name)) or
+			valid_url
+		)
+		if not valid_domain:
+			logger.debug(f'Subdomain {name} is not a valid domain, IP or URL. Skipping.')
+			skipped += 1
+			continue
+
+		if valid_url:
+			name = urlparse(name).netloc
+
+		if name in seen:
+			continue
+		seen.add(name)
+
+		if scope_checker.is_out_of_scope(name):
+			logger.debug(f'Subdomain {name} is out of scope. Skipping.')
+			skipped += 1
+			continue
+
+		if domain_name and domain_name not in name:
+			logger.debug(f'{name} is not a subdomain of domain {domain_name}. Skipping.')
+			skipped += 1
+			continue
+
+		names.append(name)
+
+	if skipped:
+		logger.warning(f'Skipped {skipped} invalid or out-of-scope subdomains.')
+	return names
+
+
+def bulk_save_subdomains(subdomain_names, ctx={}, batch_size=RECONPOINT_BULK_BATCH_SIZE):
+	"""Insert Subdomain objects in batches. Names already stored for the scan
+	are left untouched; conflicts with concurrent writers are ignored thanks to
+	the (scan_history, name) unique constraint.
+
+	Args:
+		subdomain_names (list): Validated subdomain names.
+		ctx (dict): Scan context.
+		batch_size (int): Number of rows per INSERT.
+
+	Returns:
+		tuple: (list of startScan.models.Subdomain, number of created rows).
+	"""
+	subscan_id = ctx.get('subscan_id')
+	scan = ScanHistory.objects.filter(pk=ctx.get('scan_history_id')).first()
+	domain = scan.domain if scan else None
+	SubScanLink = SubScan.subdomain_subscan_ids.through
+	subdomains = []
+	created_count = 0
+	for batch in chunked(subdomain_names, batch_size):
+		existing = set(
+			Subdomain.objects
+			.filter(scan_history=scan, name__in=batch)
+			.values_list('name', flat=True)
+		)
+		new_names = set(name for name in batch if name not in existing)
+		if new_names:
+			discovered_date = timezone.now()
+			Subdomain.objects.bulk_create(
+				[
+					Subdomain(
+						scan_history=scan,
+						target_domain=domain,
+						name=name,
+						discovered_date=discovered_date)
+					for name in batch if name in new_names
+				],
+				batch_size=batch_size,
+				ignore_conflicts=True)
+
+		rows = list(Subdomain.objects.filter(scan_history=scan, name__in=batch))
+		if new_names:
+			# Rows inserted by a concurrent writer were dropped by
+			# ignore_conflicts and carry another discovery date
+			created_count += sum(
+				1 for subdomain in rows
+				if subdomain.name in new_names and subdomain.discovered_date == discovered_date)
+		if subscan_id and new_names:
+			SubScanLink.objects.bulk_create(
+				[
+					SubScanLink(subscan_id=subscan_id, subdomain_id=subdomain.id)
+					for subdomain in rows if subdomain.name in new_names
+				],
+				ignore_conflicts=True)
+		subdomains.extend(rows)
+
+	logger.info(f'Saved {len(subdomains)} subdomains ({created_count} new).')
+	return subdomains, created_count
+
+
+#-----------#
+# Endpoints #
+#-----------#
+ENDPOINT_DATA_FIELDS = (
+	'source',
+	'content_length',
+	'page_title',
+	'http_status',
+	'content_type',
+	'response_time',
+	'webserver',
+	'matched_gf_patterns',
+	'body_hash',
+	'body_simhash',
+)
+ENDPOINT_STAGING_COLUMNS = ('http_url', 'subdomain_id', 'is_default') + ENDPOINT_DATA_FIELDS
+
+ENDPOINT_STAGING_TABLE_SQL = '''
+	CREATE TEMP TABLE IF NOT EXISTS endpoint_staging (
+		http_url text,
+		subdomain_id integer,
+		is_default boolean,
+		source text,
+		content_length integer,
+		page_title text,
+		http_status integer,
+		content_type text,
+		response_time double precision,
+		webserver text,
+		matched_gf_patterns text,
+		body_hash text,
+		body_simhash text
+	) ON COMMIT DELETE ROWS
+'''
+
+# Existing endpoints only take the non-null values of the new data; gf
+# patterns are appended to the ones already matched.
+ENDPOINT_UPDATE_SQL = '''
+	UPDATE {table} AS e SET
+		subdomain_id = COALESCE(s.subdomain_id, e.subdomain_id),
+		is_default = COALESCE(e.is_default, false) OR COALESCE(s.is_default, false),
+		source = COALESCE(s.source, e.source),
+		content_length = COALESCE(s.content_length, e.content_length),
+		page_title = COALESCE(s.page_title, e.page_title),
+		http_status = COALESCE(s.http_status, e.http_status),
+		content_type = COALESCE(s.content_type, e.content_type),
+		response_time = COALESCE(s.response_time, e.response_time),
+		webserver = COALESCE(s.webserver, e.webserver),
+		matched_gf_patterns = CASE
+			WHEN s.matched_gf_patterns IS NULL THEN e.matched_gf_patterns
+			ELSE (
+				SELECT string_agg(pattern, ',' ORDER BY position)
+				FROM (
+					SELECT pattern, min(position) AS position
+					FROM unnest(
+						string_to_array(e.matched_gf_patterns, ',')
+						|| string_to_array(s.matched_gf_patterns, ',')
+					) WITH ORDINALITY AS patterns(pattern, position)
+					WHERE pattern <> ''
+					GROUP BY pattern
+				) AS merged
+			)
+		END,
+		body_hash = COALESCE(s.body_hash, e.body_hash),
+		body_simhash = COALESCE(s.body_simhash, e.body_simhash)
+	FROM endpoint_staging AS s
+	WHERE e.scan_history_id = %s
+		AND md5(e.http_url) = md5(s.http_url)
+		AND e.http_url = s.http_url
+	RETURNING e.id, e.http_url
+'''
+
+ENDPOINT_INSERT_SQL = '''
+	INSERT INTO {table} (
+		scan_history_id, target_domain_id, subdomain_id, http_url, source,
+		content_length, page_title, http_status, content_type, response_time,
+		webserver, is_default, matched_gf_patterns, body_hash, body_simhash,
+		discovered_date)
+	SELECT
+		%s, %s, s.subdomain_id, s.http_url, s.source,
+		COALESCE(s.content_length, 0), s.page_title, COALESCE(s.http_status, 0),
+		s.content_type, s.response_time, s.webserver,
+		COALESCE(s.is_default, false), s.matched_gf_patterns, s.body_hash,
+		s.body_simhash, %s
+	FROM endpoint_staging AS s
+	ON CONFLICT (scan_history_id, md5(http_url)) DO NOTHING
+	RETURNING id, http_url
+'''
+
+
+class EndpointWriter:
+	"""Buffered EndPoint sink shared by the URL-producing tasks.
+
+	URLs are validated and deduplicated in memory, subdomain foreign keys are
+	resolved from a per-scan cache, and every flush writes the whole buffer
+	with a COPY into a staging table followed by set-based upserts, plus bulk
+	inserts of the M2M links.
+
+	Usage:
+		with EndpointWriter(ctx=ctx) as endpoints:
+			for url in urls:
+				endpoints.add(url, http_status=200)
+
+	Args:
+		ctx (dict): Scan context.
+		batch_size (int): Number of buffered endpoints triggering a flush.
+		create_subdomains (bool): Create missing subdomains (validated and
+			scope-checked like `save_subdomain`) instead of leaving the
+			subdomain foreign key empty. URLs whose subdomain is rejected are
+			dropped.
+		track_ids (bool): Keep a map of URL -> (endpoint id, created) for
+			the lifetime of the writer (see `get`).
+	"""
+
+	def __init__(self, ctx={}, batch_size=RECONPOINT_BULK_BATCH_SIZE, create_subdomains=False, track_ids=False):
+		self.ctx = ctx
+		self.batch_size = batch_size
+		self.create_subdomains = create_subdomains
+		self.track_ids = track_ids
+		self.scan_id = ctx.get('scan_history_id')
+		self.subscan_id = ctx.get('subscan_id')
+		self.domain = Domain.objects.filter(pk=ctx.get('domain_id')).first()
+		self.domain_id = self.domain.id if self.domain else (
+			ScanHistory.objects
+			.filter(pk=self.scan_id)
+			.values_list('domain_id', flat=True)
+			.first()
+		)
+		self.pending = {}
+		self.subdomain_ids = {}
+		self.endpoints = {}
+		self.created_count = 0
+		self.updated_count = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is None:
+			self.flush()
+
+	def __len__(self):
+		return len(self.pending)
+
+	def add(self, http_url, subdomain=None, is_default=False, techs=[], subdomain_id=None, **endpoint_data):
+		"""Queue an endpoint for the next flush. Data of a URL queued several
+		times is merged.
+
+		Args:
+			http_url (str): Endpoint URL.
+			subdomain (startScan.models.Subdomain, optional): Subdomain.
+			is_default (bool): If the url is a default url for SubDomains.
+			techs (list): Technology ids to link to the endpoint.
+			subdomain_id (int, optional): Subdomain id, when the Subdomain
+				object is not at hand.
+			endpoint_data: EndPoint fields (see ENDPOINT_DATA_FIELDS).
+
+		Returns:
+			str: Sanitized URL, or None if the URL was rejected.
+		"""
+		if not http_url or not urlparse(http_url).scheme:
+			return None
+		if self.domain and self.domain.name not in http_url:
+			logger.debug(f'{http_url} is not a URL of domain {self.domain.name}. Skipping.')
+			return None
+		if not validators.url(http_url):
+			return None
+		http_url = sanitize_url(http_url)
+		endpoint_data = replace_nulls(endpoint_data)
+
+		row = self.pending.get(http_url)
+		if row is None:
+			row = self.pending[http_url] = {'subdomain_id': None, 'is_default': False, 'techs': set()}
+		if subdomain:
+			subdomain_id = subdomain.id
+		if subdomain_id:
+			row['subdomain_id'] = subdomain_id
+		row['is_default'] = row['is_default'] or is_default
+		row['techs'].update(techs)
+		for field in ENDPOINT_DATA_FIELDS:
+			value = endpoint_data.get(field)
+			if value is None:
+				continue
+			if field == 'matched_gf_patterns' and row.get(field):
+				row[field] = merge_patterns(row[field], value)
+				continue
+			row[field] = value
+
+		if len(self.pending) >= self.batch_size:
+			self.flush()
+		return http_url
+
+	def get(self, http_url):
+		"""Get the endpoint id of a flushed URL. Needs `track_ids`.
+
+		Args:
+			http_url (str): Endpoint URL.
+
+		Returns:
+			tuple: (endpoint id, created), or (None, False) if unknown.
+		"""
+		return self.endpoints.get(sanitize_url(http_url), (None, False))
+
+	def flush(self):
+		"""Write buffered endpoints and their M2M links to the database."""
+		if not self.pending:
+			return
+		rows, self.pending = self.pending, {}
+		self.resolve_subdomains(rows)
+		if not rows:
+			return
+		if self.scan_id and connection.vendor == 'postgresql':
+			endpoints = self.upsert_with_copy(rows)
+		else:
+			endpoints = self.upsert_with_orm(rows)
+		self.write_links(rows, endpoints)
+		if self.track_ids:
+			self.endpoints.update(endpoints)
+		logger.info(f'Flushed {len(rows)} endpoints ({self.created_count} new, {self.updated_count} updated so far).')
+
+	def resolve_subdomains(self, rows):
+		"""Fill missing subdomain ids of buffered rows (see
+		`get_subdomain_ids`).
+
+		Args:
+			rows (dict): Buffered rows, updated in place.
+		"""
+		if not self.scan_id:
+			return
+		hostnames = {
+			url: get_subdomain_from_url(url)
+			for url, row in rows.items() if not row['subdomain_id']
+		}
+		subdomain_ids = self.get_subdomain_ids(hostnames.values(), create=self.create_subdomains)
+		for url, hostname in hostnames.items():
+			subdomain_id = subdomain_ids.get(hostname)
+			if subdomain_id:
+				rows[url]['subdomain_id'] = subdomain_id
+			elif self.create_subdomains:
+				logger.debug(f'Subdomain {hostname} was rejected. Skipping {url}.')
+				del rows[url]
+
+	def get_subdomain_ids(self, names, create=False):
+		"""Get subdomain ids from the per-scan name -> id cache, querying (and
+		optionally creating) the unknown names in one go.
+
+		Args:
+			names (iterable): Subdomain names.
+			create (bool): Create missing subdomains, validated and
+				scope-checked like `save_subdomain`.
+
+		Returns:
+			dict: name -> id, for names stored in the scan.
+		"""
+		names = set(names)
+		missing = names - set(self.subdomain_ids)
+		for batch in chunked(missing, self.batch_size):
+			self.subdomain_ids.update(
+				Subdomain.objects
+				.filter(scan_history_id=self.scan_id, name__in=batch)
+				.values_list('name', 'id')
+			)
+		missing -= set(self.subdomain_ids)
+		if missing and create:
+			valid_names = parse_subdomain_names(
+				missing,
+				out_of_scope_subdomains=self.ctx.get('out_of_scope_subdomains', []),
+				domain_name=self.domain.name if self.domain else None)
+			subdomains, _ = bulk_save_subdomains(valid_names, ctx=self.ctx)
+			self.subdomain_ids.update((subdomain.name, subdomain.id) for subdomain in subdomains)
+		return {name: self.subdomain_ids[name] for name in names if name in self.subdomain_ids}
+
+	def upsert_with_copy(self, rows):
+		"""COPY rows into a staging table, then update existing endpoints and
+		insert the new ones with two set-based statements.
+
+		Args:
+			rows (dict): Buffered rows.
+
+		Returns:
+			dict: URL -> (endpoint id, created).
+		"""
+		buffer = io.StringIO()
+		for http_url, row in rows.items():
+			values = [http_url] + [row.get(column) for column in ENDPOINT_STAGING_COLUMNS[1:]]
+			buffer.write('\t'.join(copy_value(value) for value in values) + '\n')
+		buffer.seek(0)
+
+		table = connection.ops.quote_name(EndPoint._meta.db_table)
+		with transaction.atomic(), connection.cursor() as cursor:
+			cursor.execute(ENDPOINT_STAGING_TABLE_SQL)
+			cursor.copy_expert(
+				f'COPY endpoint_staging ({", ".join(ENDPOINT_STAGING_COLUMNS)}) FROM STDIN',
+				buffer)
+			cursor.execute(ENDPOINT_UPDATE_SQL.format(table=table), [self.scan_id])
+			updated = cursor.fetchall()
+			cursor.execute(
+				ENDPOINT_INSERT_SQL.format(table=table),
+				[self.scan_id, self.domain_id, timezone.now()])
+			created = cursor.fetchall()
+
+		endpoints = {http_url: (endpoint_id, False) for endpoint_id, http_url in updated}
+		endpoints.update({http_url: (endpoint_id, True) for endpoint_id, http_url in created})
+		self.updated_count += len(updated)
+		self.created_count += len(created)
+
+		# Rows inserted concurrently by another writer between both statements
+		missing = [http_url for http_url in rows if http_url not in endpoints]
+		if missing:
+			endpoints.update(
+				(http_url, (endpoint_id, False))
+				for http_url, endpoint_id in (
+					EndPoint.objects
+					.filter(scan_history_id=self.scan_id, http_url__in=missing)
+					.values_list('http_url', 'id')
+				)
+			)
+		return endpoints
+
+	def upsert_with_orm(self, rows):
+		"""Fallback for endpoints outside of a scan (no unique index applies)
+		and for non-Postgres databases.
+
+		Args:
+			rows (dict): Buffered rows.
+
+		Returns:
+			dict: URL -> (endpoint id, created).
+		"""
+		existing = {}
+		existing_patterns = {}
+		for http_url, endpoint_id, patterns in (
+				EndPoint.objects
+				.filter(scan_history_id=self.scan_id, http_url__in=list(rows))
+				.values_list('http_url', 'id', 'matched_gf_patterns')):
+			existing[http_url] = endpoint_id
+			existing_patterns[http_url] = patterns
+		for http_url, endpoint_id in existing.items():
+			row = rows[http_url]
+			data = {
+				field: row[field]
+				for field in ('subdomain_id',) + ENDPOINT_DATA_FIELDS
+				if row.get(field) is not None
+			}
+			if data.get('matched_gf_patterns'):
+				data['matched_gf_patterns'] = merge_patterns(existing_patterns[http_url], data['matched_gf_patterns'])
+			if data:
+				EndPoint.objects.filter(pk=endpoint_id).update(**data)
+
+		discovered_date = timezone.now()
+		EndPoint.objects.bulk_create(
+			[
+				EndPoint(
+					scan_history_id=self.scan_id,
+					target_domain_id=self.domain_id,
+					http_url=http_url,
+					is_default=row['is_default'],
+					discovered_date=discovered_date,
+					**{
+						field: row[field]
+						for field in ('subdomain_id',) + ENDPOINT_DATA_FIELDS
+						if row.get(field) is not None
+					})
+				for http_url, row in rows.items() if http_url not in existing
+			],
+			batch_size=self.batch_size)
+
+		endpoints = {http_url: (endpoint_id, False) for http_url, endpoint_id in existing.items()}
+		new_urls = [http_url for http_url in rows if http_url not in existing]
+		for batch in chunked(new_urls, self.batch_size):
+			endpoints.update(
+				(http_url, (endpoint_id, True))
+				for http_url, endpoint_id in (
+					EndPoint.objects
+					.filter(scan_history_id=self.scan_id, http_url__in=batch)
+					.values_list('http_url', 'id')
+				)
+			)
+		self.updated_count += len(existing)
+		self.created_count += len(new_urls)
+		return endpoints
+
+	def write_links(self, rows, endpoints):
+		"""Bulk insert subscan and technology links of flushed endpoints.
+
+		Args:
+			rows (dict): Flushed rows.
+			endpoints (dict): URL -> (endpoint id, created).
+		"""
+		SubScanLink = EndPoint.endpoint_subscan_ids.through
+		TechnologyLink = EndPoint.techs.through
+		subscan_links = []
+		technology_links = []
+		for http_url, (endpoint_id, created) in endpoints.items():
+			if created and self.subscan_id:
+				subscan_links.append(SubScanLink(endpoint_id=endpoint_id, subscan_id=self.subscan_id))
+			technology_links.extend(
+				TechnologyLink(endpoint_id=endpoint_id, technology_id=technology_id)
+				for technology_id in rows[http_url]['techs']
+			)
+		if subscan_links:
+			SubScanLink.objects.bulk_create(subscan_links, batch_size=self.batch_size, ignore_conflicts=True)
+		if technology_links:
+			TechnologyLink.objects.bulk_create(technology_links, batch_size=self.batch_size, ignore_conflicts=True)
+
+
+#-----------------#
+# Vulnerabilities #
+#-----------------#
+class LookupCache:
+	"""Value -> id map for a lookup model (tags, CVEs, ...), kept by a writer
+	for its lifetime so that ids of rows deleted meanwhile are not reused.
+	Unknown values are fetched, then created, in one query each.
+
+	Args:
+		model (django.db.models.Model): Lookup model.
+		field (str): Lookup field name.
+	"""
+
+	def __init__(self, model, field):
+		self.model = model
+		self.field = field
+		self.ids = {}
+
+	def resolve(self, values):
+		"""Get ids of values, creating the missing ones.
+
+		Args:
+			values (iterable): Lookup values.
+
+		Returns:
+			dict: value -> id.
+		"""
+		values = set(value for value in values if value)
+		missing = values - set(self.ids)
+		for batch in chunked(missing):
+			for value, pk in (
+					self.model.objects
+					.filter(**{f'{self.field}__in': batch})
+					.order_by('-id')
+					.values_list(self.field, 'id')):
+				self.ids[value] = pk
+		missing -= set(self.ids)
+		if missing:
+			objs = self.model.objects.bulk_create(
+				[self.model(**{self.field: value}) for value in missing],
+				batch_size=RECONPOINT_BULK_BATCH_SIZE)
+			self.ids.update((getattr(obj, self.field), obj.id) for obj in objs)
+		return {value: self.ids[value] for value in values}
+
+
+# Vulnerability M2M field -> lookup model and field
+VULNERABILITY_LOOKUPS = {
+	'tags': (VulnerabilityTags, 'name'),
+	'cve_ids': (CveId, 'name'),
+	'cwe_ids': (CweId, 'name'),
+	'references': (VulnerabilityReference, 'url'),
+}
+
+
+class VulnerabilityWriter:
+	"""Buffered Vulnerability sink replacing per-finding `save_vulnerability`
+	calls. Tags, CVE ids, CWE ids and references are resolved through
+	caches of the writer, and vulnerabilities plus all their through-table rows
+	are bulk inserted on flush.
+
+	By default a finding identical to a stored vulnerability reuses it (like
+	`get_or_create`) and only gets the new links. When `exclude_keys` is
+	passed, findings matching a stored vulnerability on every field but
+	those are dropped instead (like the `record_exists` check).
+
+	Args:
+		batch_size (int): Number of buffered findings triggering a flush.
+		exclude_keys (list, optional): Fields ignored when looking for an
+			existing vulnerability. Matching findings are skipped.
+		on_flush (callable, optional): Called with the list of flushed
+			Vulnerability objects, each with an `is_new` attribute.
+	"""
+
+	def __init__(self, batch_size=RECONPOINT_BULK_BATCH_SIZE, exclude_keys=None, on_flush=None):
+		self.batch_size = batch_size
+		self.skip_existing = exclude_keys is not None
+		self.exclude_keys = set(exclude_keys or [])
+		self.on_flush = on_flush
+		self.pending = {}
+		self.created_count = 0
+		self.lookups = {
+			name: LookupCache(model, field)
+			for name, (model, field) in VULNERABILITY_LOOKUPS.items()
+		}
+		self.fields = {
+			field.name: field
+			for field in Vulnerability._meta.concrete_fields
+			if not field.primary_key
+		}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is None:
+			self.flush()
+
+	def __len__(self):
+		return len(self.pending)
+
+	def add(self, **vuln_data):
+		"""Queue a finding. Accepts the same arguments as `save_vulnerability`.
+
+		Args:
+			vuln_data: Vulnerability fields, plus `subscan`, `tags`,
+				`cve_ids`, `cwe_ids` and `references`.
+		"""
+		links = {key: vuln_data.pop(key, None) or [] for key in VULNERABILITY_LOOKUPS}
+		subscan = vuln_data.pop('subscan', None)
+		vuln_data = replace_nulls(vuln_data)
+
+		# Normalize values the way the ORM would store them
+		data = {}
+		for key, value in vuln_data.items():
+			field = self.fields[key]
+			if field.is_relation:
+				data[field.attname] = value.pk if hasattr(value, 'pk') else value
+			else:
+				data[field.attname] = field.to_python(value)
+
+		key = freeze({k: v for k, v in data.items() if k not in self.exclude_keys})
+		row = self.pending.get(key)
+		if row is None:
+			row = self.pending[key] = {'data': data, 'subscan_ids': set()}
+			row.update((name, set()) for name in VULNERABILITY_LOOKUPS)
+		for name, values in links.items():
+			row[name].update(values)
+		if subscan:
+			row['subscan_ids'].add(subscan.pk if hasattr(subscan, 'pk') else subscan)
+
+		if len(self.pending) >= self.batch_size:
+			self.flush()
+
+	def find_existing(self, rows):
+		"""Match buffered rows with stored vulnerabilities, fetching candidates
+		with one query narrowed on the name, scan, subdomain and URL.
+
+		Args:
+			rows (dict): Buffered rows.
+
+		Returns:
+			dict: row key -> vulnerability id.
+		"""
+		# Rows sharing the same compared columns are indexed together
+		shapes = {}
+		for key, row in rows.items():
+			columns = tuple(sorted(c for c in row['data'] if c not in self.exclude_keys))
+			values = tuple(freeze(row['data'][c]) for c in columns)
+			shapes.setdefault(columns, {})[values] = key
+
+		query = Q(name__in=set(row['data'].get('name') for row in rows.values()))
+		for column in ('scan_history_id', 'subdomain_id', 'http_url'):
+			if not all(column in columns for columns in shapes):
+				continue
+			values = set(row['data'][column] for row in rows.values())
+			subquery = Q(**{f'{column}__in': values - {None}})
+			if None in values:
+				subquery |= Q(**{f'{column}__isnull': True})
+			query &= subquery
+
+		all_columns = set(c for columns in shapes for c in columns)
+		existing = {}
+		for candidate in Vulnerability.objects.filter(query).values('id', *all_columns).iterator():
+			for columns, index in shapes.items():
+				key = index.get(tuple(freeze(candidate[c]) for c in columns))
+				if key is not None and key not in existing:
+					existing[key] = candidate['id']
+		return existing
+
+	def flush(self):
+		"""Write buffered findings and their links to the database.
+
+		Returns:
+			list: Flushed startScan.models.Vulnerability objects.
+		"""
+		if not self.pending:
+			return []
+		rows, self.pending = self.pending, {}
+		existing = self.find_existing(rows)
+		if self.skip_existing:
+			for key in existing:
+				del rows[key]
+			existing = {}
+
+		# Insert new vulnerabilities
+		discovered_date = timezone.now()
+		new_keys = [key for key in rows if key not in existing]
+		vulns = Vulnerability.objects.bulk_create(
+			[
+				Vulnerability(
+					discovered_date=discovered_date,
+					open_status=True,
+					**rows[key]['data'])
+				for key in new_keys
+			],
+			batch_size=self.batch_size)
+		vuln_ids = dict(existing)
+		vuln_ids.update((key, vuln.id) for key, vuln in zip(new_keys, vulns))
+		self.created_count += len(vulns)
+
+		# Insert through-table rows
+		for name, lookup in self.lookups.items():
+			ids = lookup.resolve(value for row in rows.values() for value in row[name])
+			Through = getattr(Vulnerability, name).through
+			column = getattr(Vulnerability, name).field.m2m_reverse_field_name() + '_id'
+			Through.objects.bulk_create(
+				[
+					Through(vulnerability_id=vuln_ids[key], **{column: ids[value]})
+					for key, row in rows.items()
+					for value in row[name] if value
+				],
+				batch_size=self.batch_size,
+				ignore_conflicts=True)
+		SubScanLink = Vulnerability.vuln_subscan_ids.through
+		SubScanLink.objects.bulk_create(
+			[
+				SubScanLink(vulnerability_id=vuln_ids[key], subscan_id=subscan_id)
+				for key, row in rows.items()
+				for subscan_id in row['subscan_ids']
+			],
+			batch_size=self.batch_size,
+			ignore_conflicts=True)
+
+		logger.info(f'Flushed {len(rows)} vulnerabilities ({len(vulns)} new).')
+		new_ids = set(vuln.id for vuln in vulns)
+		flushed = list(
+			Vulnerability.objects
+			.filter(id__in=vuln_ids.values())
+			.select_related('subdomain', 'target_domain')
+			.prefetch_related('tags', 'cve_ids', 'cwe_ids', 'references')
+		)
+		for vuln in flushed:
+			vuln.is_new = vuln.id in new_ids
+		if self.on_flush:
+			self.on_flush(flushed)
+		return flushed
+
+
+#------------#
+# S3 buckets #
+#------------#
+def bulk_save_s3_buckets(buckets, scan_history=None):
+	"""Get or create S3Bucket objects in bulk and link them to a scan.
+
+	Args:
+		buckets (list): Parsed s3scanner results (S3Bucket fields).
+		scan_history (startScan.models.ScanHistory, optional): Scan.
+
+	Returns:
+		list: startScan.models.S3Bucket ids.
+	"""
+	rows = {freeze(bucket): bucket for bucket in buckets}
+	if not rows:
+		return []
+	columns = set()
+	for bucket in rows.values():
+		columns.update(bucket)
+	ids = {}
+	for candidate in (
+			S3Bucket.objects
+			.filter(name__in=set(bucket.get('name') for bucket in rows.values()))
+			.values('id', *columns)):
+		for key, bucket in rows.items():
+			if key not in ids and all(candidate[k] == v for k, v in bucket.items()):
+				ids[key] = candidate['id']
+	new_keys = [key for key in rows if key not in ids]
+	created = S3Bucket.objects.bulk_create(
+		[S3Bucket(**rows[key]) for key in new_keys],
+		batch_size=RECONPOINT_BULK_BATCH_SIZE)
+	ids.update((key, bucket.id) for key, bucket in zip(new_keys, created))
+	if scan_history:
+		Through = scan_history.buckets.through
+		Through.objects.bulk_create(
+			[Through(scanhistory_id=scan_history.id, s3bucket_id=pk) for pk in ids.values()],
+			ignore_conflicts=True)
+	return list(ids.values())
+
+
+#--------------#
+# IP addresses #
+#--------------#
+def bulk_save_ip_addresses(ips, subscan_id=None, batch_size=RECONPOINT_BULK_BATCH_SIZE):
+	"""Get or create IpAddress objects in bulk, replacing per-IP
+	`save_ip_address` calls. Addresses are not unique in the table: the
+	oldest row of an address is reused.
+
+	Args:
+		ips (dict): address -> IpAddress fields to set (e.g. {'is_cdn': True}).
+		subscan_id (int, optional): Subscan to link the IPs to.
+		batch_size (int): Number of rows per query.
+
+	Returns:
+		tuple: (dict of address -> id, dict of address -> id of created rows).
+	"""
+	ips = {
+		address: data for address, data in ips.items()
+		if validators.ipv4(address) or validators.ipv6(address)
+	}
+	ids = {}
+	for batch in chunked(ips, batch_size):
+		ids.update(
+			IpAddress.objects
+			.filter(address__in=batch)
+			.order_by('-id')
+			.values_list('address', 'id')
+		)
+
+	# Existing IPs sharing the same new values are updated together
+	updates = {}
+	for address, pk in ids.items():
+		if ips[address]:
+			updates.setdefault(freeze(ips[address]), (ips[address], []))[1].append(pk)
+	for data, pks in updates.values():
+		for batch in chunked(pks, batch_size):
+			IpAddress.objects.filter(id__in=batch).update(**data)
+
+	objs = IpAddress.objects.bulk_create(
+		[IpAddress(address=address, **data) for address, data in ips.items() if address not in ids],
+		batch_size=batch_size)
+	created = {obj.address: obj.id for obj in objs}
+	ids.update(created)
+
+	if subscan_id:
+		SubScanLink = IpAddress.ip_subscan_ids.through
+		SubScanLink.objects.bulk_create(
+			[SubScanLink(ipaddress_id=pk, subscan_id=subscan_id) for pk in ids.values()],
+			batch_size=batch_size,
+			ignore_conflicts=True)
+	return ids, created
+
+
+#---------------#
+# httpx results #
+#---------------#
+SUBDOMAIN_PROBE_FIELDS = (
+	'http_url',
+	'http_status',
+	'page_title',
+	'content_length',
+	'webserver',
+	'response_time',
+	'content_type',
+	'cname',
+	'is_cdn',
+)
+
+
+class HttpCrawlWriter:
+	"""Buffered sink for httpx results, replacing the per-line subdomain,
+	technology, endpoint and IP writes of `http_crawl`. Subdomains and
+	technologies are resolved through caches of the writer, and each flush
+	writes endpoints, IPs, probed subdomain fields and all M2M links in bulk.
+
+	Records are compact httpx results with a 'final_url' key, plus the httpx
+	'status_code', 'title', 'content_length', 'webserver', 'content_type',
+	'tech', 'a', 'host', 'cdn', 'cdn_name' and 'cname' keys, the parsed
+	'response_time' and the 'body_hash' and 'body_simhash' fingerprints.
+	Flushed records get 'endpoint_id' and 'endpoint_created' keys.
+
+	Args:
+		ctx (dict): Scan context.
+		batch_size (int): Number of buffered records triggering a flush.
+		is_ran_from_subdomain_scan (bool): Flag endpoints as default, and store
+			probe results and technologies on the subdomains.
+		on_flush (callable, optional): Called with the list of flushed records
+			and the dict of created IPs (address -> id).
+	"""
+
+	def __init__(self, ctx={}, batch_size=RECONPOINT_BULK_BATCH_SIZE, is_ran_from_subdomain_scan=False, on_flush=None):
+		self.batch_size = batch_size
+		self.is_ran_from_subdomain_scan = is_ran_from_subdomain_scan
+		self.on_flush = on_flush
+		self.subscan_id = ctx.get('subscan_id')
+		self.endpoints = EndpointWriter(ctx=ctx, batch_size=batch_size, track_ids=True)
+		self.technologies = LookupCache(Technology, 'name')
+		self.pending = []
+		self.results = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is None:
+			self.flush()
+
+	def __len__(self):
+		return len(self.pending)
+
+	def add(self, record):
+		"""Queue an httpx record for the next flush.
+
+		Args:
+			record (dict): Compact httpx result.
+		"""
+		self.pending.append(record)
+		if len(self.pending) >= self.batch_size:
+			self.flush()
+
+	def flush(self):
+		"""Write buffered records to the database.
+
+		Returns:
+			list: Flushed records, without the ones whose subdomain or URL was
+				rejected.
+		"""
+		if not self.pending:
+			return []
+		records, self.pending = self.pending, []
+
+		# Resolve subdomains, creating the new ones
+		hostnames = [get_subdomain_from_url(record['final_url']) for record in records]
+		subdomain_ids = self.endpoints.get_subdomain_ids(hostnames, create=True)
+		tech_ids = self.technologies.resolve(
+			tech for record in records for tech in record.get('tech') or [])
+
+		# Write endpoints
+		flushed = []
+		for record, hostname in zip(records, hostnames):
+			subdomain_id = subdomain_ids.get(hostname)
+			if not subdomain_id:
+				continue
+			if not self.endpoints.add(
+					record['final_url'],
+					subdomain_id=subdomain_id,
+					is_default=self.is_ran_from_subdomain_scan,
+					techs=[tech_ids[tech] for tech in record.get('tech') or [] if tech],
+					http_status=record.get('status_code'),
+					page_title=record.get('title'),
+					content_length=record.get('content_length', 0),
+					webserver=record.get('webserver'),
+					response_time=record.get('response_time'),
+					content_type=record.get('content_type', ''),
+					body_hash=record.get('body_hash'),
+					body_simhash=record.get('body_simhash')):
+				continue
+			record['subdomain_id'] = subdomain_id
+			flushed.append(record)
+		self.endpoints.flush()
+		for record in flushed:
+			record['endpoint_id'], record['endpoint_created'] = self.endpoints.get(record['final_url'])
+
+		new_ips = self.write_ips(flushed)
+		if self.is_ran_from_subdomain_scan:
+			self.write_subdomains(flushed, tech_ids)
+
+		for record in flushed:
+			del record['subdomain_id']
+		logger.info(f'Flushed {len(flushed)} httpx results ({len(new_ips)} new IPs).')
+		self.results.extend(flushed)
+		if self.on_flush:
+			self.on_flush(flushed, new_ips)
+		return flushed
+
+	def write_ips(self, records):
+		"""Save IPs of the 'a' records and host of flushed records, and link
+		them to their subdomains.
+
+		Returns:
+			dict: address -> id of created IPs.
+		"""
+		ips = {}
+		links = set()
+		for record in records:
+			for address in (record.get('a') or []) + [record.get('host')]:
+				if address:
+					ips[address] = {'is_cdn': bool(record.get('cdn'))}
+					links.add((record['subdomain_id'], address))
+		ip_ids, created = bulk_save_ip_addresses(ips, subscan_id=self.subscan_id, batch_size=self.batch_size)
+		IpLink = Subdomain.ip_addresses.through
+		IpLink.objects.bulk_create(
+			[
+				IpLink(subdomain_id=subdomain_id, ipaddress_id=ip_ids[address])
+				for subdomain_id, address in links if address in ip_ids
+			],
+			batch_size=self.batch_size,
+			ignore_conflicts=True)
+		return created
+
+	def write_subdomains(self, records, tech_ids):
+		"""Store probe results and technologies of flushed records on their
+		subdomains. The last record of a subdomain wins.
+
+		Args:
+			records (list): Flushed records.
+			tech_ids (dict): Technology name -> id.
+		"""
+		subdomains = {}
+		technology_links = set()
+		for record in records:
+			subdomain_id = record['subdomain_id']
+			subdomains[subdomain_id] = Subdomain(
+				id=subdomain_id,
+				http_url=record['final_url'],
+				http_status=record.get('status_code'),
+				page_title=record.get('title'),
+				content_length=record.get('content_length', 0),
+				webserver=record.get('webserver'),
+				response_time=record.get('response_time'),
+				content_type=record.get('content_type', ''),
+				cname=','.join(record.get('cname') or []),
+				is_cdn=bool(record.get('cdn')),
+				cdn_name=record.get('cdn_name'))
+			technology_links.update(
+				(subdomain_id, tech_ids[tech])
+				for tech in record.get('tech') or [] if tech)
+
+		# The CDN name is only overwritten for subdomains behind a CDN
+		with_cdn = [subdomain for subdomain in subdomains.values() if subdomain.is_cdn]
+		without_cdn = [subdomain for subdomain in subdomains.values() if not subdomain.is_cdn]
+		if with_cdn:
+			Subdomain.objects.bulk_update(with_cdn, SUBDOMAIN_PROBE_FIELDS + ('cdn_name',), batch_size=self.batch_size)
+		if without_cdn:
+			Subdomain.objects.bulk_update(without_cdn, SUBDOMAIN_PROBE_FIELDS, batch_size=self.batch_size)
+
+		TechnologyLink = Subdomain.technologies.through
+		TechnologyLink.objects.bulk_create(
+			[
+				TechnologyLink(subdomain_id=subdomain_id, technology_id=technology_id)
+				for subdomain_id, technology_id in technology_links
+			],
+			batch_size=self.batch_size,
+			ignore_conflicts=True)
+
+
+#-------------------#
+# Port scan results #
+#-------------------#
+def bulk_save_ports(numbers, batch_size=RECONPOINT_BULK_BATCH_SIZE, port_ids=None):
+	"""Get or create Port objects in bulk, replacing per-port
+	`update_or_create_port` calls. Service names and descriptions come from
+	the cached port index, and rows are only written when they change.
+	Numbers are not unique in the table: the oldest row of a number is
+	reused.
+
+	Args:
+		numbers (iterable): Port numbers.
+		batch_size (int): Number of rows per query.
+		port_ids (dict, optional): port number -> id of the ports already
+			saved by the caller, updated with the new ones.
+
+	Returns:
+		dict: port number -> id.
+	"""
+	if port_ids is None:
+		port_ids = {}
+	numbers = set(numbers)
+	missing = numbers - set(port_ids)
+	ports = {}
+	for batch in chunked(missing, batch_size):
+		for port in Port.objects.filter(number__in=batch).order_by('-id'):
+			ports[port.number] = port
+
+	# Existing ports are only updated when their service info is stale
+	stale = []
+	for number, port in ports.items():
+		service = get_port_service_description(number)
+		is_uncommon = port.is_uncommon or number in UNCOMMON_WEB_PORTS
+		if (port.service_name, port.description, port.is_uncommon) != (service['service_name'], service['description'], is_uncommon):
+			port.service_name = service['service_name']
+			port.description = service['description']
+			port.is_uncommon = is_uncommon
+			stale.append(port)
+		port_ids[number] = port.id
+	if stale:
+		Port.objects.bulk_update(stale, ['service_name', 'description', 'is_uncommon'], batch_size=batch_size)
+
+	new_ports = []
+	for number in missing - set(ports):
+		service = get_port_service_description(number)
+		new_ports.append(Port(
+			number=number,
+			service_name=service['service_name'],
+			description=service['description'],
+			is_uncommon=number in UNCOMMON_WEB_PORTS))
+	for port in Port.objects.bulk_create(new_ports, batch_size=batch_size):
+		logger.warning(f'Added new port {port.number} to DB')
+		port_ids[port.number] = port.id
+	return {number: port_ids[number] for number in numbers if number in port_ids}
+
+
+class PortScanWriter:
+	"""Buffered sink for naabu results, replacing the per-port subdomain,
+	IP and port writes of `port_scan`. Each flush resolves subdomains from the
+	scan cache, then upserts IPs, ports, and the subdomain <-> IP and IP <->
+	port links in bulk.
+
+	Records are naabu results with 'host', 'ip' and 'port' keys.
+
+	Args:
+		ctx (dict): Scan context.
+		batch_size (int): Number of buffered records triggering a flush.
+		on_flush (callable, optional): Called with the list of flushed records
+			and the dict of created IPs (address -> id).
+	"""
+
+	def __init__(self, ctx={}, batch_size=RECONPOINT_BULK_BATCH_SIZE, on_flush=None):
+		self.batch_size = batch_size
+		self.on_flush = on_flush
+		self.subscan_id = ctx.get('subscan_id')
+		self.endpoints = EndpointWriter(ctx=ctx, batch_size=batch_size)
+		self.port_ids = {}
+		self.pending = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is None:
+			self.flush()
+
+	def __len__(self):
+		return len(self.pending)
+
+	def add(self, record):
+		"""Queue a naabu record for the next flush.
+
+		Args:
+			record (dict): naabu result.
+		"""
+		self.pending.append(record)
+		if len(self.pending) >= self.batch_size:
+			self.flush()
+
+	def flush(self):
+		"""Write buffered records to the database.
+
+		Returns:
+			list: Flushed records.
+		"""
+		if not self.pending:
+			return []
+		records, self.pending = self.pending, []
+
+		subdomain_ids = self.endpoints.get_subdomain_ids(record['host'] for record in records)
+		ip_ids, created = bulk_save_ip_addresses(
+			{record['ip']: {} for record in records},
+			subscan_id=self.subscan_id,
+			batch_size=self.batch_size)
+		port_ids = bulk_save_ports(
+			(record['port'] for record in records),
+			batch_size=self.batch_size,
+			port_ids=self.port_ids)
+
+		ip_links = set()
+		port_links = set()
+		for record in records:
+			ip_id = ip_ids.get(record['ip'])
+			if not ip_id:
+				continue
+			if record['host'] in subdomain_ids:
+				ip_links.add((subdomain_ids[record['host']], ip_id))
+			if record['port'] in port_ids:
+				port_links.add((ip_id, port_ids[record['port']]))
+
+		IpLink = Subdomain.ip_addresses.through
+		IpLink.objects.bulk_create(
+			[IpLink(subdomain_id=subdomain_id, ipaddress_id=ip_id) for subdomain_id, ip_id in ip_links],
+			batch_size=self.batch_size,
+			ignore_conflicts=True)
+		PortLink = IpAddress.ports.through
+		PortLink.objects.bulk_create(
+			[PortLink(ipaddress_id=ip_id, port_id=port_id) for ip_id, port_id in port_links],
+			batch_size=self.batch_size,
+			ignore_conflicts=True)
+
+		logger.info(f'Flushed {len(records)} open ports ({len(created)} new IPs).')
+		if self.on_flush:
+			self.on_flush(records, created)
+		return records
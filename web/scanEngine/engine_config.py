@@ -0,0 +1,119 @@
+import yaml
+from django.core.exceptions import ValidationError
+
+from reconPoint.definitions import *
+
+# Bump when the parsed representation changes, so that stored configurations
+# are re-parsed on next access.
+ENGINE_CONFIG_VERSION = 1
+
+# Top-level engine sections, each one being a mapping of options.
+ENGINE_CONFIG_SECTIONS = [
+    SUBDOMAIN_DISCOVERY,
+    HTTP_CRAWL,
+    PORT_SCAN,
+    OSINT,
+    DIR_FILE_FUZZ,
+    FETCH_URL,
+    VULNERABILITY_SCAN,
+    WAF_DETECTION,
+    SCREENSHOT,
+]
+
+# Expected types of options, at top-level or inside sections. Options that
+# are not listed here are kept as is.
+ENGINE_CONFIG_OPTION_TYPES = {
+    THREADS: int,
+    TIMEOUT: (int, float),
+    RATE_LIMIT: int,
+    RETRIES: int,
+    CONCURRENCY: int,
+    RECURSIVE_LEVEL: int,
+    OSINT_DOCUMENTS_LIMIT: int,
+    DELTA_SCAN: bool,
+    ENABLE_HTTP_CRAWL: bool,
+    FOLLOW_REDIRECT: bool,
+    AUTO_CALIBRATION: bool,
+    FETCH_GPT_REPORT: bool,
+    RUN_NUCLEI: bool,
+    RUN_CRLFUZZ: bool,
+    RUN_DALFOX: bool,
+    RUN_S3SCANNER: bool,
+    USE_AMASS_CONFIG: bool,
+    USE_NAABU_CONFIG: bool,
+    USE_NUCLEI_CONFIG: bool,
+    USE_SUBFINDER_CONFIG: bool,
+    USES_TOOLS: list,
+    CUSTOM_HEADERS: list,
+    PORTS: list,
+    GF_PATTERNS: list,
+    EXTENSIONS: list,
+    IGNORE_FILE_EXTENSION: list,
+    DUPLICATE_REMOVAL_FIELDS: list,
+    CUSTOM_HEADER: str,
+    USER_AGENT: str,
+    INTENSITY: str,
+    TOOL_TIMEOUT: (int, dict),
+}
+
+
+def parse_engine_config(yaml_configuration):
+    """Parse and validate an engine YAML configuration.
+
+    Args:
+        yaml_configuration (str): Engine YAML configuration.
+
+    Returns:
+        dict: Parsed configuration. Empty sections are normalized to {}.
+
+    Raises:
+        ValidationError: If the YAML is invalid or options have wrong types.
+    """
+    try:
+        config = yaml.safe_load(yaml_configuration or '') or {}
+    except yaml.YAMLError as e:
+        raise ValidationError(f'Invalid YAML: {e}')
+    if not isinstance(config, dict):
+        raise ValidationError('Engine configuration must be a mapping of sections.')
+
+    errors = []
+    for key, value in config.items():
+        if key in ENGINE_CONFIG_SECTIONS:
+            if value is None:
+                config[key] = value = {}
+            if not isinstance(value, dict):
+                errors.append(f'Section "{key}" must be a mapping.')
+                continue
+            for option, option_value in value.items():
+                errors.extend(validate_option(f'{key}.{option}', option, option_value))
+        else:
+            errors.extend(validate_option(key, key, value))
+    if errors:
+        raise ValidationError(errors)
+    return config
+
+
+def validate_option(path, option, value):
+    """Check the type of an option value.
+
+    Args:
+        path (str): Option path, for error messages.
+        option (str): Option name.
+        value: Option value.
+
+    Returns:
+        list: Error messages.
+    """
+    expected = ENGINE_CONFIG_OPTION_TYPES.get(option)
+    if expected is None or value is None:
+        return []
+    expected = expected if isinstance(expected, tuple) else (expected,)
+    # bool is a subclass of int, do not accept it for numeric options
+    if isinstance(value, bool) and bool not in expected:
+        valid = False
+    else:
+        valid = isinstance(value, expected)
+    if valid:
+        return []
+    names = ' or '.join(t.__name__ for t in expected)
+    return [f'Option "{path}" must be of type {names}, got {type(value).__name__}.']
@@ -0,0 +1,121 @@
+# Generated manually for performance improvements
+
+import yaml
+from django.db import migrations, models
+
+# Frozen copy of scanEngine.engine_config at the time of this migration, so
+# that later changes to the live parser don't change what it stores.
+ENGINE_CONFIG_VERSION = 1
+
+ENGINE_CONFIG_SECTIONS = [
+    'subdomain_discovery',
+    'http_crawl',
+    'port_scan',
+    'osint',
+    'dir_file_fuzz',
+    'fetch_url',
+    'vulnerability_scan',
+    'waf_detection',
+    'screenshot',
+]
+
+ENGINE_CONFIG_OPTION_TYPES = {
+    'threads': int,
+    'timeout': (int, float),
+    'rate_limit': int,
+    'retries': int,
+    'concurrency': int,
+    'recursive_level': int,
+    'documents_limit': int,
+    'enable_http_crawl': bool,
+    'follow_redirect': bool,
+    'auto_calibration': bool,
+    'fetch_gpt_report': bool,
+    'run_nuclei': bool,
+    'run_crlfuzz': bool,
+    'run_dalfox': bool,
+    'run_s3scanner': bool,
+    'use_amass_config': bool,
+    'use_naabu_config': bool,
+    'use_nuclei_config': bool,
+    'use_subfinder_config': bool,
+    'uses_tools': list,
+    'custom_headers': list,
+    'ports': list,
+    'gf_patterns': list,
+    'extensions': list,
+    'ignore_file_extensions': list,
+    'duplicate_fields': list,
+    'custom_header': str,
+    'user_agent': str,
+    'intensity': str,
+    'tool_timeout': (int, dict),
+}
+
+
+def is_valid_option(option, value):
+    expected = ENGINE_CONFIG_OPTION_TYPES.get(option)
+    if expected is None or value is None:
+        return True
+    expected = expected if isinstance(expected, tuple) else (expected,)
+    if isinstance(value, bool) and bool not in expected:
+        return False
+    return isinstance(value, expected)
+
+
+def parse_engine_config(yaml_configuration):
+    """Parse an engine YAML configuration, None if it is invalid."""
+    try:
+        config = yaml.safe_load(yaml_configuration or '') or {}
+    except yaml.YAMLError:
+        return None
+    if not isinstance(config, dict):
+        return None
+    for key, value in config.items():
+        if key in ENGINE_CONFIG_SECTIONS:
+            if value is None:
+                config[key] = value = {}
+            if not isinstance(value, dict):
+                return None
+            if not all(is_valid_option(option, option_value) for option, option_value in value.items()):
+                return None
+        elif not is_valid_option(key, value):
+            return None
+    return config
+
+
+def parse_engine_configurations(apps, schema_editor):
+    """Store the parsed configuration of existing engines. Invalid ones are
+    left unparsed and will raise when used, as they did before."""
+    EngineType = apps.get_model('scanEngine', 'EngineType')
+    for engine in EngineType.objects.all():
+        configuration = parse_engine_config(engine.yaml_configuration)
+        if configuration is None:
+            continue
+        engine.configuration = configuration
+        engine.configuration_version = ENGINE_CONFIG_VERSION
+        engine.save(update_fields=['configuration', 'configuration_version'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanEngine', '0002_performance_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enginetype',
+            name='configuration',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enginetype',
+            name='configuration_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            parse_engine_configurations,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
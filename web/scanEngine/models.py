@@ -1,5 +1,6 @@
-import yaml
+from django.core.exceptions import ValidationError
 from django.db import models
+from scanEngine.engine_config import ENGINE_CONFIG_VERSION, parse_engine_config
 
 
 class hybrid_property:
@@ -25,18 +26,47 @@ class EngineType(models.Model):
     engine_name = models.CharField(max_length=200)
     yaml_configuration = models.TextField()
     default_engine = models.BooleanField(null=True, default=False)
+    # Parsed and validated yaml_configuration, refreshed on save
+    configuration = models.JSONField(default=dict, editable=False)
+    configuration_version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.engine_name
 
+    def clean(self):
+        try:
+            parse_engine_config(self.yaml_configuration)
+        except ValidationError as e:
+            raise ValidationError({'yaml_configuration': e.messages})
+
+    def save(self, *args, **kwargs):
+        self.configuration = parse_engine_config(self.yaml_configuration)
+        self.configuration_version = ENGINE_CONFIG_VERSION
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'yaml_configuration' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'configuration', 'configuration_version'}
+        super().save(*args, **kwargs)
+
+    def get_configuration(self):
+        """Get the parsed engine configuration, re-parsing the YAML only if it
+        was stored by an older version of the parser.
+
+        Returns:
+            dict: Engine configuration.
+        """
+        if self.configuration_version != ENGINE_CONFIG_VERSION:
+            self.configuration = parse_engine_config(self.yaml_configuration)
+            self.configuration_version = ENGINE_CONFIG_VERSION
+            if self.pk:
+                self.save(update_fields=['configuration', 'configuration_version'])
+        return self.configuration
+
     def get_number_of_steps(self):
         return len(self.tasks) if self.tasks else 0
 
     @hybrid_property
     def tasks(self):
-        if not self.yaml_configuration or not yaml.safe_load(self.yaml_configuration):
-            return []
-        return list(yaml.safe_load(self.yaml_configuration).keys())
+        return list(self.get_configuration().keys())
 
 class Wordlist(models.Model):
     id = models.AutoField(primary_key=True)
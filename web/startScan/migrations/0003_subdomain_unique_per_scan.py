@@ -0,0 +1,79 @@
+# Generated manually for performance improvements
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_subdomains(apps, schema_editor):
+    """Collapse duplicate (scan_history, name) subdomains onto the oldest row
+    so that the unique constraint can be created. Rows pointing to the
+    duplicates, and their many-to-many links, are re-attached to the kept
+    subdomain before deletion."""
+    Subdomain = apps.get_model('startScan', 'Subdomain')
+    relations = [
+        rel for rel in Subdomain._meta.related_objects
+        if rel.one_to_many
+    ]
+    # (through model, subdomain column, other column) of many-to-many
+    # relations, e.g. technologies or SubScan.subdomain_subscan_ids
+    m2m_links = [
+        (field.remote_field.through, field.m2m_column_name(), field.m2m_reverse_name())
+        for field in Subdomain._meta.many_to_many
+    ] + [
+        (rel.through, rel.field.m2m_reverse_name(), rel.field.m2m_column_name())
+        for rel in Subdomain._meta.related_objects
+        if rel.many_to_many
+    ]
+    duplicates = (
+        Subdomain.objects
+        .filter(scan_history__isnull=False)
+        .values('scan_history_id', 'name')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        stale_ids = list(
+            Subdomain.objects
+            .filter(
+                scan_history_id=duplicate['scan_history_id'],
+                name=duplicate['name'])
+            .exclude(id=duplicate['keep_id'])
+            .values_list('id', flat=True)
+        )
+        for rel in relations:
+            rel.related_model.objects.filter(
+                **{f'{rel.field.name}__in': stale_ids}
+            ).update(**{rel.field.name: duplicate['keep_id']})
+        for through, subdomain_column, other_column in m2m_links:
+            other_ids = (
+                through.objects
+                .filter(**{f'{subdomain_column}__in': stale_ids})
+                .values_list(other_column, flat=True)
+                .distinct()
+            )
+            through.objects.bulk_create(
+                [
+                    through(**{subdomain_column: duplicate['keep_id'], other_column: other_id})
+                    for other_id in other_ids
+                ],
+                ignore_conflicts=True,
+            )
+        Subdomain.objects.filter(id__in=stale_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0002_performance_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_subdomains,
+            reverse_code=migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='subdomain',
+            constraint=models.UniqueConstraint(fields=['scan_history', 'name'], name='unique_subdomain_per_scan'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated manually for performance improvements
+
+from django.db import migrations
+
+
+def merge_duplicate_endpoints(apps, schema_editor):
+    """Collapse duplicate (scan_history, http_url) endpoints onto the oldest
+    row so that the unique index can be created. Foreign keys and M2M links
+    of the duplicates are moved to the kept endpoint before deletion."""
+    EndPoint = apps.get_model('startScan', 'EndPoint')
+    qn = schema_editor.quote_name
+    table = qn(EndPoint._meta.db_table)
+    schema_editor.execute(f'''
+        CREATE TEMP TABLE endpoint_duplicates AS
+        SELECT id, keep_id FROM (
+            SELECT id, MIN(id) OVER (
+                PARTITION BY scan_history_id, md5(http_url)
+            ) AS keep_id
+            FROM {table}
+            WHERE scan_history_id IS NOT NULL
+        ) ranked
+        WHERE id <> keep_id
+    ''')
+
+    for rel in EndPoint._meta.related_objects:
+        if not rel.one_to_many:
+            continue
+        rel_table = qn(rel.related_model._meta.db_table)
+        column = qn(rel.field.column)
+        schema_editor.execute(f'''
+            UPDATE {rel_table} SET {column} = d.keep_id
+            FROM endpoint_duplicates d
+            WHERE {rel_table}.{column} = d.id
+        ''')
+
+    for field in EndPoint._meta.many_to_many:
+        through = qn(field.remote_field.through._meta.db_table)
+        source = qn(field.m2m_column_name())
+        target = qn(field.m2m_reverse_name())
+        schema_editor.execute(f'''
+            INSERT INTO {through} ({source}, {target})
+            SELECT d.keep_id, t.{target}
+            FROM {through} t
+            JOIN endpoint_duplicates d ON t.{source} = d.id
+            ON CONFLICT DO NOTHING
+        ''')
+        schema_editor.execute(f'''
+            DELETE FROM {through} t
+            USING endpoint_duplicates d
+            WHERE t.{source} = d.id
+        ''')
+
+    schema_editor.execute(f'''
+        DELETE FROM {table} e
+        USING endpoint_duplicates d
+        WHERE e.id = d.id
+    ''')
+    schema_editor.execute('DROP TABLE endpoint_duplicates')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0003_subdomain_unique_per_scan'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_endpoints,
+            reverse_code=migrations.RunPython.noop,
+        ),
+        # http_url is too long for a plain btree unique index, so uniqueness
+        # is enforced on its md5. Used by the bulk endpoint writer upserts.
+        migrations.RunSQL(
+            sql='CREATE UNIQUE INDEX IF NOT EXISTS endpoint_scan_url_md5_uniq '
+                'ON "startScan_endpoint" (scan_history_id, md5(http_url))',
+            reverse_sql='DROP INDEX IF EXISTS endpoint_scan_url_md5_uniq',
+        ),
+    ]
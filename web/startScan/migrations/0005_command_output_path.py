@@ -0,0 +1,23 @@
+# Generated manually for performance improvements
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0004_endpoint_unique_url_per_scan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='command',
+            name='output_path',
+            field=models.CharField(blank=True, max_length=1000, null=True),
+        ),
+        migrations.AddField(
+            model_name='command',
+            name='output_size',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
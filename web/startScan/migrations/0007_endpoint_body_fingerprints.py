@@ -0,0 +1,23 @@
+# Generated manually for performance improvements
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('startScan', '0006_scanhistory_delta_base'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='endpoint',
+            name='body_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='endpoint',
+            name='body_simhash',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+    ]
@@ -70,6 +70,9 @@ class ScanHistory(models.Model):
 		default=list
 	)
 
+	# delta scans: last completed scan of the domain with the same engine the
+	# results of known subdomains were carried forward from
+	delta_base = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='delta_scans')
 
 	def __str__(self):
 		return self.domain.name
@@ -342,6 +345,11 @@ class Subdomain(models.Model):
 			models.Index(fields=['target_domain']),
 			models.Index(fields=['http_status']),
 		]
+		constraints = [
+			models.UniqueConstraint(
+				fields=['scan_history', 'name'],
+				name='unique_subdomain_per_scan'),
+		]
 
 
 class SubScan(models.Model):
@@ -402,6 +410,9 @@ class EndPoint(models.Model):
 	webserver = models.CharField(max_length=1000, blank=True, null=True)
 	is_default = models.BooleanField(null=True, blank=True, default=False)
 	matched_gf_patterns = models.CharField(max_length=10000, null=True, blank=True)
+	# response body fingerprints, used to find duplicate endpoints
+	body_hash = models.CharField(max_length=64, null=True, blank=True)
+	body_simhash = models.CharField(max_length=32, null=True, blank=True)
 	techs = models.ManyToManyField('Technology', related_name='techs', null=True, blank=True)
 	# used for subscans
 	endpoint_subscan_ids = models.ManyToManyField('SubScan', related_name='endpoint_subscan_ids', blank=True)
@@ -561,7 +572,10 @@ class Command(models.Model):
 	activity = models.ForeignKey(ScanActivity, on_delete=models.CASCADE, blank=True, null=True)
 	command = models.TextField(blank=True, null=True)
 	return_code = models.IntegerField(blank=True, null=True)
+	# Legacy inline output, new commands spool it to `output_path`
 	output = models.TextField(blank=True, null=True)
+	output_path = models.CharField(max_length=1000, blank=True, null=True)
+	output_size = models.BigIntegerField(default=0)
 	time = models.DateTimeField()
 
 	def __str__(self):
@@ -1035,7 +1035,10 @@ function get_directory_modal(scan_id=null, subdomain_id=null, subdomain_name=nul
 
 }
 
-function create_log_element(log) {
+// Number of bytes of spooled command output loaded at once
+const LOG_CHUNK_BYTES = 65536;
+
+function create_log_element(log, logs_url) {
 	let logElement = document.createElement("p");
 	innerHTML = `
 	<p>
@@ -1043,13 +1046,62 @@ function create_log_element(log) {
 		<i class="fe-terminal"></i>${log.command}
 	  </p>
 	</p>`
-	if (log.output != ''){
+	if (log.output){
 		innerHTML += `<div class="collapse" id="collapse${log.id}"><code style="white-space: pre-line" class="card card-body">${log.output}</code></div>`;
 	}
+	else if (log.output_size > 0 || log.return_code === null){
+		// spooled output, loaded when expanded
+		innerHTML += `<div class="collapse" id="collapse${log.id}">
+			<a href="javascript:;" class="log-load-earlier d-none">Load earlier output</a>
+			<code style="white-space: pre-line" class="card card-body log-output">Loading...</code>
+		</div>`;
+	}
 	logElement.innerHTML = innerHTML;
+	$(logElement).find('.log-output').closest('.collapse').one('show.bs.collapse', function() {
+		tail_log_output(this, `${logs_url}/${log.id}/output/`);
+	});
 	return logElement;
 }
 
+function fetch_log_output(url, params) {
+	return fetch(`${url}?${new URLSearchParams(params)}&format=json`, {
+		credentials: "same-origin"
+	}).then(response => response.json());
+}
+
+function tail_log_output(element, url) {
+	// Show the end of the output, then follow it while the command is running
+	const code = element.querySelector('.log-output');
+	const earlier = element.querySelector('.log-load-earlier');
+	let start = 0;
+	let end = 0;
+	fetch_log_output(url, {tail: LOG_CHUNK_BYTES}).then(data => {
+		code.textContent = data.output;
+		start = data.offset;
+		end = data.offset + data.length;
+		earlier.classList.toggle('d-none', start == 0);
+		if (!data.finished) follow();
+	});
+	earlier.addEventListener('click', function() {
+		const offset = Math.max(start - LOG_CHUNK_BYTES, 0);
+		fetch_log_output(url, {offset: offset, length: start - offset}).then(data => {
+			code.textContent = data.output + code.textContent;
+			start = offset;
+			earlier.classList.toggle('d-none', start == 0);
+		});
+	});
+	function follow() {
+		setTimeout(function() {
+			if (!document.body.contains(element)) return;
+			fetch_log_output(url, {offset: end, length: LOG_CHUNK_BYTES}).then(data => {
+				code.textContent += data.output;
+				end += data.length;
+				if (!data.finished || end < data.size) follow();
+			});
+		}, 3000);
+	}
+}
+
 function get_logs_modal(scan_id=null, activity_id=null) {
 
 	// This function will display a xl modal with datatable for displaying endpoints
@@ -1059,11 +1111,13 @@ function get_logs_modal(scan_id=null, activity_id=null) {
 	$('#xl-modal-footer').empty();
 
 	if (scan_id) {
-		url = `/api/listScanLogs?scan_id=${scan_id}&format=json`
+		logs_url = '/api/listScanLogs'
+		url = `${logs_url}?scan_id=${scan_id}&format=json`
 		title = `Fetching logs for scan ${scan_id}`
 	}
 	else{
-		url = `/api/listActivityLogs?activity_id=${activity_id}&format=json`
+		logs_url = '/api/listActivityLogs'
+		url = `${logs_url}?activity_id=${activity_id}&format=json`
 		title = `Fetching logs for activity ${activity_id}`
 	}
 
@@ -1080,7 +1134,7 @@ function get_logs_modal(scan_id=null, activity_id=null) {
 		swal.close();
 		$('#xl-modal_title').html(`Logs for scan #${scan_history_id}`);
 		data.results.forEach(log => {
-			$('#xl-modal-content').append(create_log_element(log));
+			$('#xl-modal-content').append(create_log_element(log, logs_url));
 		})
 	});
 	$('#modal_xl_scroll_dialog').modal('show');
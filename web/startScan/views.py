@@ -1087,9 +1087,8 @@ def create_report(request, id):
     }
 
     # Get report related config
-    vuln_report_query = VulnerabilityReportSetting.objects.all()
-    if vuln_report_query.exists():
-        report = vuln_report_query[0]
+    report = settings_snapshot.get('vulnerability_report')
+    if report:
         data['company_name'] = report.company_name
         data['company_address'] = report.company_address
         data['company_email'] = report.company_email
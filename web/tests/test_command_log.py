@@ -0,0 +1,52 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from reconPoint.command_log import CommandLog, get_log_size, read_log, tail_log
+
+
+class TestCommandLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'command.log.gz')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_lines(self, count, flush_size=100):
+        with CommandLog(self.path, flush_interval=3600, flush_size=flush_size) as log:
+            for i in range(count):
+                log.write(f'line {i}')
+        return ''.join(f'line {i}\n' for i in range(count)).encode()
+
+    def test_log_is_plain_gzip(self):
+        expected = self.write_lines(500)
+        with gzip.open(self.path) as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_read_ranges(self):
+        expected = self.write_lines(500)
+        self.assertEqual(get_log_size(self.path), len(expected))
+        self.assertEqual(read_log(self.path), expected)
+        for offset, length in [(0, 10), (95, 20), (1000, 1234), (len(expected) - 5, 100)]:
+            self.assertEqual(read_log(self.path, offset, length), expected[offset:offset + length])
+
+    def test_tail(self):
+        expected = self.write_lines(500)
+        offset, data = tail_log(self.path, 64)
+        self.assertEqual(offset, len(expected) - 64)
+        self.assertEqual(data, expected[-64:])
+
+    def test_reopen_appends(self):
+        first = self.write_lines(10)
+        second = self.write_lines(10)
+        self.assertEqual(read_log(self.path), first + second)
+
+    def test_missing_log(self):
+        self.assertEqual(read_log(self.path), b'')
+        self.assertEqual(tail_log(self.path, 10), (0, b''))
+
+
+if __name__ == '__main__':
+    unittest.main()
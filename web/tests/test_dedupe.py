@@ -0,0 +1,101 @@
+import os
+import unittest
+from datetime import timedelta
+
+os.environ['RECONPOINT_SECRET_KEY'] = 'secret'
+os.environ['CELERY_ALWAYS_EAGER'] = 'True'
+
+from reconPoint.dedupe import delete_endpoints, find_duplicate_endpoints
+from reconPoint.tasks import remove_duplicate_endpoints
+from startScan.models import *
+
+DOMAIN_NAME = 'dedupe.reconpoint.test'
+
+
+class TestDedupe(unittest.TestCase):
+    def setUp(self):
+        self.domain, _ = Domain.objects.get_or_create(name=DOMAIN_NAME)
+        self.engine = EngineType(engine_name='test_dedupe_engine', yaml_configuration='{}')
+        self.engine.save()
+        self.scan = ScanHistory.objects.create(
+            domain=self.domain,
+            scan_type=self.engine,
+            start_scan_date=timezone.now())
+        self.discovered_date = timezone.now()
+
+    def tearDown(self):
+        self.scan.delete()
+        self.engine.delete()
+        self.domain.delete()
+
+    def create_endpoint(self, path, http_status=200, **fields):
+        self.discovered_date += timedelta(seconds=1)
+        return EndPoint.objects.create(
+            scan_history=self.scan,
+            target_domain=self.domain,
+            http_url=f'https://www.{DOMAIN_NAME}{path}',
+            http_status=http_status,
+            discovered_date=self.discovered_date,
+            **fields)
+
+    def find(self, fingerprint, **kwargs):
+        kwargs.setdefault('threshold', 2)
+        duplicates = find_duplicate_endpoints(fingerprint, self.scan.id, self.domain.id, **kwargs)
+        return sorted(http_url.split(DOMAIN_NAME)[1] for _, http_url, _ in duplicates)
+
+    def test_body_hash(self):
+        for path in ('/first', '/login', '/a', '/b'):
+            self.create_endpoint(path, body_hash='same')
+        for path in ('/c', '/d'):
+            self.create_endpoint(path, body_hash='other')
+        self.create_endpoint('/e')
+        # the first of each group and kept paths stay, small groups too
+        self.assertEqual(self.find('body_hash'), ['/a', '/b'])
+        self.assertEqual(self.find('body_hash', threshold=1), ['/a', '/b', '/d'])
+
+    def test_body_simhash(self):
+        for path in ('/a', '/b', '/c'):
+            self.create_endpoint(path, body_simhash='f00d')
+        self.assertEqual(self.find('body_simhash'), ['/b', '/c'])
+
+    def test_title_length(self):
+        for path in ('/a', '/b', '/c'):
+            self.create_endpoint(path, page_title='Login', content_length=10)
+        self.create_endpoint('/d', page_title='Login', content_length=20)
+        self.create_endpoint('/e', page_title='Home', content_length=10)
+        self.assertEqual(self.find('title_length'), ['/b', '/c'])
+        # endpoint fields are fingerprints too
+        self.assertEqual(self.find('page_title'), ['/b', '/c', '/d'])
+        self.assertEqual(self.find('unknown_field'), [])
+
+    def test_filters(self):
+        endpoints = [
+            self.create_endpoint(path, http_status=http_status, body_hash='same')
+            for path, http_status in (('/a', 200), ('/b', 200), ('/c', 200), ('/d', 500))
+        ]
+        self.assertEqual(self.find('body_hash', filter_status=[200]), ['/b', '/c'])
+        self.assertEqual(self.find('body_hash', since_id=endpoints[1].id), ['/c', '/d'])
+        # candidates are ranked among all endpoints of the scan
+        self.assertEqual(self.find('body_hash', candidate_ids=[endpoints[0].id, endpoints[2].id]), ['/c'])
+
+    def test_delete_endpoints(self):
+        endpoints = [self.create_endpoint(path) for path in ('/a', '/b', '/c')]
+        self.assertEqual(delete_endpoints([endpoints[0].id, endpoints[2].id], batch_size=1), 2)
+        self.assertEqual(list(EndPoint.objects.filter(scan_history=self.scan)), [endpoints[1]])
+
+    def test_remove_duplicate_endpoints(self):
+        endpoints = [self.create_endpoint(f'/page{ix}', body_hash='same') for ix in range(12)]
+        self.create_endpoint('/other', body_hash='other')
+        remove_duplicate_endpoints(
+            self.scan.id,
+            self.domain.id,
+            filter_ids=[endpoint.id for endpoint in endpoints[6:]],
+            duplicate_removal_fields=['body_hash'],
+            incremental=False)
+        self.assertEqual(
+            sorted(EndPoint.objects.filter(scan_history=self.scan).values_list('http_url', flat=True)),
+            sorted([endpoint.http_url for endpoint in endpoints[:6]] + [f'https://www.{DOMAIN_NAME}/other']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import unittest
+
+os.environ['RECONPOINT_SECRET_KEY'] = 'secret'
+os.environ['CELERY_ALWAYS_EAGER'] = 'True'
+
+from reconPoint.delta import (carry_forward_subdomains, copy_links, copy_rows,
+                              split_known_subdomains)
+from startScan.models import *
+
+DOMAIN_NAME = 'delta.reconpoint.test'
+IP_ADDRESS = '10.255.1.1'
+TECHNOLOGY = 'DeltaTestServer'
+VULNERABILITY_TAG = 'delta-test-tag'
+
+
+class TestDelta(unittest.TestCase):
+    def setUp(self):
+        self.domain, _ = Domain.objects.get_or_create(name=DOMAIN_NAME)
+        self.engine = EngineType(engine_name='test_delta_engine', yaml_configuration='{}')
+        self.engine.save()
+        self.base_scan = ScanHistory.objects.create(
+            domain=self.domain,
+            scan_type=self.engine,
+            start_scan_date=timezone.now())
+        self.scan = ScanHistory.objects.create(
+            domain=self.domain,
+            scan_type=self.engine,
+            start_scan_date=timezone.now(),
+            delta_base=self.base_scan)
+        self.technology = Technology.objects.create(name=TECHNOLOGY)
+        self.ip = IpAddress.objects.create(address=IP_ADDRESS)
+        self.tag = VulnerabilityTags.objects.create(name=VULNERABILITY_TAG)
+
+        # Base scan results of www
+        self.base_subdomain = Subdomain.objects.create(
+            name=f'www.{DOMAIN_NAME}',
+            target_domain=self.domain,
+            scan_history=self.base_scan,
+            http_url=f'https://www.{DOMAIN_NAME}',
+            http_status=200,
+            page_title='Home')
+        self.base_subdomain.technologies.add(self.technology)
+        self.base_subdomain.ip_addresses.add(self.ip)
+        self.base_endpoints = [
+            EndPoint.objects.create(
+                scan_history=self.base_scan,
+                target_domain=self.domain,
+                subdomain=self.base_subdomain,
+                http_url=f'https://www.{DOMAIN_NAME}{path}',
+                http_status=200)
+            for path in ('/', '/login')
+        ]
+        self.base_endpoints[1].techs.add(self.technology)
+        self.base_vuln = Vulnerability.objects.create(
+            scan_history=self.base_scan,
+            target_domain=self.domain,
+            subdomain=self.base_subdomain,
+            endpoint=self.base_endpoints[1],
+            http_url=self.base_endpoints[1].http_url,
+            name='Reflected XSS',
+            severity=2)
+        self.base_vuln.tags.add(self.tag)
+
+        # Delta scan: www is known, api is new, / was already saved
+        self.subdomains = [
+            Subdomain.objects.create(name=name, target_domain=self.domain, scan_history=self.scan)
+            for name in (f'www.{DOMAIN_NAME}', f'api.{DOMAIN_NAME}')
+        ]
+        self.saved_endpoint = EndPoint.objects.create(
+            scan_history=self.scan,
+            target_domain=self.domain,
+            subdomain=self.subdomains[0],
+            http_url=f'https://www.{DOMAIN_NAME}/')
+
+    def tearDown(self):
+        self.tag.delete()
+        self.ip.delete()
+        self.technology.delete()
+        self.scan.delete()
+        self.base_scan.delete()
+        self.engine.delete()
+        self.domain.delete()
+
+    def test_split_known_subdomains(self):
+        new, known = split_known_subdomains(self.subdomains, self.base_scan.id)
+        self.assertEqual([subdomain.name for subdomain in new], [f'api.{DOMAIN_NAME}'])
+        self.assertEqual([subdomain.name for subdomain in known], [f'www.{DOMAIN_NAME}'])
+
+    def test_carry_forward_subdomains(self):
+        counts = carry_forward_subdomains([self.subdomains[0]], self.base_scan.id)
+        self.assertEqual(counts, {'subdomains': 1, 'endpoints': 2, 'vulnerabilities': 1})
+
+        # Probe results and shared rows of the subdomain
+        subdomain = Subdomain.objects.get(pk=self.subdomains[0].id)
+        self.assertEqual((subdomain.http_status, subdomain.page_title), (200, 'Home'))
+        self.assertEqual(list(subdomain.technologies.all()), [self.technology])
+        self.assertEqual(list(subdomain.ip_addresses.all()), [self.ip])
+
+        # Endpoints: the one already saved is reused, the other one copied
+        endpoints = EndPoint.objects.filter(scan_history=self.scan).order_by('http_url')
+        self.assertEqual([endpoint.http_url for endpoint in endpoints], [
+            f'https://www.{DOMAIN_NAME}/',
+            f'https://www.{DOMAIN_NAME}/login',
+        ])
+        self.assertEqual(endpoints[0].id, self.saved_endpoint.id)
+        copied_endpoint = endpoints[1]
+        self.assertNotEqual(copied_endpoint.id, self.base_endpoints[1].id)
+        self.assertEqual(copied_endpoint.subdomain_id, subdomain.id)
+        self.assertEqual(list(copied_endpoint.techs.all()), [self.technology])
+
+        # Vulnerabilities, pointing to the copied subdomain and endpoint
+        vuln = Vulnerability.objects.get(scan_history=self.scan)
+        self.assertNotEqual(vuln.id, self.base_vuln.id)
+        self.assertEqual(vuln.subdomain_id, subdomain.id)
+        self.assertEqual(vuln.endpoint_id, copied_endpoint.id)
+        self.assertEqual(list(vuln.tags.all()), [self.tag])
+
+        # The base scan is left untouched
+        self.assertEqual(EndPoint.objects.filter(scan_history=self.base_scan).count(), 2)
+        self.assertEqual(Vulnerability.objects.get(pk=self.base_vuln.id).endpoint_id, self.base_endpoints[1].id)
+
+    def test_carry_forward_unknown_subdomains(self):
+        counts = carry_forward_subdomains([self.subdomains[1]], self.base_scan.id)
+        self.assertEqual(counts, {'subdomains': 0, 'endpoints': 0, 'vulnerabilities': 0})
+
+    def test_copy_rows_and_links(self):
+        endpoints = EndPoint.objects.filter(pk__in=[endpoint.id for endpoint in self.base_endpoints])
+        id_map = copy_rows(
+            endpoints,
+            unique_field='http_url',
+            scan_history_id=self.scan.id,
+            subdomain_id=self.subdomains[0].id)
+        self.assertEqual(id_map[self.base_endpoints[0].id], self.saved_endpoint.id)
+        copied = EndPoint.objects.get(pk=id_map[self.base_endpoints[1].id])
+        self.assertEqual(copied.scan_history_id, self.scan.id)
+        self.assertEqual(copied.subdomain_id, self.subdomains[0].id)
+        self.assertEqual(copied.http_url, self.base_endpoints[1].http_url)
+
+        copy_links(EndPoint, ['techs'], id_map)
+        copy_links(EndPoint, ['techs'], id_map)
+        self.assertEqual(list(copied.techs.all()), [self.technology])
+        self.assertEqual(self.saved_endpoint.techs.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+import unittest
+
+from reconPoint.gf import GfMatcher, compile_gf_pattern, translate_grep_regex
+
+
+class TestGf(unittest.TestCase):
+    def setUp(self):
+        self.gf_dir = tempfile.mkdtemp()
+        patterns = {
+            'idor': {'flags': '-iE', 'patterns': ['id=', 'user=']},
+            'redirect': {'flags': '-iE', 'pattern': '(url|next|redirect)='},
+            'php': {'flags': '-HnriE', 'pattern': r'\.php'},
+            'tokens': {'flags': '-oE', 'pattern': 'token=[[:alnum:]]+'},
+            'basic': {'flags': '-i', 'pattern': 'a\\|b'},
+        }
+        for name, definition in patterns.items():
+            with open(os.path.join(self.gf_dir, f'{name}.json'), 'w') as f:
+                json.dump(definition, f)
+
+    def test_compile_gf_pattern(self):
+        self.assertIsNone(compile_gf_pattern({'flags': '-i', 'pattern': 'a\\|b'}))
+        self.assertIsNone(compile_gf_pattern({'flags': '-E', 'pattern': '(unclosed'}))
+        pattern = compile_gf_pattern({'flags': '-vE', 'patterns': ['a', 'b']})
+        self.assertTrue(pattern['invert'])
+        self.assertEqual(pattern['source'], '(?:a)|(?:b)')
+        self.assertEqual(translate_grep_regex(r'\<[[:digit:]]+\>'), r'\b[0-9]+\b')
+
+    def test_matcher(self):
+        matcher = GfMatcher(['idor', 'redirect', 'php', 'tokens', 'basic', 'missing'], gf_dir=self.gf_dir)
+        self.assertEqual(matcher.unsupported, ['basic', 'missing'])
+        self.assertIsNotNone(matcher.prefilter)
+        self.assertEqual(matcher.match('https://example.com/static/app.js'), {})
+        self.assertEqual(
+            matcher.match('https://example.com/login.php?ID=1&next=/'),
+            {
+                'idor': ['https://example.com/login.php?ID=1&next=/'],
+                'redirect': ['https://example.com/login.php?ID=1&next=/'],
+                'php': ['https://example.com/login.php?ID=1&next=/'],
+            })
+        self.assertEqual(
+            matcher.match('https://example.com/?token=abc123&x=token=def'),
+            {'tokens': ['token=abc123', 'token=def']})
+
+
+if __name__ == '__main__':
+    unittest.main()
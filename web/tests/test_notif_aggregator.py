@@ -0,0 +1,54 @@
+import unittest
+
+from reconPoint.notif_aggregator import (TRUNCATED_MARKER, format_digest,
+                                         merge_events, new_digest)
+
+
+class TestNotificationAggregator(unittest.TestCase):
+    def test_merge_keeps_latest_status(self):
+        digest = merge_events(new_digest(), [
+            {'task': 'http_crawl', 'status': 'RUNNING'},
+            {'task': 'port_scan', 'status': 'RUNNING'},
+            {'task': 'http_crawl', 'status': 'SUCCESS', 'output_path': '/tmp/httpx.txt', 'result': True},
+        ])
+        self.assertEqual(digest['events'], 3)
+        self.assertEqual(list(digest['tasks']), ['http_crawl', 'port_scan'])
+        self.assertEqual(digest['tasks']['http_crawl']['status'], 'SUCCESS')
+        self.assertEqual(digest['tasks']['http_crawl']['output_path'], '/tmp/httpx.txt')
+
+    def test_merge_fields(self):
+        events = [
+            {'task': 'http_crawl', 'fields': {'Alive': 'https://a.example.com', 'Count': 1}, 'fields_append': ['Alive']},
+            {'task': 'http_crawl', 'fields': {'Alive': 'https://b.example.com', 'Count': 2}, 'fields_append': ['Alive']},
+            {'task': 'http_crawl', 'fields': {'Alive': 'https://a.example.com', 'Empty': ''}, 'fields_append': ['Alive']},
+        ]
+        fields = merge_events(new_digest(), events)['tasks']['http_crawl']['fields']
+        self.assertEqual(fields, {
+            'Alive': 'https://a.example.com\nhttps://b.example.com',
+            'Count': '2',
+        })
+
+    def test_appended_field_is_bounded(self):
+        events = [
+            {'task': 'http_crawl', 'fields': {'Alive': f'https://{i}.example.com'}, 'fields_append': ['Alive']}
+            for i in range(1000)
+        ]
+        value = merge_events(new_digest(), events)['tasks']['http_crawl']['fields']['Alive']
+        self.assertLessEqual(len(value), 1024)
+        self.assertTrue(value.endswith(TRUNCATED_MARKER))
+
+    def test_format_digest(self):
+        digest = merge_events(new_digest(), [
+            {'task': 'nuclei_scan', 'status': 'FAILED', 'traceback': 'Traceback'},
+            {'task': 'fetch_url', 'fields': {'URLs': 'x' * 5000}},
+        ])
+        message = format_digest(digest, 'Scan #1 summary', 'https://reconpoint/scan/detail/1')
+        self.assertTrue(message.startswith('**Scan #1 summary** (2 updates)'))
+        self.assertIn('• `nuclei_scan` **FAILED**', message)
+        self.assertNotIn('Traceback', message)
+        self.assertIn('Traceback', format_digest(digest, 'Scan #1 summary', tracebacks=True))
+        self.assertLessEqual(len(format_digest(digest, 'Scan #1 summary', max_length=500)), 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from reconPoint.notif_dispatcher import NotificationDispatcher, NotificationMessage
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.client_address[1], body))
+            hits = sum(1 for path, _, _ in server.requests if path == self.path)
+        if self.path == '/limited' and hits == 1:
+            self.respond(429, {'retry_after': 0.05}, {'Retry-After': '0.05'})
+        elif self.path == '/discord-limited' and hits == 1:
+            self.respond(429, {'retry_after': 0.05})
+        elif self.path == '/error':
+            self.respond(500, {})
+        elif self.path == '/missing':
+            self.respond(404, {})
+        else:
+            self.respond(200, {'id': str(hits)})
+
+    def respond(self, status, payload, headers={}):
+        content = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestNotificationDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.dispatcher = NotificationDispatcher(max_retries=2, backoff=0.01, max_backoff=0.05)
+
+    def tearDown(self):
+        self.dispatcher.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def message(self, channel, path, **kwargs):
+        return NotificationMessage(channel, f'{self.base_url}{path}', {'text': 'Hello'}, **kwargs)
+
+    def test_send_concurrently(self):
+        delivered_ids = []
+        deliveries = self.dispatcher.send([
+            self.message('slack', '/ok'),
+            None,
+            self.message('discord', '/discord', on_delivered=lambda content: delivered_ids.append(json.loads(content)['id'])),
+        ])
+        self.assertEqual([delivery.channel for delivery in deliveries], ['slack', 'discord'])
+        self.assertTrue(all(delivery.delivered for delivery in deliveries))
+        self.assertTrue(all(delivery.latency >= 0 for delivery in deliveries))
+        self.assertEqual(delivered_ids, ['1'])
+
+    def test_retry_after(self):
+        deliveries = self.dispatcher.send([
+            self.message('slack', '/limited'),
+            self.message('slack', '/limited'),
+            self.message('discord', '/discord-limited'),
+        ])
+        self.assertTrue(all(delivery.delivered for delivery in deliveries))
+        self.assertEqual([delivery.attempts for delivery in deliveries], [2, 1, 2])
+        self.assertGreaterEqual(deliveries[0].latency, 0.05)
+        self.assertGreaterEqual(deliveries[1].latency, deliveries[0].latency)
+
+    def test_bounded_retries(self):
+        error, missing = self.dispatcher.send([
+            self.message('slack', '/error'),
+            self.message('lark', '/missing'),
+        ])
+        self.assertFalse(error.delivered)
+        self.assertEqual(error.status, 500)
+        self.assertEqual(error.attempts, 3)
+        self.assertFalse(missing.delivered)
+        self.assertEqual(missing.attempts, 1)
+
+    def test_connection_is_kept_alive(self):
+        self.dispatcher.send([self.message('slack', '/ok') for _ in range(3)])
+        self.dispatcher.send([self.message('slack', '/ok', files=[('output.txt', b'a.example.com\n')])])
+        ports = {port for _, port, _ in self.server.requests}
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(len(ports), 1)
+        self.assertIn(b'name="payload_json"', self.server.requests[-1][2])
+        self.assertIn(b'a.example.com', self.server.requests[-1][2])
+
+
+if __name__ == '__main__':
+    unittest.main()
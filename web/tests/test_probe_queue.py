@@ -0,0 +1,76 @@
+import json
+import unittest
+
+from reconPoint.probe_queue import ProbeQueue, group_replies, index_probe_results
+
+
+class ReplyRedis:
+    """In-memory stand-in for the Redis list commands used by ProbeQueue.wait."""
+
+    def __init__(self):
+        self.lists = {}
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+
+    def blpop(self, key, timeout=0):
+        values = self.lists.get(key)
+        if not values:
+            return None
+        return key, values.pop(0)
+
+    def delete(self, key):
+        self.lists.pop(key, None)
+
+
+class TestProbeQueue(unittest.TestCase):
+    def test_index_probe_results(self):
+        records = [
+            {
+                'input': 'example.com',
+                'url': 'https://example.com',
+                'final_url': 'https://example.com/login',
+                'endpoint_id': 1,
+                'endpoint_created': True,
+            },
+            {'input': 'example.com:8080', 'url': 'http://example.com:8080', 'final_url': 'http://example.com:8080', 'endpoint_id': 2},
+        ]
+        index = index_probe_results(records)
+        self.assertEqual(index['example.com'], {'endpoint_id': 1, 'endpoint_created': True})
+        self.assertEqual(index['https://example.com/login']['endpoint_id'], 1)
+        self.assertEqual(index['example.com:8080'], {'endpoint_id': 2, 'endpoint_created': False})
+
+    def test_group_replies(self):
+        entries = [
+            {'url': 'a.example.com', 'reply_to': 'r1'},
+            {'url': 'b.example.com', 'reply_to': None},
+            {'url': 'c.example.com', 'reply_to': 'r2'},
+            {'url': 'd.example.com', 'reply_to': 'r1'},
+        ]
+        results = {'a.example.com': {'endpoint_id': 1}, 'c.example.com': {'endpoint_id': 3}}
+        self.assertEqual(group_replies(entries, results), {
+            'r1': {'a.example.com': {'endpoint_id': 1}, 'd.example.com': None},
+            'r2': {'c.example.com': {'endpoint_id': 3}},
+        })
+
+    def test_wait_reads_all_replies(self):
+        client = ReplyRedis()
+        queue = ProbeQueue(client)
+        key = queue.reply_key('r1')
+        client.rpush(key, json.dumps({'a.example.com': {'endpoint_id': 1}}))
+        client.rpush(key, json.dumps({'b.example.com': None}))
+        client.rpush(key, json.dumps({'c.example.com': {'endpoint_id': 3}}))
+        self.assertEqual(queue.wait('r1', ['a.example.com', 'b.example.com'], timeout=1), {
+            'a.example.com': {'endpoint_id': 1},
+            'b.example.com': None,
+        })
+        # replies nobody waits for are dropped
+        self.assertNotIn(key, client.lists)
+        client.rpush(key, json.dumps({'a.example.com': {'endpoint_id': 1}}))
+        self.assertEqual(queue.wait('r1', ['a.example.com', 'd.example.com'], timeout=1), {
+            'a.example.com': {'endpoint_id': 1},
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
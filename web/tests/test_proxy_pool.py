@@ -0,0 +1,55 @@
+import random
+import unittest
+
+from reconPoint.proxy_pool import (DEFAULT_COOLDOWN, parse_proxies,
+                                   pick_proxy, proxy_score, update_health)
+
+
+class TestProxyPool(unittest.TestCase):
+    def test_parse_proxies(self):
+        text = 'http://a:8080\n\n# comment\n  http://b:8080  \nhttp://a:8080\n'
+        self.assertEqual(parse_proxies(text), ('http://a:8080', 'http://b:8080'))
+        self.assertEqual(parse_proxies(None), ())
+
+    def test_failures_take_proxy_out_of_rotation(self):
+        health = update_health({}, True, latency=0.2, now=100)
+        self.assertEqual(health['error_rate'], 0)
+        for i in range(2):
+            health = update_health(health, False, now=100)
+        self.assertGreater(proxy_score(health, now=100), 0)
+        health = update_health(health, False, now=100)
+        self.assertEqual(health['down_until'], 100 + DEFAULT_COOLDOWN)
+        self.assertEqual(proxy_score(health, now=101), 0)
+        health = update_health(health, False, now=200)
+        self.assertEqual(health['down_until'], 200 + 2 * DEFAULT_COOLDOWN)
+        health = update_health(health, True, latency=0.2, now=300)
+        self.assertEqual(health['failures'], 0)
+        self.assertGreater(proxy_score(health, now=300), 0)
+
+    def test_score_prefers_fast_reliable_proxies(self):
+        fast = update_health({}, True, latency=0.1, now=100)
+        slow = update_health({}, True, latency=3, now=100)
+        flaky = update_health(update_health({}, True, latency=0.1, now=100), False, now=100)
+        self.assertGreater(proxy_score(fast, now=100), proxy_score(slow, now=100))
+        self.assertGreater(proxy_score(fast, now=100), proxy_score(flaky, now=100))
+
+    def test_pick_proxy(self):
+        proxies = ['a', 'b', 'c']
+        healths = {
+            'a': update_health({}, True, latency=0.1, now=100),
+            'b': {'down_until': 200},
+            'c': update_health({}, True, latency=0.1, now=100),
+        }
+        rng = random.Random(0)
+        picks = {pick_proxy(proxies, healths, {'c': 4}, 4, now=150, rng=rng) for _ in range(50)}
+        self.assertEqual(picks, {'a'})
+        # All in rotation proxies are busy: share the load over them
+        picks = {pick_proxy(proxies, healths, {'a': 4, 'c': 4}, 4, now=150, rng=rng) for _ in range(50)}
+        self.assertEqual(picks, {'a', 'c'})
+        # All proxies down: still use a proxy
+        self.assertEqual(pick_proxy(['b'], healths, {}, 4, now=150, rng=rng), 'b')
+        self.assertIsNone(pick_proxy([], healths, {}, 4, now=150, rng=rng))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+from reconPoint.scan_graph import compile_scan_graph, get_task_dependencies
+
+
+class TestScanGraph(unittest.TestCase):
+    def test_full_engine(self):
+        tasks = [
+            'subdomain_discovery', 'osint', 'port_scan', 'fetch_url',
+            'dir_file_fuzz', 'vulnerability_scan', 'screenshot',
+            'waf_detection', 'custom_headers',
+        ]
+        plan = compile_scan_graph(get_task_dependencies(tasks))
+        self.assertEqual(plan, ('group', [
+            ('chain', [
+                'subdomain_discovery',
+                ('group', [
+                    ('chain', [('group', ['port_scan', 'fetch_url']), 'vulnerability_scan']),
+                    'dir_file_fuzz',
+                    'screenshot',
+                    'waf_detection',
+                ]),
+            ]),
+            'osint',
+        ]))
+
+    def test_missing_producer(self):
+        dependencies = get_task_dependencies(['vulnerability_scan', 'fetch_url'])
+        self.assertEqual(dependencies, {'fetch_url': [], 'vulnerability_scan': ['fetch_url']})
+        plan = compile_scan_graph(dependencies)
+        self.assertEqual(plan, ('chain', ['fetch_url', 'vulnerability_scan']))
+
+    def test_single_and_empty(self):
+        self.assertEqual(compile_scan_graph(get_task_dependencies(['screenshot'])), 'screenshot')
+        self.assertIsNone(compile_scan_graph(get_task_dependencies(['threads'])))
+
+    def test_cycle(self):
+        with self.assertRaises(ValueError):
+            compile_scan_graph({'a': ['b'], 'b': ['a']})
+
+
+if __name__ == '__main__':
+    unittest.main()
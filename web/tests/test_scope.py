@@ -0,0 +1,51 @@
+import unittest
+
+from reconPoint.scope import ScopeEngine, get_scope_engine
+
+
+class TestScopeEngine(unittest.TestCase):
+    def test_out_of_scope_subdomains(self):
+        scope = ScopeEngine(out_of_scope_subdomains=[
+            '*.dev.example.com',
+            '.internal.example.com',
+            'Admin.example.com',
+            '10.0.0.0/24',
+            '192.168.1.7',
+            '^staging[0-9]*\\.',
+            '*invalid[',
+            '',
+        ])
+        self.assertTrue(scope.is_out_of_scope('a.dev.example.com'))
+        self.assertTrue(scope.is_out_of_scope('a.b.dev.example.com:8443'))
+        self.assertFalse(scope.is_out_of_scope('dev.example.com'))
+        self.assertTrue(scope.is_out_of_scope('x.internal.example.com'))
+        self.assertTrue(scope.is_out_of_scope('admin.example.com'))
+        self.assertTrue(scope.is_out_of_scope('api.ADMIN.example.com'))
+        self.assertFalse(scope.is_out_of_scope('myadmin.example.com'))
+        self.assertTrue(scope.is_out_of_scope('10.0.0.42'))
+        self.assertFalse(scope.is_out_of_scope('10.0.1.1'))
+        self.assertTrue(scope.is_out_of_scope('192.168.1.7'))
+        self.assertFalse(scope.is_out_of_scope('192.168.1.70'))
+        self.assertTrue(scope.is_out_of_scope('staging2.example.com'))
+        self.assertTrue(scope.is_out_of_scope('*invalid['))
+        self.assertFalse(scope.is_out_of_scope('www.example.com'))
+
+    def test_excluded_paths(self):
+        scope = ScopeEngine(excluded_paths=['/logout', r'\.pdf$', 'a[', ''])
+        urls = [
+            'https://example.com/logout?next=/',
+            'https://example.com/doc.pdf',
+            'https://example.com/a[1]',
+            'https://example.com/home',
+        ]
+        self.assertEqual(scope.filter_urls(urls), ['https://example.com/home'])
+        self.assertEqual(ScopeEngine().filter_urls(urls), urls)
+
+    def test_get_scope_engine(self):
+        scope = get_scope_engine(['*.example.com'], ['/logout'])
+        self.assertIs(get_scope_engine(['*.example.com'], ['/logout']), scope)
+        self.assertIsNot(get_scope_engine(['*.example.com']), scope)
+
+
+if __name__ == '__main__':
+    unittest.main()
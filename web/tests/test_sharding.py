@@ -0,0 +1,48 @@
+import unittest
+
+from reconPoint.sharding import (merge_results, plan_shards, shard_path,
+                                 split_items)
+
+
+class TestSharding(unittest.TestCase):
+    def test_plan_shards_without_measurement(self):
+        self.assertEqual(plan_shards(0), [])
+        self.assertEqual(plan_shards(40, min_size=50), [40])
+        sizes = plan_shards(1000, min_size=50, max_shards=32)
+        self.assertEqual(sum(sizes), 1000)
+        self.assertEqual(len(sizes), 20)
+        sizes = plan_shards(100000, min_size=50, max_shards=32)
+        self.assertEqual(len(sizes), 32)
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+
+    def test_plan_shards_from_throughput(self):
+        # 0.5s per item, 60s per shard: 120 items per shard
+        sizes = plan_shards(1000, seconds_per_item=0.5, target_seconds=60, min_size=10)
+        self.assertEqual(len(sizes), 9)
+        self.assertEqual(sum(sizes), 1000)
+        # Fast items: capped to max_size
+        sizes = plan_shards(1000, seconds_per_item=0.001, target_seconds=60, max_size=400)
+        self.assertEqual(sizes, [334, 333, 333])
+        # Slow items: floored to min_size, shards capped to max_shards
+        sizes = plan_shards(1000, seconds_per_item=60, target_seconds=60, min_size=10, max_shards=20)
+        self.assertEqual(sizes, [50] * 20)
+
+    def test_split_items(self):
+        items = list(range(10))
+        self.assertEqual(split_items(items, [4, 3, 3]), [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]])
+
+    def test_merge_results(self):
+        self.assertEqual(merge_results([[1, 2], None, [3]]), [1, 2, 3])
+        self.assertEqual(
+            merge_results([{'a.com': [80]}, {'a.com': [443], 'b.com': [22]}]),
+            {'a.com': [80, 443], 'b.com': [22]})
+        self.assertIsNone(merge_results([None, 'traceback']))
+
+    def test_shard_path(self):
+        self.assertEqual(shard_path('/tmp/httpx.txt', None), '/tmp/httpx.txt')
+        self.assertEqual(shard_path('/tmp/httpx.txt', 2), '/tmp/httpx_shard2.txt')
+        self.assertEqual(shard_path('/tmp/screenshots', 0), '/tmp/screenshots_shard0')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import tempfile
+import threading
+import unittest
+
+from reconPoint.streams import ScanStream
+
+
+class TestScanStream(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.stream = ScanStream(self.tmp_dir.name, 'subdomains')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_skips_partial_item(self):
+        self.stream.publish(['a.example.com', '', 'b.example.com'])
+        with open(self.stream.path, 'a') as f:
+            f.write('c.exam')
+        items, offset = self.stream.read()
+        self.assertEqual(items, ['a.example.com', 'b.example.com'])
+        with open(self.stream.path, 'a') as f:
+            f.write('ple.com\n')
+        self.assertEqual(self.stream.read(offset)[0], ['c.example.com'])
+
+    def test_consume_while_producing(self):
+        batches = [[f'{i}-{j}.example.com' for j in range(3)] for i in range(5)]
+
+        def produce():
+            for batch in batches:
+                self.stream.publish(batch)
+            self.stream.close()
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        consumed = []
+        for items in self.stream.consume(poll_interval=0.01, timeout=5):
+            consumed.extend(items)
+        producer.join()
+        self.assertEqual(consumed, [item for batch in batches for item in batch])
+
+    def test_consume_timeout(self):
+        self.stream.publish(['a.example.com'])
+        consumed = list(self.stream.consume(poll_interval=0.01, timeout=0.05))
+        self.assertEqual(consumed, [['a.example.com']])
+        self.assertFalse(self.stream.closed)
+
+    def test_reset(self):
+        self.stream.publish(['a.example.com'])
+        self.stream.close()
+        self.stream.reset()
+        self.assertFalse(self.stream.closed)
+        self.assertEqual(self.stream.read(), ([], 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
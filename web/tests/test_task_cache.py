@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+
+from reconPoint.task_cache import TaskCache, decode_value, encode_value, make_cache_key
+
+
+class MemoryRedis:
+    """In-memory stand-in for the few Redis commands used by TaskCache."""
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.zsets = {}
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value if isinstance(value, bytes) else str(value).encode()
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+    def incrby(self, key, amount):
+        self.set(key, int(self.values.get(key) or 0) + amount)
+
+    def decrby(self, key, amount):
+        self.incrby(key, -amount)
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = str(value).encode()
+
+    def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field, None)
+
+    def hvals(self, key):
+        return list(self.hashes.get(key, {}).values())
+
+    def hincrby(self, key, field, amount):
+        self.hset(key, field, int(self.hget(key, field) or 0) + amount)
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    def zrange(self, key, start, end):
+        scores = self.zsets.get(key, {})
+        members = sorted(scores, key=scores.get)
+        return members[start:end + 1 if end >= 0 else len(members) + end + 1]
+
+
+
+class TestTaskCache(unittest.TestCase):
+    def test_key_ignores_kwargs_order(self):
+        key = make_cache_key('subfinder', {'cmd': 'subfinder -d a.com', 'threads': 30})
+        self.assertEqual(key, make_cache_key('subfinder', {'threads': 30, 'cmd': 'subfinder -d a.com'}))
+        self.assertNotEqual(key, make_cache_key('ctfr', {'threads': 30, 'cmd': 'subfinder -d a.com'}))
+
+    def test_key_depends_on_input_files_content(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'input.txt')
+            with open(path, 'w') as f:
+                f.write('a.example.com\n')
+            key = make_cache_key('gau', {'cmd': 'gau'}, [path])
+            self.assertEqual(key, make_cache_key('gau', {'cmd': 'gau'}, [path]))
+            with open(path, 'a') as f:
+                f.write('b.example.com\n')
+            self.assertNotEqual(key, make_cache_key('gau', {'cmd': 'gau'}, [path]))
+
+    def test_encode_decode(self):
+        small = b'a.example.com\n'
+        big = b'a.example.com\n' * 1000
+        self.assertEqual(encode_value(small)[:1], b'r')
+        self.assertEqual(encode_value(big)[:1], b'z')
+        self.assertLess(len(encode_value(big)), len(big))
+        for value in (small, big, b''):
+            self.assertEqual(decode_value(encode_value(value)), value)
+
+    def test_forget_unaccounted_entry(self):
+        client = MemoryRedis()
+        cache = TaskCache(client, ttls={'default': 60})
+        client.set(cache.value_key('orphan'), b'rdata')
+        client.zadd(cache.lru_key, {'orphan': 1})
+        cache.forget('orphan')
+        self.assertIsNone(client.get(cache.value_key('orphan')))
+        self.assertEqual(client.zrange(cache.lru_key, 0, -1), [])
+
+    def test_evict_reconciles_counter(self):
+        client = MemoryRedis()
+        cache = TaskCache(client, ttls={'default': 60}, max_bytes=100, compress_threshold=1000)
+        for ix in range(2):
+            cache.set('gau', f'key{ix}', b'x' * 39)
+        self.assertEqual(client.zrange(cache.lru_key, 0, -1), ['key0', 'key1'])
+        self.assertEqual(int(client.get(cache.bytes_key)), 80)
+        # counter drifted above the entries left
+        client.incrby(cache.bytes_key, 500)
+        cache.evict()
+        self.assertEqual(int(client.get(cache.bytes_key)), 0)
+        self.assertEqual(client.hvals(cache.sizes_key), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from reconPoint.url_canon import (SeenSet, canonicalize_url, get_variant_key,
+                                  iter_unique_urls)
+
+
+class TestUrlCanon(unittest.TestCase):
+    def test_canonicalize_url(self):
+        self.assertEqual(
+            canonicalize_url('HTTPS://Example.COM:443/a//b/./c/../d?b=2&a=1#top'),
+            'https://example.com/a/b/d?a=1&b=2')
+        self.assertEqual(canonicalize_url('http://example.com:8080'), 'http://example.com:8080/')
+        self.assertEqual(canonicalize_url('http://example.com/%7euser/%2f?q=%3d'), 'http://example.com/~user/%2F?q=%3D')
+        self.assertEqual(canonicalize_url('http://example.com/?a=2&a=1&&'), 'http://example.com/?a=2&a=1')
+        self.assertIsNone(canonicalize_url('ftp://example.com/file'))
+        self.assertIsNone(canonicalize_url('/relative/path'))
+        self.assertIsNone(canonicalize_url('http://example.com:99999/'))
+
+    def test_get_variant_key(self):
+        self.assertEqual(
+            get_variant_key('https://example.com/post/12?id=1&page=2'),
+            get_variant_key('https://example.com/post/34?page=3&id=9'))
+        self.assertEqual(
+            get_variant_key('https://example.com/blog/how-to-scan-a-target-fast'),
+            get_variant_key('https://example.com/blog/why-recon-matters-so-much'))
+        self.assertNotEqual(
+            get_variant_key('https://example.com/post?id=1'),
+            get_variant_key('https://example.com/post?name=1'))
+        self.assertNotEqual(
+            get_variant_key('https://example.com/admin'),
+            get_variant_key('https://example.com/login'))
+
+    def test_seen_set_spills(self):
+        with SeenSet(max_memory_items=10, capacity=100) as seen:
+            items = [f'https://example.com/{ix}' for ix in range(95)]
+            self.assertTrue(all(seen.add(item) for item in items))
+            self.assertEqual(len(seen.runs), 9)
+            self.assertFalse(any(seen.add(item) for item in items))
+            self.assertEqual(len(seen), 95)
+
+    def test_iter_unique_urls(self):
+        urls = [
+            'https://example.com/item?id=1',
+            'https://EXAMPLE.com:443/item?id=2',
+            'https://example.com/item?id=1#anchor',
+            'not an url',
+            'https://example.com/other',
+        ]
+        with SeenSet() as seen:
+            self.assertEqual(
+                list(iter_unique_urls(urls, seen)),
+                ['https://example.com/item?id=1', 'https://example.com/other'])
+        with SeenSet() as seen:
+            self.assertEqual(
+                list(iter_unique_urls(urls, seen, collapse_variants=False)),
+                ['https://example.com/item?id=1', 'https://example.com/item?id=2', 'https://example.com/other'])
+
+
+if __name__ == '__main__':
+    unittest.main()
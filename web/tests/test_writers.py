@@ -0,0 +1,170 @@
+import os
+import unittest
+
+os.environ['RECONPOINT_SECRET_KEY'] = 'secret'
+os.environ['CELERY_ALWAYS_EAGER'] = 'True'
+
+from reconPoint.writers import (EndpointWriter, HttpCrawlWriter, PortScanWriter,
+                                VulnerabilityWriter, bulk_save_ports,
+                                bulk_save_subdomains)
+from startScan.models import *
+
+DOMAIN_NAME = 'writers.reconpoint.test'
+PORT_NUMBERS = [65001, 65002]
+IP_ADDRESSES = ['10.255.0.1', '10.255.0.2']
+TECHNOLOGIES = ['WritersTestServer', 'WritersTestFramework']
+VULNERABILITY_TAGS = ['writers-test-tag']
+
+
+class TestWriters(unittest.TestCase):
+    def setUp(self):
+        self.domain, _ = Domain.objects.get_or_create(name=DOMAIN_NAME)
+        self.engine = EngineType(engine_name='test_writers_engine', yaml_configuration='{}')
+        self.engine.save()
+        self.scan = ScanHistory(
+            domain=self.domain,
+            scan_type=self.engine,
+            start_scan_date=timezone.now())
+        self.scan.save()
+        self.subdomain = Subdomain.objects.create(
+            name=f'www.{DOMAIN_NAME}',
+            target_domain=self.domain,
+            scan_history=self.scan)
+        self.ctx = {
+            'track': False,
+            'results_dir': '/tmp',
+            'scan_history_id': self.scan.id,
+            'domain_id': self.domain.id,
+            'engine_id': self.engine.id,
+        }
+
+    def tearDown(self):
+        Port.objects.filter(number__in=PORT_NUMBERS).delete()
+        IpAddress.objects.filter(address__in=IP_ADDRESSES).delete()
+        Technology.objects.filter(name__in=TECHNOLOGIES).delete()
+        VulnerabilityTags.objects.filter(name__in=VULNERABILITY_TAGS).delete()
+        self.scan.delete()
+        self.engine.delete()
+        self.domain.delete()
+
+    def test_endpoint_writer_insert_and_update(self):
+        url = f'https://www.{DOMAIN_NAME}/login'
+        with EndpointWriter(ctx=self.ctx, track_ids=True) as endpoints:
+            endpoints.add(url, http_status=200, matched_gf_patterns='idor')
+            endpoints.add(url, page_title='Login', matched_gf_patterns='idor,redirect')
+            self.assertIsNone(endpoints.add('https://other.test/login'))
+        endpoint_id, created = endpoints.get(url)
+        self.assertTrue(created)
+        endpoint = EndPoint.objects.get(pk=endpoint_id)
+        self.assertEqual(endpoint.subdomain_id, self.subdomain.id)
+        self.assertEqual(endpoint.http_status, 200)
+        self.assertEqual(endpoint.page_title, 'Login')
+        self.assertEqual(endpoint.matched_gf_patterns, 'idor,redirect')
+
+        with EndpointWriter(ctx=self.ctx, track_ids=True) as endpoints:
+            endpoints.add(url, http_status=302, matched_gf_patterns='redirect,lfi')
+        self.assertEqual(endpoints.get(url), (endpoint_id, False))
+        endpoint.refresh_from_db()
+        self.assertEqual(endpoint.http_status, 302)
+        self.assertEqual(endpoint.page_title, 'Login')
+        self.assertEqual(endpoint.matched_gf_patterns, 'idor,redirect,lfi')
+        self.assertEqual(EndPoint.objects.filter(scan_history=self.scan, http_url=url).count(), 1)
+
+    def test_vulnerability_writer(self):
+        finding = {
+            'name': 'Reflected XSS',
+            'severity': 2,
+            'http_url': f'https://www.{DOMAIN_NAME}/?q=1',
+            'scan_history': self.scan,
+            'target_domain': self.domain,
+            'subdomain': self.subdomain,
+        }
+        flushed = []
+        with VulnerabilityWriter(on_flush=flushed.extend) as vulns:
+            vulns.add(tags=VULNERABILITY_TAGS, **finding)
+            vulns.add(tags=VULNERABILITY_TAGS, **finding)
+        self.assertEqual(len(flushed), 1)
+        self.assertTrue(flushed[0].is_new)
+        self.assertEqual([tag.name for tag in flushed[0].tags.all()], VULNERABILITY_TAGS)
+
+        # identical finding reuses the stored vulnerability
+        flushed = []
+        with VulnerabilityWriter(on_flush=flushed.extend) as vulns:
+            vulns.add(tags=VULNERABILITY_TAGS, **finding)
+        self.assertEqual(vulns.created_count, 0)
+        self.assertFalse(flushed[0].is_new)
+
+        # with exclude_keys, matching findings are skipped
+        with VulnerabilityWriter(exclude_keys=['http_url']) as vulns:
+            vulns.add(**dict(finding, http_url=f'https://www.{DOMAIN_NAME}/?q=2'))
+        self.assertEqual(vulns.created_count, 0)
+        self.assertEqual(Vulnerability.objects.filter(scan_history=self.scan).count(), 1)
+        self.assertEqual(VulnerabilityTags.objects.filter(name__in=VULNERABILITY_TAGS).count(), 1)
+
+    def test_http_crawl_writer(self):
+        old_ip = IpAddress.objects.create(address=IP_ADDRESSES[0])
+        IpAddress.objects.create(address=IP_ADDRESSES[0])
+        record = {
+            'final_url': f'https://api.{DOMAIN_NAME}/',
+            'status_code': 200,
+            'title': 'API',
+            'tech': TECHNOLOGIES,
+            'a': [IP_ADDRESSES[0]],
+            'host': IP_ADDRESSES[0],
+        }
+        with HttpCrawlWriter(ctx=self.ctx, is_ran_from_subdomain_scan=True) as writer:
+            writer.add(dict(record))
+            writer.add(dict(record, final_url='https://out.of.scope.test/'))
+        self.assertEqual(len(writer.results), 1)
+        result = writer.results[0]
+        self.assertTrue(result['endpoint_created'])
+
+        subdomain = Subdomain.objects.get(scan_history=self.scan, name=f'api.{DOMAIN_NAME}')
+        self.assertEqual(subdomain.http_status, 200)
+        self.assertEqual(sorted(tech.name for tech in subdomain.technologies.all()), sorted(TECHNOLOGIES))
+        self.assertEqual(list(subdomain.ip_addresses.values_list('id', flat=True)), [old_ip.id])
+        endpoint = EndPoint.objects.get(pk=result['endpoint_id'])
+        self.assertTrue(endpoint.is_default)
+        self.assertEqual(endpoint.techs.count(), len(TECHNOLOGIES))
+        self.assertEqual(Technology.objects.filter(name__in=TECHNOLOGIES).count(), len(TECHNOLOGIES))
+
+    def test_bulk_save_ports(self):
+        old_port = Port.objects.create(number=PORT_NUMBERS[0], service_name='stale')
+        Port.objects.create(number=PORT_NUMBERS[0])
+        port_ids = bulk_save_ports(PORT_NUMBERS + PORT_NUMBERS)
+        self.assertEqual(set(port_ids), set(PORT_NUMBERS))
+        self.assertEqual(port_ids[PORT_NUMBERS[0]], old_port.id)
+        self.assertEqual(Port.objects.filter(number=PORT_NUMBERS[1]).count(), 1)
+        old_port.refresh_from_db()
+        self.assertNotEqual(old_port.service_name, 'stale')
+
+    def test_bulk_save_subdomains(self):
+        names = [self.subdomain.name, f'api.{DOMAIN_NAME}', f'api.{DOMAIN_NAME}']
+        subdomains, created_count = bulk_save_subdomains(names, ctx=self.ctx)
+        # the stored name and the repeated one are not counted
+        self.assertEqual(created_count, 1)
+        self.assertEqual(sorted(subdomain.name for subdomain in subdomains), sorted(set(names)))
+        self.assertEqual(bulk_save_subdomains(names, ctx=self.ctx)[1], 0)
+
+    def test_port_scan_writer(self):
+        old_ip = IpAddress.objects.create(address=IP_ADDRESSES[0])
+        IpAddress.objects.create(address=IP_ADDRESSES[0])
+        flushed = []
+        with PortScanWriter(ctx=self.ctx, on_flush=lambda records, created: flushed.append(created)) as writer:
+            for port in PORT_NUMBERS:
+                writer.add({'host': self.subdomain.name, 'ip': IP_ADDRESSES[0], 'port': port})
+                writer.add({'host': self.subdomain.name, 'ip': IP_ADDRESSES[1], 'port': port})
+            writer.add({'host': f'unknown.{DOMAIN_NAME}', 'ip': IP_ADDRESSES[1], 'port': PORT_NUMBERS[0]})
+        self.assertEqual(list(flushed[0]), [IP_ADDRESSES[1]])
+        self.assertEqual(
+            sorted(self.subdomain.ip_addresses.values_list('address', flat=True)),
+            IP_ADDRESSES)
+        self.assertIn(old_ip.id, self.subdomain.ip_addresses.values_list('id', flat=True))
+        self.assertEqual(sorted(old_ip.ports.values_list('number', flat=True)), PORT_NUMBERS)
+        new_ip = IpAddress.objects.get(address=IP_ADDRESSES[1])
+        self.assertEqual(new_ip.ports.count(), len(PORT_NUMBERS))
+        self.assertEqual(Port.objects.filter(number__in=PORT_NUMBERS).count(), len(PORT_NUMBERS))
+
+
+if __name__ == '__main__':
+    unittest.main()